@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+OSINT Profiler - Benchmarks
+Бенчмарки DataManager и генератора отчетов на синтетических данных
+
+Примеры:
+    python benchmark.py --scale 10k
+    python benchmark.py --scale 1k --only get,search,render --output bench/base.json
+    python benchmark.py --scale 1k --compare bench/base.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS не измеряется
+    resource = None
+
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+from core.data_manager import DataManager
+from core.storage import DirectoryStorage, JsonFileStorage, ShardedStorage, migrate
+from core.synthetic import SyntheticTargetGenerator, parse_scale
+from generator import ReportGenerator
+
+console = Console()
+
+# Порядок важен: сначала чтение, затем изменяющие БД операции
+BENCHMARKS = ['load', 'get', 'search', 'prepare', 'render', 'report', 'update',
+              'create', 'import', 'delete', 'summary', 'report_all']
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса в МБ (ru_maxrss: КБ в Linux, байты в macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(operation: Callable[[int], object], ops: int) -> Dict:
+    """
+    Выполняет операцию ops раз и считает пропускную способность и задержки
+
+    Args:
+        operation: Функция от номера итерации
+        ops: Число итераций
+
+    Returns:
+        {'ops', 'total_s', 'ops_per_s', 'p50_ms', 'p99_ms', 'peak_rss_mb'}
+    """
+    latencies = []
+    for i in range(ops):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - start)
+
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        'ops': ops,
+        'total_s': round(total, 4),
+        'ops_per_s': round(ops / total, 2) if total else None,
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        # Пик за все время процесса: бенчмарки идут по возрастанию нагрузки
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+class BenchmarkSuite:
+    """Набор бенчмарков на синтетической БД во временной директории"""
+
+    def __init__(self, workdir: str, synthetic: SyntheticTargetGenerator, ops: int,
+                 bulk_ops: int, shards: int = 0, layout: str = "json"):
+        """
+        Args:
+            workdir: Рабочая директория (БД и отчеты)
+            synthetic: Генератор синтетических целей
+            ops: Число итераций для быстрых операций
+            bulk_ops: Число итераций для операций, переписывающих всю БД
+            shards: Число шардов БД (при layout="sharded")
+            layout: Формат БД: "json", "sharded" или "dir" (файл на цель)
+        """
+        self.workdir = workdir
+        self.synthetic = synthetic
+        self.ops = ops
+        self.bulk_ops = bulk_ops
+        self.db_path = os.path.join(workdir, 'database.json')
+        self.output_dir = os.path.join(workdir, 'output')
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.count = synthetic.write_database(self.db_path)
+        self.db_size = os.path.getsize(self.db_path)
+        if layout != "json":
+            source = JsonFileStorage(self.db_path)
+            self.db_path = os.path.join(workdir, layout)
+            migrate(source, ShardedStorage(self.db_path, shards or None) if layout == "sharded"
+                    else DirectoryStorage(self.db_path))
+        self.dm = DataManager(self.db_path)
+        self.generator = ReportGenerator(output_dir=self.output_dir, data_manager=self.dm)
+        self.rng = random.Random(synthetic.seed)
+        # Разбор БД меряется отдельно (load), остальные операции - на теплом кэше
+        self.dm.get_all_targets()
+        # Базовая версия журнала изменений пишется один раз, до замеров записи
+        self.dm.change_log()
+
+    def _random_id(self) -> str:
+        return self.synthetic.target_id(self.rng.randrange(self.count))
+
+    def bench_load(self) -> Dict:
+        """Холодная загрузка и разбор БД"""
+        return measure(lambda i: DataManager(self.db_path).get_all_targets(), max(self.bulk_ops // 4, 1))
+
+    def bench_get(self) -> Dict:
+        return measure(lambda i: self.dm.get_target(self._random_id()), self.ops)
+
+    def bench_search(self) -> Dict:
+        names = [self.synthetic.full_name(self.rng.randrange(self.count)).split()[0]
+                 for _ in range(self.ops)]
+        return measure(lambda i: self.dm.search_targets(names[i]), self.ops)
+
+    def bench_prepare(self) -> Dict:
+        targets = [self.dm.get_target(self._random_id()) for _ in range(self.ops)]
+        return measure(lambda i: self.generator._prepare_data(targets[i]), self.ops)
+
+    def bench_render(self) -> Dict:
+        """Рендеринг отчета в память"""
+        targets = [self.dm.get_target(self._random_id()) for _ in range(self.ops)]
+        return measure(lambda i: self.generator.render_target(targets[i]), self.ops)
+
+    def bench_report(self) -> Dict:
+        """Одиночный отчет: чтение цели, рендеринг, запись файла"""
+        return measure(lambda i: self.generator.generate_report(self._random_id(), f"single_{i}.html"),
+                       self.ops)
+
+    def bench_update(self) -> Dict:
+        return measure(lambda i: self.dm.update_target(self._random_id(), {'notes': f"bench {i}"}),
+                       self.bulk_ops)
+
+    def bench_create(self) -> Dict:
+        fresh = SyntheticTargetGenerator(seed=self.synthetic.seed + 1, total=self.count)
+        return measure(lambda i: self.dm.create_target(fresh.target(i)), self.bulk_ops)
+
+    def bench_import(self) -> Dict:
+        """Импорт пачки целей так же, как это делает меню импорта main.py"""
+        fresh = SyntheticTargetGenerator(seed=self.synthetic.seed + 2, total=self.count)
+        batch = list(fresh.iter_targets(self.bulk_ops))
+
+        def import_batch(i):
+            self.dm.import_targets([dict(target) for target in batch])
+
+        result = measure(import_batch, 1)
+        result['targets'] = len(batch)
+        return result
+
+    def bench_delete(self) -> Dict:
+        fresh = SyntheticTargetGenerator(seed=self.synthetic.seed + 1, total=self.count)
+        return measure(lambda i: self.dm.delete_target(fresh.target_id(i)), self.bulk_ops)
+
+    def bench_summary(self) -> Dict:
+        return measure(lambda i: self.generator.generate_summary_report(), 1)
+
+    def bench_report_all(self) -> Dict:
+        def run(i):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.generator.generate_all_reports(bundle="shared")
+
+        result = measure(run, 1)
+        result['targets'] = len(self.dm.get_all_targets())
+        return result
+
+    def run(self, names: List[str]) -> Dict[str, Dict]:
+        """Запускает выбранные бенчмарки в порядке BENCHMARKS"""
+        results = {}
+        for name in BENCHMARKS:
+            if name not in names:
+                continue
+            with console.status(f"[cyan]{name}...[/cyan]"):
+                results[name] = getattr(self, f"bench_{name}")()
+            console.print(f"[green]✓[/green] {name}: {results[name]['ops_per_s']} ops/s, "
+                          f"p50 {results[name]['p50_ms']} ms, p99 {results[name]['p99_ms']} ms")
+        return results
+
+
+def print_comparison(report: Dict, baseline: Dict):
+    """Печатает сравнение с сохраненными результатами"""
+    if report['meta']['scale'] != baseline['meta'].get('scale'):
+        console.print(f"[yellow]⚠️  Базовый запуск сделан на {baseline['meta'].get('scale')} целях, "
+                      f"текущий - на {report['meta']['scale']}[/yellow]")
+    results, baseline = report['results'], baseline['results']
+    table = Table(title="Сравнение с базовым запуском", box=box.ROUNDED)
+    for column in ("Бенчмарк", "ops/s", "База", "Δ", "p99, мс", "База p99"):
+        table.add_column(column)
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('ops_per_s') or not result.get('ops_per_s'):
+            table.add_row(name, str(result.get('ops_per_s')), "—", "—", str(result['p99_ms']), "—")
+            continue
+        change = (result['ops_per_s'] / base['ops_per_s'] - 1) * 100
+        color = "green" if change >= -5 else "red"
+        table.add_row(name, str(result['ops_per_s']), str(base['ops_per_s']),
+                      f"[{color}]{change:+.1f}%[/{color}]", str(result['p99_ms']), str(base['p99_ms']))
+    console.print(table)
+
+
+def main():
+    """Точка входа бенчмарков"""
+    parser = argparse.ArgumentParser(description="OSINT Profiler benchmarks")
+    parser.add_argument("--scale", default="1k", help="Число целей: 1k, 10k, 100k, 1M")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно синтетических данных")
+    parser.add_argument("--timeline", type=int, default=20, help="Событий таймлайна на цель (в среднем)")
+    parser.add_argument("--connections", type=int, default=15, help="Связей на цель (в среднем)")
+    parser.add_argument("--addresses", type=int, default=3, help="Адресов на цель (в среднем)")
+    parser.add_argument("--footprint", type=int, default=10, help="Записей цифрового следа на цель")
+    parser.add_argument("--layout", choices=["json", "sharded", "dir"], default="json",
+                        help="Формат БД: один файл, шарды или файл на цель с каталогом")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Число шардов БД (включает --layout sharded)")
+    parser.add_argument("--ops", type=int, default=200, help="Итераций для быстрых операций")
+    parser.add_argument("--bulk-ops", type=int, default=20,
+                        help="Итераций для операций, переписывающих всю БД")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"Бенчмарки через запятую ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", help="Файл результатов JSON (по умолчанию bench/<время>.json)")
+    parser.add_argument("--compare", help="Файл результатов предыдущего запуска для сравнения")
+    parser.add_argument("--workdir", help="Рабочая директория (по умолчанию временная)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"неизвестные бенчмарки: {', '.join(sorted(unknown))}")
+
+    scale = parse_scale(args.scale)
+    synthetic = SyntheticTargetGenerator(seed=args.seed, total=scale, timeline=args.timeline,
+                                         connections=args.connections, addresses=args.addresses,
+                                         footprint=args.footprint)
+    layout = "sharded" if args.shards and args.layout == "json" else args.layout
+    workdir = args.workdir or tempfile.mkdtemp(prefix="osint_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        with console.status(f"[cyan]Генерация {scale} синтетических целей...[/cyan]"):
+            suite = BenchmarkSuite(workdir, synthetic, args.ops, args.bulk_ops, args.shards, layout)
+        console.print(f"[green]✓[/green] БД: {scale} целей, "
+                      f"{suite.db_size / 1024 / 1024:.1f} МБ")
+        results = suite.run(names)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'seed': args.seed,
+            'layout': layout,
+            'shards': args.shards,
+            'params': {'timeline': args.timeline, 'connections': args.connections,
+                       'addresses': args.addresses, 'footprint': args.footprint,
+                       'ops': args.ops, 'bulk_ops': args.bulk_ops},
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join("bench", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    console.print(f"\n📊 Результаты: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+OSINT Profiler - Aggregates
+Материализованные группировки целей (по тегам, работодателям, городам,
+платформам и типам связей), которые обновляются при каждой записи
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.indexes import INDEXES, Index
+from core.summary import address_city
+
+AGGREGATE_DIMENSIONS = ("tag", "company", "city", "platform", "relation")
+
+
+def _clean(value) -> Optional[str]:
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def group_values(target: Dict) -> Iterator[Tuple[str, str]]:
+    """Пары (измерение, значение) цели - по одной на каждую запись раздела"""
+    for tag in target.get('tags', []):
+        if _clean(tag):
+            yield ("tag", tag.strip())
+    for job in target.get('employment', []):
+        company = _clean(job.get('company'))
+        if company:
+            yield ("company", company)
+    for address in target.get('addresses', []):
+        city = address_city(address)
+        if city:
+            yield ("city", city)
+    for social in target.get('social_media', []):
+        platform = _clean(social.get('platform'))
+        if platform:
+            yield ("platform", platform.lower())
+    for connection in target.get('connections', []):
+        relation = _clean(connection.get('relation') or connection.get('relation_type'))
+        if relation:
+            yield ("relation", relation.lower())
+
+
+class AggregateIndex(Index):
+    """
+    Счетчики групп: (измерение, значение) -> [число целей, число записей]
+
+    Например, ("company", "Сбер") -> [412, 431]: 412 целей работали в Сбере,
+    всего 431 запись о работе там. Индекс помнит вклад каждой цели, поэтому
+    запись цели меняет счетчики на разницу между старой и новой версией,
+    а не пересчитывает группы по всей базе.
+    """
+
+    name = "aggregates"
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._counts: Dict[Tuple[str, str], List[int]] = {}
+        # ID цели -> [(измерение, значение, число записей)]
+        self._contributions: Dict[str, List[Tuple[str, str, int]]] = {}
+
+    def add(self, target: Dict):
+        items: Dict[Tuple[str, str], int] = {}
+        for key in group_values(target):
+            items[key] = items.get(key, 0) + 1
+        for key, items_count in items.items():
+            counts = self._counts.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += items_count
+        if items:
+            self._contributions[target['id']] = [key + (items_count,) for key, items_count in items.items()]
+
+    def remove(self, target_id: str):
+        for dimension, value, items_count in self._contributions.pop(target_id, ()):
+            key = (dimension, value)
+            counts = self._counts[key]
+            counts[0] -= 1
+            counts[1] -= items_count
+            if not counts[0]:
+                del self._counts[key]
+
+    def dump(self):
+        return {'counts': self._counts, 'contributions': self._contributions}
+
+    def load(self, state):
+        self._counts = {key: list(counts) for key, counts in state['counts'].items()}
+        self._contributions = state['contributions']
+
+    def groups(self, dimension: str, limit: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Группы измерения по убыванию числа целей
+
+        Returns:
+            [(значение, число целей, число записей)]
+        """
+        if dimension not in AGGREGATE_DIMENSIONS:
+            raise ValueError(f"Неизвестное измерение: {dimension} "
+                             f"(доступны: {', '.join(AGGREGATE_DIMENSIONS)})")
+        rows = [(value, counts[0], counts[1])
+                for (kind, value), counts in self._counts.items() if kind == dimension]
+        rows.sort(key=lambda row: (-row[1], -row[2], row[0]))
+        return rows if limit is None else rows[:limit]
+
+
+# Регистрация в общем реестре индексов DataManager
+INDEXES[AggregateIndex.name] = AggregateIndex
@@ -0,0 +1,227 @@
+"""
+OSINT Profiler - Async Data Manager
+Асинхронный фасад DataManager для сборщиков на asyncio
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from core.data_manager import DataManager
+from core.profiling import count, span
+
+
+class _WriteOp:
+    """Отложенная операция записи и future ожидающей ее корутины"""
+
+    __slots__ = ('func', 'args', 'future')
+
+    def __init__(self, func: Callable, args: tuple, future: asyncio.Future):
+        self.func = func
+        self.args = args
+        self.future = future
+
+
+class AsyncDataManager:
+    """
+    Асинхронный доступ к базе без блокировки цикла событий
+
+    Чтение, разбор и запись JSON выполняются в выделенном пуле потоков
+    поверх потокобезопасного DataManager. Записи всех корутин попадают в
+    общую очередь, а фоновая задача применяет их пачками (group commit):
+    пачка - это все, что накопилось, пока шла предыдущая запись, и она
+    сохраняется на диск одной перезаписью. Корутина получает результат
+    после того, как ее изменение записано.
+
+    Очередь записей ограничена max_pending (при переполнении записывающие
+    корутины ждут), а число одновременных чтений - max_reads, так что тысячи
+    параллельных сборщиков не раздувают память и пул потоков.
+
+    Пример:
+        async with AsyncDataManager("data/database.json") as adm:
+            target = await adm.get("target_1a2b3c4d")
+            await adm.add_timeline_event(target['id'], event)
+    """
+
+    def __init__(self, db_path: str = "data/database.json",
+                 data_manager: Optional[DataManager] = None, threads: int = 4,
+                 max_pending: int = 10_000, max_reads: int = 64,
+                 batch_size: int = 1000, batch_delay: float = 0.0):
+        """
+        Args:
+            db_path: Путь к базе данных
+            data_manager: Готовый DataManager (должен быть thread_safe=True)
+            threads: Число потоков для операций с базой
+            max_pending: Наибольшее число записей в очереди
+            max_reads: Наибольшее число одновременных чтений
+            batch_size: Наибольшее число записей в одной пачке
+            batch_delay: Сколько ждать пополнения пачки после первой записи,
+                         секунд (0 - брать только уже накопившееся)
+        """
+        if data_manager is not None and not data_manager.thread_safe:
+            raise ValueError("AsyncDataManager требует DataManager(thread_safe=True)")
+        # Фоновый писатель DataManager не пишет сам: пачку сохраняет flush()
+        self.dm = data_manager or DataManager(db_path, thread_safe=True, write_behind=True,
+                                              quiet_period=3600.0, max_delay=3600.0)
+        self.max_pending = max_pending
+        self.max_reads = max_reads
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="osint-async-db")
+        # Очередь и семафор привязаны к циклу событий - создаются в нем
+        self._queue: Optional[asyncio.Queue] = None
+        self._reads: Optional[asyncio.Semaphore] = None
+        self._committer: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def __aenter__(self) -> "AsyncDataManager":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    # ==================== Чтение ====================
+
+    async def _read(self, func: Callable, *args):
+        if self._reads is None:
+            self._reads = asyncio.Semaphore(self.max_reads)
+        async with self._reads:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get(self, target_id: str) -> Optional[Dict]:
+        """Цель по ID (копия) или None"""
+        return await self._read(self.dm.get_target, target_id)
+
+    async def get_all(self) -> List[Dict]:
+        """Все цели (только для чтения)"""
+        return await self._read(self.dm.get_all_targets)
+
+    async def list_targets(self) -> List[Dict]:
+        """Краткий список целей (см. DataManager.list_targets)"""
+        return await self._read(self.dm.list_targets)
+
+    async def search(self, query: str) -> List[Dict]:
+        """Поиск целей (см. DataManager.search_targets)"""
+        return await self._read(self.dm.search_targets, query)
+
+    async def query(self, filters: Dict[str, Any]) -> List[Dict]:
+        """Фильтр по полям (см. DataManager.query)"""
+        return await self._read(self.dm.query, filters)
+
+    async def statistics(self) -> Dict:
+        """Статистика базы"""
+        return await self._read(self.dm.get_statistics)
+
+    # ==================== Запись ====================
+
+    async def _write(self, func: Callable, *args):
+        if self._closed:
+            raise RuntimeError("AsyncDataManager закрыт")
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._committer = asyncio.get_running_loop().create_task(self._commit_loop())
+        future = asyncio.get_running_loop().create_future()
+        # При заполненной очереди корутина ждет здесь (обратное давление)
+        await self._queue.put(_WriteOp(func, args, future))
+        return await future
+
+    async def create(self, target_data: Dict) -> str:
+        """Создает цель, возвращает ее ID"""
+        return await self._write(self.dm.create_target, target_data)
+
+    async def update(self, target_id: str, updates: Dict) -> bool:
+        """Обновляет поля цели"""
+        return await self._write(self.dm.update_target, target_id, updates)
+
+    async def delete(self, target_id: str) -> bool:
+        """Удаляет цель"""
+        return await self._write(self.dm.delete_target, target_id)
+
+    async def add_timeline_event(self, target_id: str, event: Dict) -> bool:
+        """Добавляет событие в таймлайн цели"""
+        return await self._write(self.dm.add_timeline_event, target_id, event)
+
+    async def add_connection(self, target_id: str, connection: Dict) -> bool:
+        """Добавляет связь цели"""
+        return await self._write(self.dm.add_connection, target_id, connection)
+
+    async def bulk_create(self, targets: List[Dict]) -> List[str]:
+        """Создает несколько целей одной операцией"""
+        return await self._write(self.dm.import_targets, targets)
+
+    async def bulk_update(self, updates: Dict[str, Dict]) -> Dict[str, bool]:
+        """Обновляет несколько целей: {id: обновления} -> {id: успех}"""
+        def _update_all():
+            return {target_id: self.dm.update_target(target_id, fields)
+                    for target_id, fields in updates.items()}
+        return await self._write(_update_all)
+
+    def _apply_batch(self, batch: List[_WriteOp]) -> List[tuple]:
+        """
+        Применяет пачку записей и сохраняет ее одной записью (в пуле потоков)
+
+        Returns:
+            [(успех, результат или исключение)] в порядке пачки
+        """
+        results = []
+        with span("async.commit", writes=len(batch)):
+            for op in batch:
+                try:
+                    results.append((True, op.func(*op.args)))
+                except Exception as e:
+                    results.append((False, e))
+            self.dm.flush()
+        count("async.writes", len(batch))
+        return results
+
+    async def _commit_loop(self):
+        """Фоновая задача: собирает записи в пачки и применяет их"""
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if batch[0] is None:
+                return
+            if self.batch_delay:
+                await asyncio.sleep(self.batch_delay)
+            closing = False
+            while len(batch) < self.batch_size and not queue.empty():
+                op = queue.get_nowait()
+                if op is None:
+                    closing = True
+                    break
+                batch.append(op)
+
+            try:
+                results = await loop.run_in_executor(self._executor, self._apply_batch, batch)
+            except Exception as e:
+                # Пачка применена, но не записана на диск
+                results = [(False, e)] * len(batch)
+            for op, (ok, value) in zip(batch, results):
+                if op.future.done():
+                    continue
+                if ok:
+                    op.future.set_result(value)
+                else:
+                    op.future.set_exception(value)
+            if closing:
+                return
+
+    async def flush(self):
+        """Дожидается записи всех изменений, поставленных в очередь до вызова"""
+        if self._queue is not None:
+            await self._write(lambda: None)
+
+    async def close(self):
+        """Записывает очередь, закрывает DataManager и пул потоков"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._queue is not None:
+            await self._queue.put(None)
+            await self._committer
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.dm.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,277 @@
+"""
+OSINT Profiler - Asset Bundler
+Минификация, встраивание и предварительное сжатие статических ресурсов отчетов
+"""
+
+import gzip
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+
+DEFAULT_CSS_FILES = ["css/style.css"]
+DEFAULT_JS_FILES = ["js/network-graph.js", "js/map.js", "js/lazy-sections.js"]
+
+BUNDLE_MODES = ("inline", "shared")
+COMPRESSION_FORMATS = ("gzip", "br")
+
+# Размер пачки BatchWriter и число пачек, ждущих записи
+BATCH_BYTES = 8 * 1024 * 1024
+BATCH_PENDING = 2
+
+# Строковые литералы или блочный комментарий
+_CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_JS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|/\*.*?\*/', re.S)
+
+
+def _strip_comments(text: str, token_re) -> List[str]:
+    """
+    Удаляет блочные комментарии вне строк
+
+    Returns:
+        Список фрагментов: четные - код, нечетные - строковые литералы
+    """
+    parts = []
+    last = 0
+    for match in token_re.finditer(text):
+        code = text[last:match.start()]
+        if match.group(1):
+            parts.extend([code, match.group(1)])
+        else:
+            # Комментарий заменяем пробелом
+            parts.extend([code + " ", ""])
+        last = match.end()
+    parts.append(text[last:])
+    return parts
+
+
+def minify_css(css: str) -> str:
+    """Минифицирует CSS: убирает комментарии и лишние пробелы вне строк"""
+    parts = _strip_comments(css, _CSS_TOKEN_RE)
+    for i in range(0, len(parts), 2):
+        code = re.sub(r"\s+", " ", parts[i])
+        code = re.sub(r"\s*([{};,>])\s*", r"\1", code)
+        code = re.sub(r":\s+", ":", code)
+        parts[i] = code.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def minify_js(js: str) -> str:
+    """
+    Консервативно минифицирует JS
+
+    Удаляет блочные комментарии, строки-комментарии и пустые строки,
+    не трогая переносы строк (чтобы не сломать автоматическую расстановку
+    точек с запятой).
+    """
+    code = "".join(_strip_comments(js, _JS_TOKEN_RE))
+    lines = (line.strip() for line in code.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+class AssetBundle:
+    """Минифицированный набор CSS/JS для пачки отчетов"""
+
+    def __init__(self, css: str, js: str, mode: str = "inline"):
+        if mode not in BUNDLE_MODES:
+            raise ValueError(f"Неизвестный режим бандла: {mode}")
+
+        self.css = css
+        # Закрывающий тег внутри встроенного скрипта оборвал бы <script>
+        self.js = js.replace("</", "<\\/")
+        self.mode = mode
+        self.hash = hashlib.sha256((css + "\0" + js).encode("utf-8")).hexdigest()[:12]
+        self.css_href: Optional[str] = None
+        self.js_href: Optional[str] = None
+
+    @property
+    def inline(self) -> bool:
+        return self.mode == "inline"
+
+    def write_shared(self, output_dir: str, assets_subdir: str = "assets",
+                     compress: Sequence[str] = ()) -> List[str]:
+        """
+        Записывает общий хешированный файл ресурсов (один на все отчеты)
+
+        Файлы адресуются по содержимому, поэтому повторная запись
+        пропускается, если такой бандл уже есть.
+
+        Args:
+            output_dir: Директория с отчетами
+            assets_subdir: Поддиректория для ресурсов
+            compress: Форматы предварительного сжатия
+
+        Returns:
+            Пути к записанным (или уже существующим) файлам
+        """
+        assets_dir = os.path.join(output_dir, assets_subdir)
+        os.makedirs(assets_dir, exist_ok=True)
+
+        paths = []
+        for ext, content in (("css", self.css), ("js", self.js)):
+            filename = f"bundle.{self.hash}.{ext}"
+            path = os.path.join(assets_dir, filename)
+            if not os.path.exists(path):
+                write_file(path, content.encode("utf-8"), compress)
+            paths.append(path)
+            href = f"{assets_subdir}/{filename}"
+            if ext == "css":
+                self.css_href = href
+            else:
+                self.js_href = href
+
+        return paths
+
+
+def build_bundle(static_dir: str = "static", mode: str = "inline",
+                 css_files: Sequence[str] = DEFAULT_CSS_FILES,
+                 js_files: Sequence[str] = DEFAULT_JS_FILES) -> AssetBundle:
+    """
+    Собирает и минифицирует статические ресурсы один раз на пачку отчетов
+
+    Args:
+        static_dir: Директория статических файлов
+        mode: "inline" - встраивать в каждый отчет, "shared" - общий файл
+        css_files: Пути CSS-файлов относительно static_dir
+        js_files: Пути JS-файлов относительно static_dir
+
+    Returns:
+        Собранный бандл
+    """
+    def _read_all(files: Iterable[str]) -> List[str]:
+        contents = []
+        for name in files:
+            path = os.path.join(static_dir, name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    contents.append(f.read())
+        return contents
+
+    css = "".join(minify_css(c) for c in _read_all(css_files))
+    js = ";\n".join(m for m in (minify_js(c) for c in _read_all(js_files)) if m)
+    return AssetBundle(css, js, mode)
+
+
+def check_compression(compress: Sequence[str]) -> tuple:
+    """
+    Проверяет список форматов сжатия
+
+    Raises:
+        ValueError: Если формат неизвестен
+
+    Returns:
+        Форматы, доступные в текущем окружении
+    """
+    for fmt in compress:
+        if fmt not in COMPRESSION_FORMATS:
+            raise ValueError(f"Неизвестный формат сжатия: {fmt}")
+
+    if "br" in compress and brotli is None:
+        print("⚠️  Пакет brotli не установлен, сжатие .br пропущено")
+        return tuple(fmt for fmt in compress if fmt != "br")
+    return tuple(compress)
+
+
+def write_file(path: str, data: bytes, compress: Sequence[str] = ()) -> Dict[str, str]:
+    """
+    Записывает файл и (опционально) его предварительно сжатые копии
+
+    Args:
+        path: Путь к файлу
+        data: Содержимое
+        compress: Форматы сжатия ("gzip", "br") для отдачи веб-сервером
+
+    Returns:
+        Словарь {формат: путь} включая исходный файл под ключом "raw"
+    """
+    with open(path, "wb") as f:
+        f.write(data)
+    written = {"raw": path}
+
+    for fmt in compress:
+        if fmt == "gzip":
+            # mtime=0 - одинаковое содержимое дает одинаковый .gz
+            with open(f"{path}.gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            written[fmt] = f"{path}.gz"
+        elif fmt == "br" and brotli is not None:
+            with open(f"{path}.br", "wb") as f:
+                f.write(brotli.compress(data))
+            written[fmt] = f"{path}.br"
+
+    return written
+
+
+class BatchWriter:
+    """
+    Пакетная запись файлов отчетов в фоновом потоке
+
+    Файлы копятся в пачку до batch_bytes и пишутся (со сжатыми копиями)
+    отдельным потоком, пока вызывающий код рендерит следующие отчеты.
+    Ждущих записи пачек не больше pending: если диск не успевает, write
+    ждет, а не копит отчеты в памяти. Ошибки записи не прерывают пачку -
+    их возвращает close().
+    """
+
+    def __init__(self, compress: Sequence[str] = (), batch_bytes: int = BATCH_BYTES,
+                 pending: int = BATCH_PENDING):
+        self.compress = tuple(compress)
+        self.batch_bytes = batch_bytes
+        self.pending = pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-writer")
+        self._batch: List[Tuple[str, bytes]] = []
+        self._size = 0
+        self._futures = []
+        self.errors: List[Tuple[str, str]] = []
+
+    def write(self, path: str, data: bytes):
+        """Добавляет файл в пачку (записан будет позже)"""
+        self._batch.append((path, data))
+        self._size += len(data)
+        if self._size >= self.batch_bytes:
+            self.flush()
+
+    def flush(self):
+        """Отдает накопленную пачку на запись"""
+        if self._batch:
+            self._futures.append(self._executor.submit(self._write_batch, self._batch, self.compress))
+            self._batch = []
+            self._size = 0
+        while len(self._futures) > self.pending:
+            self.errors.extend(self._futures.pop(0).result())
+
+    @staticmethod
+    def _write_batch(batch: List[Tuple[str, bytes]], compress: Sequence[str]) -> List[Tuple[str, str]]:
+        errors = []
+        for path, data in batch:
+            try:
+                write_file(path, data, compress)
+            except OSError as e:
+                errors.append((path, str(e)))
+        return errors
+
+    def close(self) -> List[Tuple[str, str]]:
+        """
+        Дописывает все пачки и останавливает поток
+
+        Returns:
+            [(путь, текст ошибки)] для файлов, которые не удалось записать
+        """
+        self.pending = 0
+        self.flush()
+        self._executor.shutdown(wait=True)
+        return self.errors
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
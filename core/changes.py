@@ -0,0 +1,424 @@
+"""
+OSINT Profiler - Change Feed
+Журнал изменений базы (последовательные номера, надгробия) и слияние
+изменений между копиями базы
+"""
+
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from core.concurrency import file_lock, temp_path
+from core.derived import DERIVED_FIELD
+from core.profiling import span
+
+CHANGES_FORMAT = "osint-profiler-changes"
+MERGE_STRATEGIES = ("lww", "field")
+
+
+class ChangeLog:
+    """
+    Журнал изменений в формате JSON Lines
+
+    Каждая мутация получает монотонный номер seq:
+        {"seq": 12, "op": "put", "id": ..., "at": ..., "origin": ..., "target": {...}}
+        {"seq": 13, "op": "delete", "id": ..., "at": ..., "origin": ...}
+    Записи лежат в файле по возрастанию seq, поэтому чтение «с номера N»
+    находит начало бинарным поиском по смещениям и не разбирает весь файл.
+
+    Рядом хранится файл состояния: ID реплики, закладки пиров (до какого
+    номера применены их изменения) и надгробия удаленных целей.
+
+    Дописывают журнал по очереди под блокировкой файла <журнал>.lock:
+    номер последней записи перечитывается под ней, так что параллельные
+    процессы не выдают одинаковых номеров.
+    """
+
+    def __init__(self, log_path: str, state_path: str):
+        self.log_path = log_path
+        self.state_path = state_path
+        self.lock_path = f"{log_path}.lock"
+        self._state_mtime = None
+        self._log_stat = None
+        self.state = self._load_state()
+        self.last_seq = self._read_last_seq()
+
+    @classmethod
+    def for_database(cls, db_path: str) -> "ChangeLog":
+        """Журнал рядом с БД: <db>.changes.jsonl или <директория>/changes.jsonl"""
+        if os.path.isdir(db_path):
+            base = os.path.join(db_path, "changes")
+            state = os.path.join(db_path, "sync.json")
+        else:
+            base = os.path.splitext(db_path)[0] + ".changes"
+            state = os.path.splitext(db_path)[0] + ".sync.json"
+        return cls(base + ".jsonl", state)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.log_path)
+
+    @property
+    def replica(self) -> str:
+        return self.state['replica']
+
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_path):
+            self._state_mtime = os.stat(self.state_path).st_mtime_ns
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'replica': uuid.uuid4().hex[:12], 'peers': {}, 'tombstones': {}}
+
+    def save_state(self):
+        tmp_path = temp_path(self.state_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+        self._state_mtime = os.stat(self.state_path).st_mtime_ns
+
+    def refresh(self):
+        """Перечитывает номер и состояние, если журнал дописал другой процесс"""
+        if self._stat_log() != self._log_stat:
+            self.last_seq = self._read_last_seq()
+        if os.path.exists(self.state_path) and os.stat(self.state_path).st_mtime_ns != self._state_mtime:
+            self.state = self._load_state()
+
+    def _stat_log(self):
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read_last_seq(self) -> int:
+        """Номер последней записи (читается только хвост файла)"""
+        self._log_stat = self._stat_log()
+        if self._log_stat is None:
+            return 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            chunk = 1 << 16
+            while True:
+                start = max(end - chunk, 0)
+                f.seek(start)
+                lines = f.read(end - start).splitlines()
+                if len(lines) > 1 or start == 0:
+                    break
+                chunk *= 2
+        for line in reversed(lines):
+            if line.strip():
+                return json.loads(line)['seq']
+        return 0
+
+    def append(self, records: Iterable[Dict]) -> int:
+        """
+        Дописывает записи, назначая им номера
+
+        Returns:
+            Номер последней записи
+        """
+        records = list(records)
+        if not records:
+            return self.last_seq
+        with span("changes.append", records=len(records)), file_lock(self.lock_path):
+            self._append_locked(records)
+            # Номер берется под блокировкой: после нее журнал может дописать другой поток
+            return self.last_seq
+
+    def _append_locked(self, records: List[Dict]):
+        """Дописывает записи (под блокировкой журнала)"""
+        # Журнал мог дописать другой процесс
+        if self._stat_log() != self._log_stat:
+            self.last_seq = self._read_last_seq()
+        lines = []
+        for record in records:
+            self.last_seq += 1
+            lines.append(json.dumps(dict(record, seq=self.last_seq), ensure_ascii=False))
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            if lines:
+                f.write("\n".join(lines) + "\n")
+        self._log_stat = self._stat_log()
+
+    def start(self, baseline: Callable[[], Iterable[Dict]]) -> bool:
+        """
+        Создает журнал, если его еще нет, с записями baseline() - базовыми
+        версиями уже существующих целей
+
+        Returns:
+            True, если журнал создан этим вызовом
+        """
+        with file_lock(self.lock_path):
+            if self.exists:
+                self.refresh()
+                return False
+            self._append_locked(list(baseline()))
+            self.save_state()
+        return True
+
+    def _seek(self, f, seq: int):
+        """
+        Ставит файл на начало строки, не позже первой записи с номером больше seq
+
+        Бинарный поиск по смещениям: середина интервала выравнивается на
+        начало следующей строки, по ее номеру отбрасывается половина файла.
+        Остаток (меньше окна) дочитывается линейно в since().
+        """
+        best = 0
+        low, high = 0, os.fstat(f.fileno()).st_size
+        while high - low > 4096:
+            middle = (low + high) // 2
+            f.seek(middle)
+            f.readline()  # дочитываем строку, в середину которой попали
+            position = f.tell()
+            line = f.readline()
+            if not line.strip():
+                high = middle
+            elif json.loads(line)['seq'] <= seq:
+                best = position
+                low = position + len(line)
+            else:
+                high = middle
+        f.seek(best)
+
+    def since(self, seq: int = 0) -> Iterator[Dict]:
+        """Записи с номером больше seq в порядке номеров"""
+        if not self.exists or seq >= self.last_seq:
+            return
+        with open(self.log_path, 'rb') as f:
+            self._seek(f, seq)
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record['seq'] > seq:
+                        yield record
+
+    def compact(self) -> int:
+        """
+        Оставляет в журнале только последнюю запись по каждой цели
+
+        Номера записей сохраняются, поэтому закладки пиров остаются
+        корректными: состояние, полученное с любого номера, не меняется.
+
+        Returns:
+            Число удаленных записей
+        """
+        with file_lock(self.lock_path):
+            self.refresh()
+            latest: Dict[str, int] = {}
+            total = 0
+            for record in self.since(0):
+                latest[record['id']] = record['seq']
+                total += 1
+
+            tmp_path = temp_path(self.log_path)
+            with open(tmp_path, 'w', encoding='utf-8') as out:
+                for record in self.since(0):
+                    if latest[record['id']] == record['seq']:
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.log_path)
+            self._log_stat = self._stat_log()
+        return total - len(latest)
+
+
+def export_payload(log: ChangeLog, since: int = 0, exclude_origin: Optional[str] = None) -> Dict:
+    """
+    Формирует пакет изменений с номера since
+
+    По каждой цели в пакет попадает только последнее изменение, так что
+    размер пакета пропорционален числу измененных целей, а не мутаций.
+    Для пополевого слияния в пакет добавляются базовые версии
+    ('bases': {ID: цель}) - последние версии целей не новее since, которые
+    получатель уже видел; после сжатия журнала базы может не быть.
+
+    Args:
+        log: Журнал изменений
+        since: Номер, после которого нужны изменения
+        exclude_origin: Не включать изменения, пришедшие от этой реплики
+                        (их не нужно отправлять обратно)
+    """
+    latest: Dict[str, Dict] = {}
+    for record in log.since(since):
+        latest.pop(record['id'], None)
+        if record.get('origin') != exclude_origin:
+            latest[record['id']] = record
+
+    bases: Dict[str, Dict] = {}
+    puts = {target_id for target_id, record in latest.items() if record['op'] == 'put'}
+    if since > 0 and puts:
+        for record in log.since(0):
+            if record['seq'] > since:
+                break
+            if record['id'] in puts:
+                if record['op'] == 'put':
+                    bases[record['id']] = record['target']
+                else:
+                    bases.pop(record['id'], None)
+    return {
+        'format': CHANGES_FORMAT,
+        'replica': log.replica,
+        'since': since,
+        'until': log.last_seq,
+        'changes': list(latest.values()),
+        'bases': bases,
+    }
+
+
+def write_payload(payload: Dict, path: str):
+    """Сохраняет пакет изменений (.gz - со сжатием)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+
+def read_payload(path: str) -> Dict:
+    """Читает пакет изменений, сохраненный write_payload"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('format') != CHANGES_FORMAT:
+        raise ValueError(f"{path}: это не пакет изменений OSINT Profiler")
+    return payload
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _merge_value(local, remote, prefer_remote: bool):
+    """Слияние значения поля: словари - по ключам, списки - объединением"""
+    if local == remote:
+        return local
+    if isinstance(local, dict) and isinstance(remote, dict):
+        merged = dict(local)
+        for key, value in remote.items():
+            merged[key] = _merge_value(local[key], value, prefer_remote) if key in local else value
+        return merged
+    if isinstance(local, list) and isinstance(remote, list):
+        seen = {_canonical(item) for item in local}
+        return local + [item for item in remote if _canonical(item) not in seen]
+    return remote if prefer_remote else local
+
+
+# Нет поля (в одной из версий или в базовой)
+_MISSING = object()
+
+
+def _merge_value3(local, remote, base, prefer_remote: bool):
+    """
+    Трехстороннее слияние значения поля относительно базовой версии
+
+    Изменение одной стороны берется как есть (в том числе удаление поля),
+    словари сливаются по ключам, списки - по добавленным и удаленным
+    элементам; при изменении скаляра обеими сторонами побеждает более
+    поздняя версия.
+    """
+    if local == remote or remote == base:
+        return local
+    if local == base:
+        return remote
+    if isinstance(local, dict) and isinstance(remote, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(local) + [key for key in remote if key not in local]:
+            value = _merge_value3(local.get(key, _MISSING), remote.get(key, _MISSING),
+                                  base.get(key, _MISSING), prefer_remote)
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if isinstance(local, list) and isinstance(remote, list):
+        base_items = {_canonical(item) for item in base} if isinstance(base, list) else set()
+        local_items = {_canonical(item) for item in local}
+        remote_items = {_canonical(item) for item in remote}
+        # Элементы базы, удаленные одной из сторон, не возвращаются
+        kept = [item for item in local
+                if _canonical(item) not in base_items or _canonical(item) in remote_items]
+        added = [item for item in remote
+                 if _canonical(item) not in local_items and _canonical(item) not in base_items]
+        return kept + added
+    return remote if prefer_remote else local
+
+
+def merge_targets(local: Dict, remote: Dict, base: Optional[Dict] = None) -> Dict:
+    """
+    Пополевое слияние двух версий цели
+
+    С базовой версией (общим предком, см. export_payload) слияние
+    трехстороннее: поле, измененное только одной стороной, берется из нее,
+    так что правки разных полей не затирают друг друга, а удаления
+    элементов списков переносятся. Без базы записи списков (таймлайн, связи,
+    соцсети, цифровой след, теги) обеих версий объединяются, а поля
+    словарей сливаются по ключам. При конфликте скалярных значений
+    побеждает версия с более поздним updated_at. Производные поля (блок
+    derived) не сливаются: их пересчитывает DataManager.
+    """
+    prefer_remote = (remote.get('updated_at') or '') > (local.get('updated_at') or '')
+    local_data = {key: value for key, value in local.items() if key != DERIVED_FIELD}
+    remote_data = {key: value for key, value in remote.items() if key != DERIVED_FIELD}
+    if base is not None:
+        base_data = {key: value for key, value in base.items() if key != DERIVED_FIELD}
+        merged = _merge_value3(local_data, remote_data, base_data, prefer_remote)
+    else:
+        merged = _merge_value(local_data, remote_data, prefer_remote)
+    merged['created_at'] = min(filter(None, (local.get('created_at'), remote.get('created_at'))),
+                               default=None)
+    merged['updated_at'] = max(local.get('updated_at') or '', remote.get('updated_at') or '')
+    if merged == local_data:
+        return local
+    if merged == remote_data:
+        return remote
+    # Новая версия отличается от обеих - она должна победить при следующей синхронизации
+    merged['updated_at'] = datetime.now().isoformat()
+    return merged
+
+
+def resolve(local: Optional[Dict], tombstone: Optional[str], change: Dict,
+            strategy: str = "lww", base: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Решает, как применить одно входящее изменение
+
+    Args:
+        local: Локальная версия цели или None
+        tombstone: Время локального удаления цели или None
+        change: Входящая запись журнала
+        strategy: "lww" - последняя запись побеждает целиком,
+                  "field" - пополевое слияние (merge_targets)
+        base: Базовая версия цели для пополевого слияния (из пакета)
+
+    Returns:
+        {'op': 'put', 'target': ...} / {'op': 'delete'} или None, если
+        локальная версия новее
+    """
+    if strategy not in MERGE_STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия слияния: {strategy}")
+
+    if change['op'] == 'delete':
+        if local is None or (local.get('updated_at') or '') > change['at']:
+            return None
+        return {'op': 'delete'}
+
+    remote = change['target']
+    remote_at = remote.get('updated_at') or ''
+    if local is None:
+        if tombstone is not None and tombstone >= remote_at:
+            return None
+        return {'op': 'put', 'target': remote}
+
+    if strategy == "field":
+        merged = merge_targets(local, remote, base)
+        return None if merged == local else {'op': 'put', 'target': merged}
+
+    if remote_at > (local.get('updated_at') or ''):
+        return {'op': 'put', 'target': remote}
+    return None
+
+
+def summarize_changes(changes: List[Dict]) -> Dict[str, int]:
+    """Число изменений пакета по типам операций"""
+    summary = {'put': 0, 'delete': 0}
+    for change in changes:
+        summary[change['op']] = summary.get(change['op'], 0) + 1
+    return summary
@@ -0,0 +1,199 @@
+"""
+OSINT Profiler - Concurrency
+Блокировки для многопоточной работы с DataManager: читатели-писатель,
+блокировки отдельных целей и межпроцессная блокировка файла
+"""
+
+import itertools
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка через msvcrt
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+class RWLock:
+    """
+    Блокировка «много читателей или один писатель»
+
+    Писатель имеет приоритет: пока он ждет, новые читатели не входят, так что
+    поток поисков не может бесконечно откладывать запись. Блокировка
+    повторно входима: поток-писатель может читать, поток-читатель - читать
+    снова. Повысить чтение до записи нельзя (это взаимоблокировка двух
+    таких потоков) - будет RuntimeError.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        depth = getattr(self._local, 'reads', 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError("Нельзя повысить блокировку чтения до записи")
+
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class KeyedLocks:
+    """
+    Повторно входимые блокировки по ключу (ID цели)
+
+    Блокировка создается при первом запросе и удаляется, когда ее больше
+    никто не держит и не ждет, так что словарь не растет с числом целей.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        # ключ -> [RLock, число потоков, держащих или ждущих блокировку]
+        self._locks: Dict[str, List] = {}
+
+    @contextmanager
+    def hold(self, key: str):
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.RLock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @contextmanager
+    def hold_many(self, keys: Iterable[str]):
+        """Блокирует несколько ключей в порядке сортировки (без взаимоблокировок)"""
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                stack.enter_context(self.hold(key))
+            yield
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Эксклюзивная блокировка между процессами на файле path
+
+    Файл блокировки создается при первом обращении и не удаляется.
+    Блокировка не повторно входима: процесс, взявший ее, не должен брать
+    ее снова (в том числе из другого потока - тот просто подождет).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK сам повторяет попытки 10 секунд, затем OSError
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Номера временных файлов в этом процессе
+_temp_numbers = itertools.count()
+
+
+def temp_path(path: str) -> str:
+    """
+    Имя временного файла для атомарной замены path
+
+    Имя уникально для процесса (PID) и записи в нем, так что параллельные
+    писатели не пишут в один временный файл и не переименовывают чужой.
+    """
+    return f"{path}.tmp.{os.getpid()}.{next(_temp_numbers)}"
+
+
+class _NullRWLock:
+    """RWLock для однопоточного режима: ничего не блокирует"""
+
+    @contextmanager
+    def read(self):
+        yield
+
+    write = read
+
+
+class _NullKeyedLocks:
+    """KeyedLocks для однопоточного режима"""
+
+    @contextmanager
+    def hold(self, key: str):
+        yield
+
+    @contextmanager
+    def hold_many(self, keys: Iterable[str]):
+        yield
+
+
+NULL_RWLOCK = _NullRWLock()
+NULL_KEYED_LOCKS = _NullKeyedLocks()
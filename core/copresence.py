@@ -0,0 +1,234 @@
+"""
+OSINT Profiler - Co-presence
+Поиск целей, которые были в одном месте в один день (или в пределах окна):
+внешняя сортировка событий и потоковое соединение слиянием
+"""
+
+import heapq
+import marshal
+import os
+import re
+import tempfile
+from collections import Counter, deque
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.profiling import count, span
+
+# Места, которые не означают физического присутствия
+NON_PLACES = {"online", "онлайн", "удаленно", "remote", "интернет", "internet", "n/a", "-"}
+# Вес совпадения по источнику цифрового следа относительно места из таймлайна
+FOOTPRINT_WEIGHT = 0.5
+# Событий в памяти до сброса отсортированной порции на диск
+SORT_CHUNK = 500_000
+# Событий в одной записи marshal во временном файле порции
+RUN_BATCH = 4096
+# Наибольшее число событий в окне одного места: массовые события (сотни
+# целей в одном месте за день) не сопоставляются попарно
+MAX_GROUP = 500
+
+# (ключ места, номер дня, ID цели, вид события)
+Event = Tuple[str, int, str, str]
+
+
+def normalize_location(value: str, city_only: bool = False) -> Optional[str]:
+    """
+    Ключ места: без регистра, пунктуации и лишних пробелов, ё -> е
+
+    Args:
+        value: Место из события
+        city_only: Только часть до первой запятой (обычно город)
+    """
+    text = value.casefold().replace("ё", "е")
+    if city_only:
+        text = text.split(",")[0]
+    text = re.sub(r"[^\w\s,-]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip(" ,-")
+    if not text or text in NON_PLACES:
+        return None
+    return text
+
+
+def _day(value) -> Optional[int]:
+    """Номер дня даты YYYY-MM-DD (неполные даты не годятся для совпадений)"""
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def target_events(target: Dict, city_only: bool = False, footprint: bool = True) -> Iterator[Event]:
+    """События цели с местом и полной датой: таймлайн и (по желанию) цифровой след"""
+    for event in target.get('timeline', []):
+        day = _day(event.get('date'))
+        place = normalize_location(event['location'], city_only) if isinstance(event.get('location'), str) else None
+        if day is not None and place:
+            yield (f"place:{place}", day, target['id'], event.get('category') or 'timeline')
+    if footprint:
+        for item in target.get('digital_footprint', []):
+            day = _day(item.get('date'))
+            source = item.get('source')
+            if day is not None and isinstance(source, str) and source.strip():
+                yield (f"source:{source.strip().casefold()}", day, target['id'], 'footprint')
+
+
+def _spill(events: List[Event], directory: Optional[str]) -> str:
+    """
+    Записывает отсортированную порцию событий во временный файл
+
+    События пишутся marshal пачками по RUN_BATCH: места, ID и виды событий
+    берутся из данных целей и могут содержать любые символы.
+    """
+    with tempfile.NamedTemporaryFile('wb', suffix='.run', prefix='osint-copresence-',
+                                     dir=directory, delete=False) as f:
+        for start in range(0, len(events), RUN_BATCH):
+            marshal.dump(events[start:start + RUN_BATCH], f)
+    count("copresence.spilled_events", len(events))
+    return f.name
+
+
+def _read_run(path: str) -> Iterator[Event]:
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = marshal.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def sorted_events(events: Iterable[Event], chunk_size: int = SORT_CHUNK,
+                  directory: Optional[str] = None) -> Iterator[Event]:
+    """
+    События по возрастанию (место, день, цель) с ограниченной памятью
+
+    В памяти держится не больше chunk_size событий: заполненная порция
+    сортируется и сбрасывается во временный файл, в конце порции сливаются
+    heapq.merge. Если все события уместились в одну порцию, диск не нужен.
+    """
+    runs: List[str] = []
+    try:
+        buffer: List[Event] = []
+        for event in events:
+            buffer.append(event)
+            if len(buffer) >= chunk_size:
+                buffer.sort()
+                runs.append(_spill(buffer, directory))
+                buffer = []
+        buffer.sort()
+        if not runs:
+            yield from buffer
+            return
+        yield from heapq.merge(*(_read_run(path) for path in runs), iter(buffer))
+    finally:
+        for path in runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class PairStats:
+    """Накопленные совпадения пары целей"""
+
+    __slots__ = ('score', 'matches', 'first', 'last', 'places')
+
+    def __init__(self):
+        self.score = 0.0
+        self.matches = 0
+        self.first: Optional[int] = None
+        self.last: Optional[int] = None
+        self.places: Counter = Counter()
+
+    def add(self, place: str, first: int, last: int, weight: float):
+        self.score += weight
+        self.matches += 1
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+        self.places[place] += 1
+
+
+def find_copresence(events: Iterable[Event], window_days: int = 0, max_group: int = MAX_GROUP,
+                    target_id: Optional[str] = None) -> Dict[Tuple[str, str], PairStats]:
+    """
+    Соединение слиянием по отсортированным событиям
+
+    Проход держит только окно событий текущего места за последние
+    window_days дней: каждое новое событие сопоставляется с событиями
+    окна других целей. Вес совпадения - 1 / (1 + разница в днях), для
+    цифрового следа - с множителем FOOTPRINT_WEIGHT.
+
+    Args:
+        events: События, отсортированные по (место, день, цель) - см. sorted_events
+        window_days: Допустимая разница дат, дней (0 - один день)
+        max_group: Наибольшее число событий окна (см. MAX_GROUP)
+        target_id: Собирать только пары с этой целью
+
+    Returns:
+        {(ID, ID): PairStats} для пар с хотя бы одним совпадением
+    """
+    pairs: Dict[Tuple[str, str], PairStats] = {}
+    window: deque = deque()
+    current_place = None
+    previous = None
+    with span("copresence.join", window=window_days):
+        for place, day, own_id, kind in events:
+            key = (place, day, own_id)
+            if key == previous:
+                continue  # то же место и день у той же цели
+            previous = key
+            if place != current_place:
+                current_place = place
+                window.clear()
+            while window and window[0][0] < day - window_days:
+                window.popleft()
+
+            if len(window) >= max_group:
+                count("copresence.crowded_events")
+                continue
+
+            label = place.split(":", 1)[1]
+            for other_day, other_id, other_kind in window:
+                if other_id == own_id or (target_id is not None and target_id not in (own_id, other_id)):
+                    continue
+                weight = 1.0 / (1 + day - other_day)
+                if 'footprint' in (kind, other_kind):
+                    weight *= FOOTPRINT_WEIGHT
+                pair = (other_id, own_id) if other_id < own_id else (own_id, other_id)
+                stats = pairs.get(pair)
+                if stats is None:
+                    stats = pairs[pair] = PairStats()
+                stats.add(label, other_day, day, weight)
+            window.append((day, own_id, kind))
+    return pairs
+
+
+def copresence_table(pairs: Dict[Tuple[str, str], PairStats], limit: int = 20,
+                     target_id: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Ранжированная таблица совпадений по каждой цели
+
+    Returns:
+        {ID цели: [{'target_id', 'score', 'matches', 'first', 'last',
+        'places'}]} по убыванию score, не больше limit строк на цель
+        (только для target_id, если он задан)
+    """
+    rows: Dict[str, List[Dict]] = {}
+    for (first_id, second_id), stats in pairs.items():
+        for own, other in ((first_id, second_id), (second_id, first_id)):
+            if target_id is not None and own != target_id:
+                continue
+            rows.setdefault(own, []).append({
+                'target_id': other,
+                'score': round(stats.score, 4),
+                'matches': stats.matches,
+                'first': date.fromordinal(stats.first).isoformat(),
+                'last': date.fromordinal(stats.last).isoformat(),
+                'places': [place for place, _ in stats.places.most_common(5)],
+            })
+    for own in rows:
+        rows[own].sort(key=lambda row: (-row['score'], row['target_id']))
+        del rows[own][limit:]
+    return rows
@@ -3,35 +3,179 @@ OSINT Profiler - Data Manager
 Модуль для работы с базой данных (CRUD операции)
 """
 
-import json
-import os
+import copy
+import shutil
+import threading
+from collections import Counter
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 import uuid
 
+from core.aggregates import AggregateIndex  # noqa: F401 - регистрирует индекс "aggregates"
+from core.changes import ChangeLog, export_payload, resolve
+from core.derived import derived, is_current, materialize
+from core.copresence import SORT_CHUNK, copresence_table, find_copresence, sorted_events, target_events
+from core.concurrency import NULL_KEYED_LOCKS, NULL_RWLOCK, KeyedLocks, RWLock
+from core.indexes import INDEXES, Index, index_path, load_index, save_index
+from core.profiling import span, traced
+from core.similarity import SimilarityIndex  # noqa: F401 - регистрирует индекс "similarity"
+from core.storage import BufferedStorage, Snapshot, migrate, open_storage
+
+# Наибольшее отставание индекса (записей журнала), которое догоняется по
+# журналу изменений; при большем индекс перестраивается по всей базе
+INDEX_CATCH_UP_LIMIT = 10_000
+
 
 class DataManager:
-    """Класс для управления базой данных OSINT-целей"""
+    """
+    Класс для управления базой данных OSINT-целей
+
+    В потокобезопасном режиме (thread_safe=True) один DataManager можно
+    использовать из пула потоков: чтения идут параллельно под общей
+    блокировкой, изменения разных целей - параллельно под блокировками
+    отдельных целей, а запись на диск выполняет один фоновый поток,
+    объединяющий накопившиеся изменения (core.storage.BufferedStorage).
+
+    В режиме отложенной записи (write_behind=True) изменения пишутся на
+    диск после паузы quiet_period (но не позже max_delay), так что серия
+    правок в интерактивной сессии дает одну перезапись файла.
+    """
     
-    def __init__(self, db_path: str = "data/database.json"):
+    def __init__(self, db_path: str = "data/database.json", storage=None, changes: bool = True,
+                 thread_safe: bool = False, write_behind: bool = False,
+                 quiet_period: float = 1.0, max_delay: float = 5.0):
+        """
+        Args:
+            db_path: Путь к JSON-файлу БД, директории шардов или
+                     директории с файлами целей и каталогом
+            storage: Готовое хранилище (см. core.storage), вместо db_path
+            changes: Вести журнал изменений рядом с БД (см. core.changes)
+            thread_safe: Потокобезопасный режим с фоновой записью
+                         (изменения на диске - после flush()/close())
+            write_behind: Отложенная запись: сохранять после паузы в изменениях
+            quiet_period: Пауза без изменений перед записью, секунд
+            max_delay: Наибольшая задержка записи, секунд
+        """
         self.db_path = db_path
-        self._ensure_db_exists()
-    
-    def _ensure_db_exists(self):
-        """Создает файл БД если его нет"""
-        if not os.path.exists(self.db_path):
-            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            self._save_data({"targets": []})
-    
-    def _load_data(self) -> Dict:
-        """Загружает данные из JSON"""
-        with open(self.db_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    def _save_data(self, data: Dict):
-        """Сохраняет данные в JSON"""
-        with open(self.db_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.storage = storage if storage is not None else open_storage(db_path)
+        self.changes = ChangeLog.for_database(db_path) if changes else None
+        self.thread_safe = thread_safe
+        if thread_safe or write_behind:
+            # Записи журнала уходят на диск тем же проходом писателя, что и данные
+            self.storage = BufferedStorage(self.storage, quiet_period if write_behind else 0.0, max_delay,
+                                           journal=self._write_journal if self.changes is not None else None)
+        if thread_safe:
+            self._lock = RWLock()
+            self._target_locks = KeyedLocks()
+        else:
+            self._lock = NULL_RWLOCK
+            self._target_locks = NULL_KEYED_LOCKS
+        # Индексы строятся при первом запросе и далее обновляются записями
+        self._indexes: Dict[str, Index] = {}
+        self._index_guard = threading.Lock()
+        # Запись журнала изменений и надгробий идет вне блокировки записи
+        self._journal_lock = threading.Lock()
+
+    def flush(self):
+        """Дожидается записи на диск всех сделанных изменений"""
+        if isinstance(self.storage, BufferedStorage):
+            self.storage.flush()
+
+    def close(self):
+        """Записывает изменения и индексы, останавливает фоновую запись"""
+        if isinstance(self.storage, BufferedStorage):
+            self.storage.close()
+        self.save_indexes()
+
+    def __enter__(self) -> "DataManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def change_log(self) -> ChangeLog:
+        """
+        Журнал изменений; при первом обращении к новому журналу в него
+        записывается базовая версия всех уже существующих целей
+        """
+        log = self.changes
+        if log is None:
+            raise RuntimeError("Журнал изменений для этой БД отключен")
+        with self._lock.write():
+            log.refresh()
+            if not log.exists:
+                # Базовая версия - то, что уже на диске: незаписанные изменения
+                # попадут в журнал вместе со своей пачкой
+                storage = self.storage.base if isinstance(self.storage, BufferedStorage) else self.storage
+                with span("changes.baseline"):
+                    log.start(lambda: ({'op': 'put', 'id': target['id'], 'at': target.get('updated_at', ''),
+                                        'origin': log.replica, 'target': target}
+                                       for target in storage.all()))
+        return log
+
+    def _publish(self, puts: List[Dict] = (), deleted: List[str] = ()) -> int:
+        """
+        Публикует новые версии целей в хранилище и индексы
+
+        Блокировка записи держится только на время вставки в хранилище (при
+        фоновой записи - в словарь в памяти) и обновления индексов: чтение и
+        изменение цели идут до этого под блокировкой самой цели, а журнал
+        дописывается после (_journal).
+
+        Returns:
+            Число удаленных целей
+        """
+        with self._lock.write():
+            before = self._index_version()
+            if puts:
+                self.storage.put_many(puts)
+            removed = self.storage.delete_many(deleted) if deleted else 0
+            self._reindex(before, puts=puts, deleted=deleted)
+        return removed
+
+    def _journal(self, records: List[Dict]):
+        """
+        Записывает изменения в журнал
+
+        Вызывается после _publish, под блокировкой затронутых целей (но не
+        под блокировкой записи), так что записи одной цели идут по порядку.
+        При фоновой записи записи копятся вместе с изменениями (по одной на
+        цель) и дописываются тем же проходом писателя сразу после пачки
+        данных, иначе - сразу.
+        """
+        if self.changes is None or not records:
+            return
+        if not self.changes.exists:
+            # Новый журнал начинается с базовой версии (под блокировкой записи)
+            self.change_log()
+        if isinstance(self.storage, BufferedStorage):
+            self.storage.append_records(records)
+        else:
+            self._write_journal(records)
+
+    def _write_journal(self, records: List[Dict]):
+        """Дописывает записи в журнал изменений и обновляет надгробия"""
+        log = self.changes
+        with self._journal_lock:
+            last = log.append(records)
+            tombstones = log.state['tombstones']
+            changed = False
+            for record in records:
+                if record['op'] == 'delete':
+                    tombstones[record['id']] = record['at']
+                    changed = True
+                elif tombstones.pop(record['id'], None) is not None:
+                    changed = True
+            if changed:
+                log.save_state()
+        self._advance_indexes(last - len(records), last)
+
+    def _local_puts(self, targets: List[Dict]) -> List[Dict]:
+        """Записи журнала о новых версиях целей, созданных локально"""
+        replica = self.changes.replica if self.changes is not None else None
+        return [{'op': 'put', 'id': target['id'], 'at': target['updated_at'],
+                 'origin': replica, 'target': target} for target in targets]
     
     def create_target(self, target_data: Dict) -> str:
         """
@@ -43,8 +187,37 @@ class DataManager:
         Returns:
             ID созданной цели
         """
-        data = self._load_data()
+        self._stamp_new(target_data)
+        with self._target_locks.hold(target_data['id']):
+            self._publish(puts=[target_data])
+            self._journal(self._local_puts([target_data]))
         
+        return target_data['id']
+
+    def import_targets(self, targets: List[Dict]) -> List[str]:
+        """
+        Создает несколько целей одной записью хранилища
+
+        В отличие от create_target в цикле, файл БД (или каждый затронутый
+        шард) переписывается один раз на всю пачку.
+
+        Args:
+            targets: Список словарей с данными целей
+
+        Returns:
+            ID созданных целей
+        """
+        for target_data in targets:
+            self._stamp_new(target_data)
+        ids = [target_data['id'] for target_data in targets]
+        with self._target_locks.hold_many(ids):
+            self._publish(puts=targets)
+            self._journal(self._local_puts(targets))
+        return [target_data['id'] for target_data in targets]
+
+    @staticmethod
+    def _stamp_new(target_data: Dict):
+        """Назначает ID (если его нет) и временные метки новой цели"""
         # Генерируем ID если его нет
         if 'id' not in target_data:
             target_data['id'] = f"target_{uuid.uuid4().hex[:8]}"
@@ -53,11 +226,7 @@ class DataManager:
         now = datetime.now().isoformat()
         target_data['created_at'] = now
         target_data['updated_at'] = now
-        
-        data['targets'].append(target_data)
-        self._save_data(data)
-        
-        return target_data['id']
+        materialize(target_data)
     
     def get_target(self, target_id: str) -> Optional[Dict]:
         """
@@ -67,25 +236,77 @@ class DataManager:
             target_id: ID цели
             
         Returns:
-            Словарь с данными цели или None
+            Словарь с данными цели (копия, которую можно изменять) или None
         """
-        data = self._load_data()
-        
-        for target in data['targets']:
-            if target['id'] == target_id:
-                return target
-        
-        return None
+        with self._lock.read():
+            target = self.storage.get(target_id)
+        return copy.deepcopy(target) if target is not None else None
     
     def get_all_targets(self) -> List[Dict]:
         """
         Получает список всех целей
         
         Returns:
-            Список словарей с данными целей
+            Список словарей с данными целей (только для чтения -
+            для изменения используйте get_target/update_target)
+        """
+        with self._lock.read():
+            return self.storage.all()
+
+    def list_targets(self) -> List[Dict]:
+        """
+        Краткий список целей: id, full_name, birth_date, tags, updated_at
+        и счетчики разделов stats (из блока derived)
+
+        Для хранилища-директории читается только каталог, без файлов целей.
         """
-        data = self._load_data()
-        return data['targets']
+        with self._lock.read():
+            return self.storage.summaries()
+
+    def iter_targets(self, partition: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Перебирает цели по одной (только для чтения)
+
+        Используется потоковой обработкой (сводный отчет, агрегаты), которой
+        не нужен список всех целей целиком. Цели читаются по частям
+        хранилища (шардам) одной версии базы: части закрепляются при первом
+        шаге перебора, а читаются по одной, так что в памяти не собирается
+        общий список.
+
+        Args:
+            partition: Номер части хранилища (см. partition_count) -
+                       перебрать только ее
+        """
+        with self._lock.read():
+            partitions = self.storage.partitions()
+        if partition is not None:
+            partitions = [partitions[partition]]
+        for part in partitions:
+            yield from part.all()
+
+    def snapshot(self) -> "DataManager":
+        """
+        Закрепляет текущую версию базы для длинного чтения
+
+        Возвращает DataManager только для чтения поверх неизменяемого среза
+        хранилища (core.storage.Snapshot): отчеты, поиск и статистика по нему
+        видят одну согласованную версию, даже если базу параллельно меняют
+        другие пользователи или процессы. Запись в срез не допускается,
+        а писателей срез не блокирует.
+        """
+        with span("db.snapshot"), self._lock.read():
+            return DataManager(self.db_path, storage=self.storage.snapshot(), changes=False)
+
+    @property
+    def version(self):
+        """Версия данных хранилища (меняется при каждой записи)"""
+        with self._lock.read():
+            return self.storage.signature()
+
+    def partition_count(self) -> int:
+        """Число независимых частей хранилища (шардов) для параллельной обработки"""
+        with self._lock.read():
+            return len(self.storage.partitions())
     
     def update_target(self, target_id: str, updates: Dict) -> bool:
         """
@@ -98,18 +319,21 @@ class DataManager:
         Returns:
             True если обновление прошло успешно
         """
-        data = self._load_data()
-        
-        for i, target in enumerate(data['targets']):
-            if target['id'] == target_id:
-                # Обновляем поля
-                target.update(updates)
-                target['updated_at'] = datetime.now().isoformat()
-                data['targets'][i] = target
-                self._save_data(data)
-                return True
-        
-        return False
+        with self._target_locks.hold(target_id):
+            with self._lock.read():
+                current = self.storage.get(target_id)
+            if current is None:
+                return False
+
+            # Обновляем поля в новой копии: ранее выданные списки целей не меняются
+            target = dict(current)
+            target.update(updates)
+            target['id'] = target_id
+            target['updated_at'] = datetime.now().isoformat()
+            materialize(target)
+            self._publish(puts=[target])
+            self._journal(self._local_puts([target]))
+        return True
     
     def delete_target(self, target_id: str) -> bool:
         """
@@ -121,19 +345,426 @@ class DataManager:
         Returns:
             True если удаление прошло успешно
         """
-        data = self._load_data()
-        
-        for i, target in enumerate(data['targets']):
-            if target['id'] == target_id:
-                data['targets'].pop(i)
-                self._save_data(data)
-                return True
-        
-        return False
+        with self._target_locks.hold(target_id):
+            if not self._publish(deleted=[target_id]):
+                return False
+            if self.changes is not None:
+                self._journal([{'op': 'delete', 'id': target_id, 'at': datetime.now().isoformat(),
+                                'origin': self.changes.replica}])
+        return True
+
+    def export_changes(self, since: int = 0, exclude_origin: Optional[str] = None) -> Dict:
+        """
+        Пакет изменений базы после номера since (см. core.changes.export_payload)
+
+        Args:
+            since: Номер последнего уже полученного изменения
+            exclude_origin: ID реплики-получателя - ее собственные
+                            изменения в пакет не попадают
+        """
+        with span("changes.export", since=since):
+            # Отложенные изменения попадают в журнал только при записи
+            self.flush()
+            log = self.change_log()
+            with self._lock.read():
+                return export_payload(log, since, exclude_origin)
+
+    def apply_changes(self, payload: Dict, strategy: str = "lww") -> Dict[str, int]:
+        """
+        Применяет пакет изменений другой копии базы
+
+        Входящие версии сохраняются со своими метками времени (без
+        перештамповки), удаления оставляют надгробия, а конфликт
+        разрешается стратегией strategy ("lww" или "field"). Примененные
+        изменения попадают в локальный журнал с исходной репликой, так что
+        их можно передать дальше. Закладка пира сдвигается на payload['until'].
+
+        Returns:
+            Счетчики: {'put', 'delete', 'skipped'}
+        """
+        # Надгробия отложенных удалений появляются только при записи в журнал
+        self.flush()
+        log = self.change_log()
+        if payload.get('replica') == log.replica:
+            raise ValueError("Пакет изменений создан этой же копией базы")
+
+        tombstones = log.state['tombstones']
+        bases = payload.get('bases', {})
+        puts: List[Dict] = []
+        deleted: List[str] = []
+        records: List[Dict] = []
+        # Удаления целей, которых здесь уже нет: только надгробие, без записи в журнал
+        buried: Dict[str, str] = {}
+        result = {'put': 0, 'delete': 0, 'skipped': 0}
+        ids = [change['id'] for change in payload['changes']]
+
+        with span("changes.apply", changes=len(ids)), self._target_locks.hold_many(ids):
+            for change in payload['changes']:
+                target_id = change['id']
+                with self._lock.read():
+                    local = self.storage.get(target_id)
+                decision = resolve(local, tombstones.get(target_id), change, strategy,
+                                   bases.get(target_id))
+                if decision is None:
+                    if change['op'] == 'delete' and change['at'] > tombstones.get(target_id, ''):
+                        # Цели здесь уже нет - запоминаем удаление, чтобы не воскресить ее
+                        buried[target_id] = change['at']
+                    result['skipped'] += 1
+                    continue
+
+                if decision['op'] == 'delete':
+                    deleted.append(target_id)
+                    records.append(change)
+                    result['delete'] += 1
+                    continue
+
+                target = materialize(decision['target'])
+                puts.append(target)
+                if target is change['target']:
+                    records.append(change)
+                else:
+                    # Результат слияния - новая локальная версия
+                    records.append({'op': 'put', 'id': target_id, 'at': target['updated_at'],
+                                    'origin': log.replica, 'target': target})
+                result['put'] += 1
+
+            self._publish(puts=puts, deleted=deleted)
+            self._journal([{key: value for key, value in record.items() if key != 'seq'}
+                           for record in records])
+            # Закладка сдвигается, только когда примененное уже записано
+            self.flush()
+            with self._journal_lock:
+                log.state['tombstones'].update(buried)
+                log.state['peers'][payload['replica']] = payload['until']
+                log.save_state()
+        return result
+
+    def clone(self, destination: str, storage) -> "DataManager":
+        """
+        Создает копию базы для другого аналитика
+
+        Копия получает журнал изменений источника и собственный ID реплики,
+        а закладки обеих сторон ставятся на текущий номер - первая
+        синхронизация передаст только изменения, сделанные после копирования.
+
+        Args:
+            destination: Путь к новой базе
+            storage: Пустое хранилище по этому пути
+
+        Returns:
+            DataManager копии
+        """
+        self.flush()
+        log = self.change_log()
+        migrate(self.storage, storage)
+        clone = DataManager(destination, storage=storage)
+        shutil.copyfile(log.log_path, clone.changes.log_path)
+        clone.changes.refresh()
+        clone.changes.state['peers'][log.replica] = log.last_seq
+        clone.changes.save_state()
+        log.state['peers'][clone.changes.replica] = log.last_seq
+        log.save_state()
+        return clone
+
+    def _data_version(self, refresh: bool = True) -> tuple:
+        """
+        Версия данных, с которой сверяются индексы
+
+        ('log', реплика, номер) - номер журнала изменений, его дописывает
+        каждая запись, в том числе из других процессов; без журнала -
+        ('storage', сигнатура хранилища).
+        """
+        log = self.changes
+        if log is not None:
+            if refresh:
+                log.refresh()
+            if log.exists:
+                return ('log', log.replica, log.last_seq)
+        return ('storage', self.storage.signature())
+
+    def _index_version(self) -> Optional[tuple]:
+        """Версия данных до записи (None, если индексов нет - тогда она не нужна)"""
+        return self._data_version() if self._indexes else None
+
+    def _reindex(self, before, puts: List[Dict] = (), deleted: List[str] = ()):
+        """
+        Переносит запись в построенные индексы (под блокировкой записи)
+
+        Запись переносится в каждый индекс, в том числе отставший (его догонит
+        _catch_up по текущему содержимому хранилища). Версию по журналу
+        сдвигает _advance_indexes, когда записи журнала дописаны; без журнала
+        версия - сигнатура хранилища и сдвигается здесь, если индекс не
+        отставал еще до этой записи.
+        """
+        if not self._indexes:
+            return
+        after = self._data_version(refresh=False)
+        for index in self._indexes.values():
+            with span("index.update", index=index.name):
+                index.update(puts, deleted)
+            if after[0] == 'storage' and index.version == before:
+                index.version = after
+            index.dirty = True
+
+    def _advance_indexes(self, start: int, end: int):
+        """
+        Сдвигает версию индексов с номера start на end - записи журнала,
+        дописанные этим DataManager (их изменения уже в индексах)
+
+        Индекс другой версии не трогается: между ними есть чужие записи,
+        его догонит _catch_up.
+        """
+        if not self._indexes:
+            return
+        replica = self.changes.replica
+        with self._index_guard:
+            for index in self._indexes.values():
+                if index.version == ('log', replica, start):
+                    index.version = ('log', replica, end)
+
+    @staticmethod
+    def _can_catch_up(current: Optional[tuple], version: tuple) -> bool:
+        """
+        Можно ли догнать индекс версии current до version по журналу (нельзя:
+        другая база или реплика, журнал начат заново, отставание больше
+        INDEX_CATCH_UP_LIMIT)
+        """
+        return bool(current and current[0] == 'log' and version[0] == 'log'
+                    and current[1] == version[1] and current[2] < version[2]
+                    and version[2] - current[2] <= INDEX_CATCH_UP_LIMIT)
+
+    def _catch_up(self, index: Index, version: tuple) -> bool:
+        """
+        Догоняет индекс до версии version по журналу изменений
+
+        Returns:
+            False, если это невозможно (см. _can_catch_up)
+        """
+        current = index.version
+        if not self._can_catch_up(current, version):
+            return False
+        with span("index.catch_up", index=index.name, records=version[2] - current[2]):
+            # Содержимое - из хранилища, а не из записей: журнал дописывается
+            # после публикации, и в индексе может быть версия новее записи
+            ids = dict.fromkeys(record['id'] for record in self.changes.since(current[2]))
+            targets = {target_id: self.storage.get(target_id) for target_id in ids}
+            index.update([target for target in targets.values() if target is not None],
+                         [target_id for target_id, target in targets.items() if target is None])
+        index.version = version
+        index.dirty = True
+        return True
+
+    def _index(self, name: str) -> Index:
+        """
+        Индекс name, согласованный с текущей версией базы (вызывать под
+        блокировкой чтения)
+
+        Порядок: индекс в памяти, файл индекса рядом с базой; отставший
+        индекс догоняется по журналу изменений, иначе строится заново.
+        В многопоточном режиме индекс в памяти могут в этот момент обходить
+        другие читатели, поэтому догоняется его копия, которая затем
+        подменяет его под _index_guard.
+        """
+        with self._index_guard:
+            version = self._data_version()
+
+            def usable(saved: tuple) -> bool:
+                # Та же версия или та же реплика журнала (догоним по нему)
+                return saved == version or (saved[0] == version[0] == 'log' and saved[1] == version[1])
+
+            index = self._indexes.get(name)
+            shared = index is not None and self.thread_safe
+            if index is None and self.changes is not None:
+                index = load_index(index_path(self.db_path, name), INDEXES[name], usable)
+            if index is not None and index.version != version:
+                if not self._can_catch_up(index.version, version):
+                    index = None
+                else:
+                    if shared:
+                        index = index.copy()
+                    self._catch_up(index, version)
+            if index is None:
+                index = self._build_index(name, version)
+            self._indexes[name] = index
+        return index
+
+    def _build_index(self, name: str, version: tuple) -> Index:
+        """Строит индекс name по всей базе за один проход"""
+        index = INDEXES[name]()
+        with span("index.build", index=name):
+            index.build(self.storage.all())
+        index.version = version
+        index.dirty = True
+        return index
+
+    def rebuild_index(self, name: str):
+        """Перестраивает индекс name заново (например, после правки файлов в обход DataManager)"""
+        with self._lock.read(), self._index_guard:
+            self._indexes[name] = self._build_index(name, self._data_version())
+
+    def save_indexes(self):
+        """
+        Сохраняет измененные индексы в файлы рядом с базой
+
+        Следующий запуск загрузит их вместо перестроения (и догонит по
+        журналу изменений, если базу меняли). Для срезов и баз без журнала
+        изменений индексы не сохраняются.
+        """
+        if self.changes is None or not self._indexes:
+            return
+        with self._lock.read(), self._index_guard:
+            for index in self._indexes.values():
+                if index.dirty:
+                    save_index(index_path(self.db_path, index.name), index)
+                    index.dirty = False
+
+    @traced("db.pivot")
+    def pivot(self, kind: str, value: str) -> List[Dict]:
+        """
+        Цели с общим идентификатором
+
+        Значение нормализуется так же, как при индексации: телефон - к виду
+        +79215551234, email и логины - без регистра (логины - без @),
+        номер машины - латиницей без пробелов.
+
+        Args:
+            kind: Тип идентификатора: phone, email, handle или plate
+            value: Значение в любой записи
+
+        Returns:
+            Список целей (только для чтения), у каждой в '_pivot_sources' -
+            поля, где найден идентификатор
+        """
+        with self._lock.read():
+            matches = self._index("pivot").lookup(kind, value)
+            results = []
+            for target_id, sources in matches.items():
+                target = self.storage.get(target_id)
+                if target is not None:
+                    results.append(dict(target, _pivot_sources=sources))
+        return results
+
+    @traced("db.shared_identifiers")
+    def shared_identifiers(self, kind: Optional[str] = None, min_targets: int = 2) -> List[Dict]:
+        """
+        Идентификаторы, которые встречаются у нескольких целей
+
+        Args:
+            kind: Только этот тип идентификатора (по умолчанию - все)
+            min_targets: Наименьшее число целей с идентификатором
+
+        Returns:
+            [{'kind', 'value', 'targets': {ID цели: поля}}] по убыванию
+            числа целей
+        """
+        with self._lock.read():
+            return self._index("pivot").shared(kind, min_targets)
+
+    @traced("db.tag_query")
+    def tag_query(self, expression: str) -> List[Dict]:
+        """
+        Цели, теги которых удовлетворяют выражению
+
+        Выражение над тегами с AND/&, OR/|, NOT/! и скобками (см.
+        core.indexes.TagIndex.evaluate), например "moscow AND (it OR finance)
+        AND NOT archived". Вычисляется над битовыми картами тегов.
+
+        Returns:
+            Список целей (только для чтения)
+        """
+        with self._lock.read():
+            index = self._index("tags")
+            ids = index.ids(index.evaluate(expression))
+            return [target for target in map(self.storage.get, ids) if target is not None]
+
+    def tag_count(self, expression: str) -> int:
+        """Число целей, удовлетворяющих выражению над тегами (без чтения целей)"""
+        with self._lock.read():
+            index = self._index("tags")
+            return index.count(index.evaluate(expression))
+
+    def tag_counts(self) -> List[tuple]:
+        """[(тег, число целей)] по убыванию"""
+        with self._lock.read():
+            return self._index("tags").counts()
+
+    def related_tags(self, tag: str, limit: int = 10) -> List[tuple]:
+        """
+        Теги, чаще всего встречающиеся вместе с tag
+
+        Returns:
+            [(тег, число целей с обоими тегами)] по убыванию
+        """
+        with self._lock.read():
+            index = self._index("tags")
+            return index.cooccurring(index.bitmap(tag), limit, exclude=[tag])
+
+    @traced("db.similar")
+    def similar_targets(self, target_id: str, limit: int = 20) -> Optional[List[Dict]]:
+        """
+        Цели, наиболее похожие на target_id (см. core.similarity)
+
+        Сходство - косинус TF-IDF векторов общих тегов, работодателей,
+        учебных заведений, городов, платформ и связей.
+
+        Returns:
+            Список целей (только для чтения) по убыванию сходства, у каждой
+            '_similarity' (0..1) и '_shared_features' ("тип:значение"), или
+            None, если цель не найдена
+        """
+        with self._lock.read():
+            matches = self._index("similarity").similar(target_id, limit)
+            if matches is None:
+                return None
+            results = []
+            for other_id, score, shared in matches:
+                target = self.storage.get(other_id)
+                if target is not None:
+                    results.append(dict(target, _similarity=score, _shared_features=shared))
+        return results
+
+    @traced("db.similarity_pairs")
+    def similarity_pairs(self, limit: int = 5) -> Dict[str, List[tuple]]:
+        """
+        Для каждой цели - limit самых похожих (попарный режим)
+
+        Returns:
+            {ID: [(ID похожей цели, сходство)]}
+        """
+        with self._lock.read():
+            return self._index("similarity").all_pairs(limit)
+
+    @traced("db.aggregate")
+    def aggregate(self, dimension: str, limit: Optional[int] = None) -> List[tuple]:
+        """
+        Число целей по группам измерения (см. core.aggregates)
+
+        Счетчики поддерживаются при каждой записи и сохраняются с остальными
+        индексами, так что запрос не обходит базу.
+
+        Args:
+            dimension: tag, company, city, platform или relation
+            limit: Наибольшее число групп
+
+        Returns:
+            [(значение, число целей, число записей)] по убыванию числа целей
+        """
+        with self._lock.read():
+            return self._index("aggregates").groups(dimension, limit)
+
+    def peer_seq(self, replica: str) -> int:
+        """Номер последнего примененного изменения реплики replica"""
+        if self.changes is None:
+            return 0
+        return self.changes.state['peers'].get(replica, 0)
     
+    @traced("db.search")
     def search_targets(self, query: str) -> List[Dict]:
         """
         Ищет цели по запросу (в именах, тегах, заметках)
+
+        Поиск идет по индексу (core.indexes.SearchIndex); срез базы,
+        который живет один запрос, перебирает цели без индекса.
         
         Args:
             query: Поисковый запрос
@@ -141,11 +772,15 @@ class DataManager:
         Returns:
             Список найденных целей
         """
-        data = self._load_data()
         results = []
         query_lower = query.lower()
+        with self._lock.read():
+            if not isinstance(self.storage, Snapshot):
+                ids = [target_id for target_id, _ in self._index("search").search(query)]
+                return [target for target in map(self.storage.get, ids) if target is not None]
+            targets = self.storage.all()
         
-        for target in data['targets']:
+        for target in targets:
             # Ищем в имени
             if 'personal' in target and 'full_name' in target['personal']:
                 if query_lower in target['personal']['full_name'].lower():
@@ -163,7 +798,208 @@ class DataManager:
                 results.append(target)
         
         return results
-    
+
+    @traced("db.search_summaries")
+    def search_summaries(self, query: str) -> List[Dict]:
+        """
+        Поиск как search_targets, но только ID и имена целей
+
+        Отвечает по индексу поиска, не читая саму базу: при сохраненном
+        актуальном индексе это миллисекунды даже для большой базы.
+
+        Returns:
+            [{'id', 'full_name'}]
+        """
+        with self._lock.read():
+            return [{'id': target_id, 'full_name': name}
+                    for target_id, name in self._index("search").search(query)]
+
+    @traced("db.query")
+    def query(self, filters: Dict[str, Any]) -> List[Dict]:
+        """
+        Фильтрует цели по значениям полей
+
+        Ключ фильтра - путь к полю через точку (например, "personal.gender"
+        или "social_media.platform"). Строки сравниваются без учёта регистра,
+        для списков достаточно совпадения любого элемента.
+
+        Args:
+            filters: Словарь {путь к полю: ожидаемое значение}
+
+        Returns:
+            Список целей, удовлетворяющих всем фильтрам
+        """
+        with self._lock.read():
+            targets = self.storage.all()
+        return [
+            target for target in targets
+            if all(self._field_matches(target, path.split('.'), expected)
+                   for path, expected in filters.items())
+        ]
+
+    def _field_matches(self, value: Any, path: List[str], expected: Any) -> bool:
+        """Проверяет, содержит ли поле по пути ожидаемое значение"""
+        if isinstance(value, list):
+            return any(self._field_matches(item, path, expected) for item in value)
+
+        if path:
+            if not isinstance(value, dict) or path[0] not in value:
+                return False
+            return self._field_matches(value[path[0]], path[1:], expected)
+
+        if isinstance(value, str) and isinstance(expected, str):
+            return value.lower() == expected.lower()
+        return value == expected or str(value) == str(expected)
+
+    def get_statistics(self) -> Dict:
+        """
+        Считает статистику по базе данных за один проход
+
+        Returns:
+            Словарь с агрегированными показателями
+        """
+        with self._lock.read():
+            targets = self.storage.all()
+
+        total_connections = 0
+        total_addresses = 0
+        total_social = 0
+        tag_counter: Counter = Counter()
+        newest = None
+        last_updated = None
+
+        for target in targets:
+            stats = derived(target)['stats']
+            total_connections += stats['connections']
+            total_addresses += stats['addresses']
+            total_social += stats['social_accounts']
+            tag_counter.update(target.get('tags', []))
+
+            if newest is None or target.get('created_at', '') > newest.get('created_at', ''):
+                newest = target
+            if last_updated is None or target.get('updated_at', '') > last_updated.get('updated_at', ''):
+                last_updated = target
+
+        def _label(target: Optional[Dict]) -> str:
+            if not target:
+                return 'N/A'
+            name = target.get('personal', {}).get('full_name', 'N/A')
+            return f"{name} ({target['id']})"
+
+        return {
+            'total_targets': len(targets),
+            'total_connections': total_connections,
+            'total_addresses': total_addresses,
+            'total_social_accounts': total_social,
+            'avg_social_accounts': total_social / len(targets) if targets else 0,
+            'newest_target': _label(newest),
+            'last_updated': _label(last_updated),
+            'most_common_tags': tag_counter.most_common(),
+        }
+
+    def refresh_derived(self) -> int:
+        """
+        Пересчитывает блоки derived у целей, где его нет или он другой версии
+
+        Нужен после обновления программы или правки файлов в обход
+        DataManager; обычные записи поддерживают блок сами. Содержимое целей
+        и updated_at не меняются, поэтому в журнал изменений пересчет не
+        попадает (копии базы пересчитывают блок при применении изменений).
+
+        Returns:
+            Число обновленных целей
+        """
+        with span("db.refresh_derived"), self._lock.write():
+            stale = [materialize(dict(target)) for target in self.storage.all() if not is_current(target)]
+            if stale:
+                self.storage.put_many(stale)
+        return len(stale)
+
+    def get_neighbors(self, target_id: str) -> Optional[List[Dict]]:
+        """
+        Возвращает соседей цели в графе связей
+
+        Исходящие связи берутся из connections самой цели, входящие - из
+        connections других целей, указывающих на её полное имя. Если имя
+        связи совпадает с именем другой цели, в запись добавляется её ID.
+
+        Args:
+            target_id: ID цели
+
+        Returns:
+            Список соседей или None, если цель не найдена
+        """
+        with self._lock.read():
+            targets = self.storage.all()
+        ids_by_name: Dict[str, str] = {}
+        target = None
+
+        for item in targets:
+            name = item.get('personal', {}).get('full_name', '')
+            if name:
+                ids_by_name.setdefault(name.lower(), item['id'])
+            if item['id'] == target_id:
+                target = item
+
+        if target is None:
+            return None
+
+        neighbors = []
+        for connection in target.get('connections', []):
+            neighbors.append({
+                'name': connection.get('name', ''),
+                'relation': connection.get('relation', ''),
+                'strength': connection.get('strength', 0),
+                'target_id': ids_by_name.get(connection.get('name', '').lower()),
+                'direction': 'out'
+            })
+
+        own_name = target.get('personal', {}).get('full_name', '').lower()
+        if own_name:
+            for item in targets:
+                if item['id'] == target_id:
+                    continue
+                for connection in item.get('connections', []):
+                    if connection.get('name', '').lower() == own_name:
+                        neighbors.append({
+                            'name': item.get('personal', {}).get('full_name', ''),
+                            'relation': connection.get('relation', ''),
+                            'strength': connection.get('strength', 0),
+                            'target_id': item['id'],
+                            'direction': 'in'
+                        })
+
+        return neighbors
+
+    @traced("db.copresence")
+    def copresence(self, window_days: int = 0, target_id: Optional[str] = None, limit: int = 20,
+                   city_only: bool = False, footprint: bool = True,
+                   chunk_size: int = SORT_CHUNK) -> Dict[str, List[Dict]]:
+        """
+        Цели, бывавшие в одном месте в один день (см. core.copresence)
+
+        События таймлайна с местом и цифрового следа с источником читаются
+        из среза базы по частям, сортируются внешней сортировкой (в памяти -
+        не больше chunk_size событий) и соединяются слиянием за один проход.
+
+        Args:
+            window_days: Допустимая разница дат, дней
+            target_id: Только совпадения этой цели
+            limit: Строк на цель
+            city_only: Сравнивать места по городу (часть до первой запятой)
+            footprint: Учитывать цифровой след (совпадение источника и дня)
+            chunk_size: Событий в памяти при сортировке
+
+        Returns:
+            {ID цели: [{'target_id', 'score', 'matches', 'first', 'last',
+            'places'}]} по убыванию score
+        """
+        snapshot = self.snapshot()
+        events = (event for target in snapshot.iter_targets()
+                  for event in target_events(target, city_only, footprint))
+        pairs = find_copresence(sorted_events(events, chunk_size), window_days, target_id=target_id)
+        return copresence_table(pairs, limit, target_id)
+
     def add_timeline_event(self, target_id: str, event: Dict) -> bool:
         """
         Добавляет событие в таймлайн цели
@@ -175,20 +1011,23 @@ class DataManager:
         Returns:
             True если добавление прошло успешно
         """
-        target = self.get_target(target_id)
-        
-        if not target:
-            return False
-        
-        if 'timeline' not in target:
-            target['timeline'] = []
-        
-        target['timeline'].append(event)
-        
-        # Сортируем по дате
-        target['timeline'].sort(key=lambda x: x['date'])
-        
-        return self.update_target(target_id, target)
+        # Чтение и запись - под блокировкой цели, чтобы параллельные
+        # добавления не затирали друг друга
+        with self._target_locks.hold(target_id):
+            target = self.get_target(target_id)
+            
+            if not target:
+                return False
+            
+            if 'timeline' not in target:
+                target['timeline'] = []
+            
+            target['timeline'].append(event)
+            
+            # Сортируем по дате
+            target['timeline'].sort(key=lambda x: x['date'])
+            
+            return self.update_target(target_id, target)
     
     def add_connection(self, target_id: str, connection: Dict) -> bool:
         """
@@ -201,17 +1040,18 @@ class DataManager:
         Returns:
             True если добавление прошло успешно
         """
-        target = self.get_target(target_id)
-        
-        if not target:
-            return False
-        
-        if 'connections' not in target:
-            target['connections'] = []
-        
-        target['connections'].append(connection)
-        
-        return self.update_target(target_id, target)
+        with self._target_locks.hold(target_id):
+            target = self.get_target(target_id)
+            
+            if not target:
+                return False
+            
+            if 'connections' not in target:
+                target['connections'] = []
+            
+            target['connections'].append(connection)
+            
+            return self.update_target(target_id, target)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+"""
+OSINT Profiler - Derived Fields
+Производные поля цели (счетчики разделов, возраст, текущие работа и адрес),
+которые вычисляются при записи и хранятся в цели блоком "derived"
+"""
+
+from datetime import date, datetime
+from typing import Dict, Optional
+
+# Версия блока: при изменении набора или смысла полей увеличивается, и
+# блоки старой версии вычисляются заново при чтении (и при refresh_derived)
+DERIVED_VERSION = 1
+DERIVED_FIELD = "derived"
+
+
+def age_on(birth_date: Optional[str], today: Optional[date] = None) -> int:
+    """Полных лет на дату today (0, если дата рождения не задана или неверна)"""
+    if not birth_date:
+        return 0
+    try:
+        # Используем replace для корректной обработки Z-суффикса
+        birth = datetime.fromisoformat(birth_date.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return 0
+    today = today or date.today()
+    age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+    return max(0, age)
+
+
+def _current(items, prefer_type: Optional[str] = None) -> Optional[Dict]:
+    """Незавершенная запись (без end_date) с самой поздней датой начала"""
+    current = [item for item in items if isinstance(item, dict) and not item.get('end_date')]
+    if not current:
+        return None
+    return max(current, key=lambda item: (item.get('type') == prefer_type, item.get('start_date') or ''))
+
+
+def compute_derived(target: Dict, today: Optional[date] = None) -> Dict:
+    """
+    Вычисляет блок производных полей цели
+
+    Returns:
+        {'version', 'computed_on', 'stats': {счетчики разделов}, 'age',
+        'current_employer', 'current_address'}
+    """
+    today = today or date.today()
+    assets = target.get('assets') or {}
+    job = _current(target.get('employment', []))
+    address = _current(target.get('addresses', []), prefer_type='residence')
+    return {
+        'version': DERIVED_VERSION,
+        'computed_on': today.isoformat(),
+        'stats': {
+            'social_accounts': len(target.get('social_media', [])),
+            'connections': len(target.get('connections', [])),
+            'addresses': len(target.get('addresses', [])),
+            'jobs': len(target.get('employment', [])),
+            'education': len(target.get('education', [])),
+            'family': len(target.get('family', [])),
+            'assets': len(assets.get('vehicles', [])) + len(assets.get('property', [])),
+            'timeline': len(target.get('timeline', [])),
+            'digital_footprint': len(target.get('digital_footprint', [])),
+            'tags': len(target.get('tags', [])),
+        },
+        'age': age_on(target.get('personal', {}).get('birth_date'), today),
+        'current_employer': {key: job.get(key) for key in ('company', 'position', 'location', 'start_date')}
+        if job else None,
+        'current_address': {key: address.get(key) for key in ('address', 'type', 'start_date')}
+        if address else None,
+    }
+
+
+def materialize(target: Dict) -> Dict:
+    """
+    Записывает в цель свежий блок derived (перед сохранением)
+
+    Устаревший блок "stats" прежних версий удаляется: счетчики теперь
+    хранятся в derived и обновляются при каждой записи.
+    """
+    target.pop('stats', None)
+    target[DERIVED_FIELD] = compute_derived(target)
+    return target
+
+
+def derived(target: Dict) -> Dict:
+    """
+    Блок производных полей для чтения
+
+    Сохраненный блок текущей версии возвращается как есть; если он
+    вычислен в другой день, пересчитывается только возраст. Цели без блока
+    (или со старой версией) считаются на лету.
+    """
+    block = target.get(DERIVED_FIELD)
+    if not isinstance(block, dict) or block.get('version') != DERIVED_VERSION:
+        return compute_derived(target)
+    today = date.today()
+    if block.get('computed_on') != today.isoformat():
+        block = dict(block, computed_on=today.isoformat(),
+                     age=age_on(target.get('personal', {}).get('birth_date'), today))
+    return block
+
+
+def is_current(target: Dict) -> bool:
+    """Есть ли в цели сохраненный блок текущей версии"""
+    block = target.get(DERIVED_FIELD)
+    return isinstance(block, dict) and block.get('version') == DERIVED_VERSION and 'stats' not in target
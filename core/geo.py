@@ -0,0 +1,219 @@
+"""
+OSINT Profiler - Geo Clustering
+Сбор точек адресов и событий и иерархическая кластеризация по уровням масштаба
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+
+# Точка: (lat, lon, подпись, тип)
+Point = Tuple[float, float, str, str]
+
+
+def _valid_coordinates(coordinates: Optional[Dict]) -> Optional[Tuple[float, float]]:
+    """Возвращает (lat, lon), если координаты заданы и не нулевые"""
+    if not coordinates:
+        return None
+    try:
+        lat = float(coordinates.get('lat') or 0)
+        lon = float(coordinates.get('lon') or 0)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if (lat == 0 and lon == 0) or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def collect_points(target: Dict, label_prefix: str = "") -> List[Point]:
+    """
+    Собирает точки цели: адреса с координатами и события таймлайна
+
+    Координаты события берутся из его поля coordinates, а если их нет -
+    из адресов цели, в тексте которых встречается location события
+    (при нескольких совпадениях - их центр).
+
+    Args:
+        target: Данные цели
+        label_prefix: Префикс подписи (например, имя цели в сводном отчете)
+
+    Returns:
+        Список точек (lat, lon, подпись, тип)
+    """
+    points: List[Point] = []
+    located_addresses = []
+
+    for address in target.get('addresses', []):
+        coords = _valid_coordinates(address.get('coordinates'))
+        if coords is None:
+            continue
+        text = address.get('address', '')
+        located_addresses.append((text.lower(), coords))
+        points.append((coords[0], coords[1], label_prefix + text, 'address'))
+
+    for event in target.get('timeline', []):
+        coords = _valid_coordinates(event.get('coordinates'))
+        location = (event.get('location') or '').strip().lower()
+        if coords is None and location:
+            matches = [c for text, c in located_addresses if location in text]
+            if matches:
+                coords = (sum(c[0] for c in matches) / len(matches),
+                          sum(c[1] for c in matches) / len(matches))
+        if coords is None:
+            continue
+        label = f"{event.get('date', '')} {event.get('event', '')}".strip()
+        points.append((coords[0], coords[1], label_prefix + label, 'event'))
+
+    return points
+
+
+def _project(lat: float, lon: float) -> Tuple[float, float]:
+    """Проекция Web Mercator в мировые координаты [0, 1]"""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    sin = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return x, y
+
+
+def _unproject(x: float, y: float) -> Tuple[float, float]:
+    """Обратная проекция Web Mercator"""
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+class _Cluster:
+    """Кластер в мировых координатах (взвешенный центр)"""
+
+    __slots__ = ('x', 'y', 'count', 'label', 'kind')
+
+    def __init__(self, x: float, y: float, count: int, label: Optional[str], kind: Optional[str]):
+        self.x = x
+        self.y = y
+        self.count = count
+        self.label = label
+        self.kind = kind
+
+
+class GridClusterer:
+    """
+    Потоковая иерархическая кластеризация точек по сетке
+
+    Точки добавляются по одной и сразу сводятся в ячейки сетки уровня
+    max_zoom, поэтому память ограничена числом занятых ячеек, а не числом
+    точек. Каждый следующий (более мелкий) уровень строится из кластеров
+    предыдущего, общая сложность - O(n + ячейки * число уровней). Кластеры
+    уровня раскладываются по тайлам z/x/y, чтобы клиент рендерил только
+    видимые тайлы.
+    """
+
+    def __init__(self, min_zoom: int = 0, max_zoom: int = 14, radius: int = 40):
+        """
+        Args:
+            min_zoom: Минимальный уровень масштаба
+            max_zoom: Максимальный уровень масштаба с кластеризацией
+            radius: Радиус кластера в пикселях
+        """
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self._cell = radius / (TILE_SIZE * 2 ** max_zoom)
+        self._cells: Dict[Tuple[int, int], _Cluster] = {}
+        self._bounds = [90.0, 180.0, -90.0, -180.0]
+
+    def add(self, lat: float, lon: float, label: Optional[str] = None, kind: Optional[str] = None):
+        """Добавляет точку"""
+        x, y = _project(lat, lon)
+        key = (int(x / self._cell), int(y / self._cell))
+        cluster = self._cells.get(key)
+        if cluster is None:
+            self._cells[key] = _Cluster(x, y, 1, label, kind)
+        else:
+            # Накопленный центр масс; подпись есть только у одиночной точки
+            count = cluster.count + 1
+            cluster.x += (x - cluster.x) / count
+            cluster.y += (y - cluster.y) / count
+            cluster.count = count
+            cluster.label = cluster.kind = None
+
+        bounds = self._bounds
+        bounds[0], bounds[2] = min(bounds[0], lat), max(bounds[2], lat)
+        bounds[1], bounds[3] = min(bounds[1], lon), max(bounds[3], lon)
+
+    def add_points(self, points: Iterable[Point]):
+        """Добавляет набор точек (lat, lon, подпись, тип)"""
+        for lat, lon, label, kind in points:
+            self.add(lat, lon, label, kind)
+
+    def result(self) -> Optional[Dict]:
+        """
+        Returns:
+            {'min_zoom', 'max_zoom', 'bounds', 'levels': {z: {"x:y": [[lat, lon, count, подпись, тип]]}}}
+            или None, если точек нет
+        """
+        if not self._cells:
+            return None
+
+        clusters = list(self._cells.values())
+        levels: Dict[int, Dict[str, List]] = {}
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            if zoom < self.max_zoom:
+                clusters = self._merge(clusters, self.radius / (TILE_SIZE * 2 ** zoom))
+            levels[zoom] = self._tiles(clusters, zoom)
+
+        south, west, north, east = self._bounds
+        return {
+            'min_zoom': self.min_zoom,
+            'max_zoom': self.max_zoom,
+            'bounds': [[south, west], [north, east]],
+            'levels': levels,
+        }
+
+    @staticmethod
+    def _merge(clusters: List[_Cluster], cell: float) -> List[_Cluster]:
+        """Сливает кластеры, попавшие в одну ячейку сетки"""
+        buckets: Dict[Tuple[int, int], List[_Cluster]] = defaultdict(list)
+        for cluster in clusters:
+            buckets[(int(cluster.x / cell), int(cluster.y / cell))].append(cluster)
+
+        merged = []
+        for members in buckets.values():
+            if len(members) == 1:
+                merged.append(members[0])
+                continue
+            count = sum(m.count for m in members)
+            merged.append(_Cluster(
+                sum(m.x * m.count for m in members) / count,
+                sum(m.y * m.count for m in members) / count,
+                count, None, None
+            ))
+        return merged
+
+    @staticmethod
+    def _tiles(clusters: List[_Cluster], zoom: int) -> Dict[str, List]:
+        """Раскладывает кластеры уровня по тайлам"""
+        tiles: Dict[str, List] = defaultdict(list)
+        scale = 2 ** zoom
+        for cluster in clusters:
+            lat, lon = _unproject(cluster.x, cluster.y)
+            tile = f"{int(cluster.x * scale)}:{int(cluster.y * scale)}"
+            tiles[tile].append([round(lat, 5), round(lon, 5), cluster.count,
+                                cluster.label, cluster.kind])
+        return dict(tiles)
+
+
+def cluster_points(points: Iterable[Point], min_zoom: int = 0, max_zoom: int = 14,
+                   radius: int = 40) -> Optional[Dict]:
+    """
+    Кластеризует набор точек по уровням масштаба (см. GridClusterer)
+
+    Returns:
+        Результат GridClusterer.result() или None, если точек нет
+    """
+    clusterer = GridClusterer(min_zoom, max_zoom, radius)
+    clusterer.add_points(points)
+    return clusterer.result()
@@ -0,0 +1,235 @@
+"""
+OSINT Profiler - Connection Graph
+Граф связей между целями и предварительный расчет укладки для отчетов
+"""
+
+import math
+import random
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # без NumPy используется радиальная укладка без симуляции
+    np = None
+
+
+class ConnectionGraph:
+    """
+    Неориентированный граф связей по всем целям
+
+    Узел - либо цель (ключ = ID цели), либо человек из connections
+    (ключ = "name:<имя в нижнем регистре>"). Если имя связи совпадает с
+    полным именем другой цели, ребро ведет к этой цели, поэтому связи
+    разных целей объединяются в общий граф. Граф строится один раз и
+    переиспользуется для всех отчетов пачки.
+    """
+
+    def __init__(self, targets: Sequence[Dict]):
+        self.labels: Dict[str, str] = {}
+        self.kinds: Dict[str, str] = {}
+        self.adjacency: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+        ids_by_name = {}
+        for target in targets:
+            name = target.get('personal', {}).get('full_name', '') or target['id']
+            self.labels[target['id']] = name
+            self.kinds[target['id']] = 'target'
+            ids_by_name.setdefault(name.lower(), target['id'])
+
+        for target in targets:
+            for connection in target.get('connections', []):
+                name = connection.get('name', '')
+                if not name:
+                    continue
+                key = ids_by_name.get(name.lower(), f"name:{name.lower()}")
+                if key == target['id']:
+                    continue
+                if key not in self.labels:
+                    self.labels[key] = name
+                    self.kinds[key] = 'person'
+
+                strength = connection.get('strength') or 1
+                # При повторных упоминаниях берем самую сильную связь
+                weight = max(self.adjacency[target['id']].get(key, 0), strength)
+                self.adjacency[target['id']][key] = weight
+                self.adjacency[key][target['id']] = weight
+
+    def ego_network(self, root_id: str, depth: int = 2, max_nodes: int = 2000) -> Optional[Dict]:
+        """
+        Выделяет эго-сеть цели обходом в ширину
+
+        Args:
+            root_id: ID цели
+            depth: Глубина обхода (1 - только прямые связи)
+            max_nodes: Ограничение на число узлов
+
+        Returns:
+            {'keys', 'depths', 'edges'} или None, если у цели нет связей
+        """
+        if root_id not in self.adjacency:
+            return None
+
+        depths = {root_id: 0}
+        order = [root_id]
+        queue = deque([root_id])
+        while queue and len(order) < max_nodes:
+            key = queue.popleft()
+            if depths[key] >= depth:
+                continue
+            # Сначала самые сильные связи, чтобы при обрезке сохранить важное
+            for neighbor, _ in sorted(self.adjacency[key].items(), key=lambda x: -x[1]):
+                if neighbor not in depths:
+                    depths[neighbor] = depths[key] + 1
+                    order.append(neighbor)
+                    queue.append(neighbor)
+                    if len(order) >= max_nodes:
+                        break
+
+        index = {key: i for i, key in enumerate(order)}
+        edges = []
+        for key in order:
+            for neighbor, weight in self.adjacency[key].items():
+                j = index.get(neighbor)
+                if j is not None and index[key] < j:
+                    edges.append((index[key], j, weight))
+
+        return {'keys': order, 'depths': [depths[key] for key in order], 'edges': edges}
+
+
+def radial_layout(depths: Sequence[int], seed: int = 42) -> List[Tuple[float, float]]:
+    """
+    Располагает узлы по концентрическим кольцам в зависимости от глубины
+
+    Returns:
+        Координаты узлов в диапазоне [0, 1]
+    """
+    rings: Dict[int, List[int]] = defaultdict(list)
+    for i, d in enumerate(depths):
+        rings[d].append(i)
+
+    rng = random.Random(seed)
+    max_depth = max(rings) or 1
+    positions = [(0.5, 0.5)] * len(depths)
+    for d, members in rings.items():
+        if d == 0:
+            continue
+        radius = 0.5 * d / max_depth
+        offset = rng.random() * 2 * math.pi
+        for k, i in enumerate(members):
+            angle = offset + 2 * math.pi * k / len(members)
+            positions[i] = (0.5 + radius * math.cos(angle), 0.5 + radius * math.sin(angle))
+    return positions
+
+
+def force_layout(depths: Sequence[int], edges: Sequence[Tuple[int, int, int]],
+                 iterations: Optional[int] = None, seed: int = 42,
+                 block_size: int = 1024) -> List[Tuple[float, float]]:
+    """
+    Укладка Фрюхтермана-Рейнгольда, векторизованная на NumPy
+
+    Стартует с радиальной укладки. Отталкивание считается блоками строк,
+    чтобы память оставалась O(block_size * n) даже для тысяч узлов.
+    Без NumPy возвращает радиальную укладку.
+
+    Args:
+        depths: Глубина каждого узла в эго-сети
+        edges: Ребра (i, j, вес)
+        iterations: Число итераций (по умолчанию зависит от размера графа)
+        seed: Зерно для воспроизводимой укладки
+        block_size: Размер блока при расчете отталкивания
+
+    Returns:
+        Координаты узлов в диапазоне [0, 1]
+    """
+    n = len(depths)
+    initial = radial_layout(depths, seed)
+    if np is None or n < 3:
+        return initial
+
+    if iterations is None:
+        iterations = 100 if n <= 500 else 50 if n <= 2000 else 25
+
+    # float32 и раздельные массивы x/y вдвое сокращают объем временных массивов
+    pos = np.array(initial, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    pos += rng.normal(scale=1e-3, size=pos.shape).astype(np.float32)
+    x, y = pos[:, 0], pos[:, 1]
+
+    k2 = np.float32(1.0 / n)
+    k = math.sqrt(1.0 / n)
+    if edges:
+        edge_arr = np.array(edges, dtype=np.float32)
+        src = edge_arr[:, 0].astype(np.int64)
+        dst = edge_arr[:, 1].astype(np.int64)
+        weight = 0.5 + edge_arr[:, 2] / max(float(edge_arr[:, 2].max()), 1.0)
+
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp_x = np.zeros(n, dtype=np.float32)
+        disp_y = np.zeros(n, dtype=np.float32)
+
+        # Отталкивание: k^2 / d для всех пар узлов
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            dx = x[start:stop, None] - x[None, :]
+            dy = y[start:stop, None] - y[None, :]
+            inv = dx * dx
+            inv += dy * dy
+            np.maximum(inv, 1e-6, out=inv)
+            np.reciprocal(inv, out=inv)
+            disp_x[start:stop] += k2 * np.einsum('ij,ij->i', dx, inv)
+            disp_y[start:stop] += k2 * np.einsum('ij,ij->i', dy, inv)
+
+        # Притяжение вдоль ребер: d^2 / k, сильные связи тянут сильнее
+        if edges:
+            dx = x[src] - x[dst]
+            dy = y[src] - y[dst]
+            factor = np.sqrt(dx * dx + dy * dy) * weight / k
+            np.subtract.at(disp_x, src, dx * factor)
+            np.subtract.at(disp_y, src, dy * factor)
+            np.add.at(disp_x, dst, dx * factor)
+            np.add.at(disp_y, dst, dy * factor)
+
+        length = np.maximum(np.sqrt(disp_x * disp_x + disp_y * disp_y), 1e-9)
+        step = np.minimum(length, temperature) / length
+        x += disp_x * step
+        y += disp_y * step
+        # Корень эго-сети держим в центре
+        x[0], y[0] = 0.5, 0.5
+        temperature -= cooling
+
+    # Нормализуем в [0, 1] с сохранением пропорций
+    pos = np.stack([x, y], axis=1).astype(np.float64)
+    pos -= pos.min(axis=0)
+    scale = pos.max() or 1.0
+    pos /= scale
+    pos += (1.0 - pos.max(axis=0)) / 2
+    return [(float(x), float(y)) for x, y in pos]
+
+
+def build_network_payload(graph: ConnectionGraph, root_id: str, depth: int = 2,
+                          max_nodes: int = 2000) -> Optional[Dict]:
+    """
+    Строит эго-сеть цели с рассчитанной укладкой для встраивания в отчет
+
+    Returns:
+        {'columns', 'nodes': [[подпись, тип, глубина, x, y]], 'edges': [[i, j, вес]]}
+        или None, если у цели нет связей
+    """
+    network = graph.ego_network(root_id, depth, max_nodes)
+    if network is None:
+        return None
+
+    positions = force_layout(network['depths'], network['edges'])
+    nodes = [
+        [graph.labels[key], 'root' if i == 0 else graph.kinds[key], network['depths'][i],
+         round(x, 4), round(y, 4)]
+        for i, (key, (x, y)) in enumerate(zip(network['keys'], positions))
+    ]
+    return {
+        'columns': ['label', 'kind', 'depth', 'x', 'y'],
+        'nodes': nodes,
+        'edges': [list(edge) for edge in network['edges']],
+    }
@@ -0,0 +1,603 @@
+"""
+OSINT Profiler - Indexes
+Индексы целей, которые DataManager обновляет при каждой записи: обратный
+индекс идентификаторов для пивотов (телефоны, email, логины, номера машин),
+битовые карты тегов и подстрочный поиск; сохранение индексов в файлы
+рядом с базой
+"""
+
+import json
+import marshal
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.concurrency import temp_path
+from core.profiling import count, span
+
+PIVOT_KINDS = ("phone", "email", "handle", "plate")
+INDEX_MAGIC = b"OSINTIDX"
+
+# Кириллические буквы российских номеров и их латинские двойники
+_PLATE_TRANSLIT = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+_PHONE_LIKE = re.compile(r"^\+?[\d\s().-]{7,}$")
+
+
+class Index:
+    """
+    Базовый индекс целей
+
+    Индекс помнит ключи, извлеченные из каждой цели, поэтому цель можно
+    убрать из него по ID, не зная прежней версии - обновление стоит
+    столько же, сколько разбор одной цели. version - версия данных
+    (см. DataManager), с которой индекс согласован.
+    """
+
+    name = ""
+    # Меняется при изменении структуры dump(): старые файлы индекса отбрасываются
+    format_version = 1
+
+    def __init__(self):
+        self.version = None
+        # Изменен после загрузки или последнего сохранения
+        self.dirty = False
+
+    def build(self, targets: Iterable[Dict]):
+        """Строит индекс заново по всем целям"""
+        self.clear()
+        for target in targets:
+            self.add(target)
+
+    def update(self, puts: Iterable[Dict] = (), deleted: Iterable[str] = ()):
+        """Переносит в индекс новые версии целей и удаления"""
+        for target_id in deleted:
+            self.remove(target_id)
+        for target in puts:
+            self.remove(target['id'])
+            self.add(target)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def add(self, target: Dict):
+        raise NotImplementedError
+
+    def remove(self, target_id: str):
+        raise NotImplementedError
+
+    def dump(self):
+        """Состояние индекса для файла (из типов, которые понимает marshal)"""
+        raise NotImplementedError
+
+    def load(self, state):
+        """Восстанавливает состояние, сохраненное dump()"""
+        raise NotImplementedError
+
+    def copy(self) -> "Index":
+        """Независимая копия индекса (через dump(), как при сохранении в файл)"""
+        clone = type(self)()
+        clone.load(marshal.loads(marshal.dumps(self.dump())))
+        clone.version = self.version
+        clone.dirty = self.dirty
+        return clone
+
+
+def normalize_phone(value: str) -> Optional[str]:
+    """Телефон в виде E.164: +79215551234 (8XXXXXXXXXX считается российским)"""
+    digits = re.sub(r"\D", "", value)
+    if len(digits) == 11 and digits[0] == "8":
+        digits = "7" + digits[1:]
+    if not 7 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def normalize_email(value: str) -> Optional[str]:
+    value = value.strip().casefold()
+    return value if "@" in value else None
+
+
+def normalize_handle(value: str) -> Optional[str]:
+    """Логин без ведущего @ и без учета регистра"""
+    return value.strip().lstrip("@").casefold() or None
+
+
+def normalize_plate(value: str) -> Optional[str]:
+    """Номер машины латиницей, без пробелов и дефисов: А777АА178 -> A777AA178"""
+    return re.sub(r"[\s-]", "", value.upper()).translate(_PLATE_TRANSLIT) or None
+
+
+_NORMALIZERS = {
+    "phone": normalize_phone,
+    "email": normalize_email,
+    "handle": normalize_handle,
+    "plate": normalize_plate,
+}
+
+
+def normalize_identifier(kind: str, value) -> Optional[str]:
+    """Нормализованный идентификатор или None, если значение не подходит"""
+    if kind not in _NORMALIZERS:
+        raise ValueError(f"Неизвестный тип идентификатора: {kind} (доступны: {', '.join(PIVOT_KINDS)})")
+    return _NORMALIZERS[kind](str(value))
+
+
+def extract_identifiers(target: Dict) -> Iterator[Tuple[str, str, str]]:
+    """
+    Идентификаторы цели: (тип, нормализованное значение, поле-источник)
+
+    Логины мессенджеров, похожие на телефон (WhatsApp, Viber), считаются
+    телефонами; логины соцсетей и псевдонимы - общим типом handle, чтобы
+    @alex_spb в Telegram совпадал с alex_spb во ВКонтакте.
+    """
+    contacts = target.get('contacts') or {}
+    raw: List[Tuple[str, str, str]] = []
+    raw.extend(("phone", phone, "contacts.phones") for phone in contacts.get('phones', []))
+    raw.extend(("email", email, "contacts.emails") for email in contacts.get('emails', []))
+    for messenger, handle in (contacts.get('messengers') or {}).items():
+        if handle:
+            kind = "phone" if _PHONE_LIKE.match(str(handle)) else "handle"
+            raw.append((kind, handle, f"contacts.messengers.{messenger}"))
+    for social in target.get('social_media', []):
+        if social.get('username'):
+            raw.append(("handle", social['username'], f"social_media.{social.get('platform', '')}"))
+    raw.extend(("handle", alias, "personal.aliases")
+               for alias in (target.get('personal') or {}).get('aliases', []))
+    for vehicle in (target.get('assets') or {}).get('vehicles', []):
+        if vehicle.get('plate_number'):
+            raw.append(("plate", vehicle['plate_number'], "assets.vehicles"))
+
+    for kind, value, source in raw:
+        if isinstance(value, str):
+            normalized = _NORMALIZERS[kind](value)
+            if normalized:
+                yield kind, normalized, source
+
+
+class PivotIndex(Index):
+    """
+    Обратный индекс идентификаторов: (тип, значение) -> {ID цели: поля}
+
+    Ответ на «у каких целей этот телефон/email/логин/номер» - один поиск
+    в словаре, без обхода базы.
+    """
+
+    name = "pivot"
+
+    def __init__(self):
+        super().__init__()
+        self._postings: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+        self._keys: Dict[str, List[Tuple[str, str]]] = {}
+
+    def clear(self):
+        self._postings = {}
+        self._keys = {}
+
+    def add(self, target: Dict):
+        keys = []
+        for kind, value, source in extract_identifiers(target):
+            key = (kind, value)
+            sources = self._postings.setdefault(key, {}).setdefault(target['id'], [])
+            if not sources:
+                keys.append(key)
+            if source not in sources:
+                sources.append(source)
+        if keys:
+            self._keys[target['id']] = keys
+
+    def remove(self, target_id: str):
+        for key in self._keys.pop(target_id, ()):
+            posting = self._postings[key]
+            del posting[target_id]
+            if not posting:
+                del self._postings[key]
+
+    def dump(self):
+        return {'postings': self._postings, 'keys': self._keys}
+
+    def load(self, state):
+        self._postings = state['postings']
+        self._keys = state['keys']
+
+    def lookup(self, kind: str, value) -> Dict[str, List[str]]:
+        """{ID цели: поля, где найден идентификатор}"""
+        normalized = normalize_identifier(kind, value)
+        if normalized is None:
+            return {}
+        return dict(self._postings.get((kind, normalized), {}))
+
+    def shared(self, kind: Optional[str] = None, min_targets: int = 2) -> List[Dict]:
+        """
+        Идентификаторы, общие для нескольких целей (по убыванию числа целей)
+
+        Returns:
+            [{'kind', 'value', 'targets': {ID цели: поля}}]
+        """
+        rows = [
+            {'kind': key[0], 'value': key[1], 'targets': dict(posting)}
+            for key, posting in self._postings.items()
+            if len(posting) >= min_targets and (kind is None or key[0] == kind)
+        ]
+        rows.sort(key=lambda row: (-len(row['targets']), row['kind'], row['value']))
+        return rows
+
+
+if hasattr(int, "bit_count"):  # Python 3.10+
+    _popcount = int.bit_count
+else:
+    def _popcount(bitmap: int) -> int:
+        return bin(bitmap).count("1")
+
+
+_TAG_TOKENS = re.compile(r'\s*(?:(\()|(\))|(&|\|)|(!)|"([^"]*)"|([^\s()&|!"]+))')
+
+
+class TagIndex(Index):
+    """
+    Битовые карты тегов над плотными номерами целей
+
+    Каждая цель получает порядковый номер (номера удаленных целей
+    переиспользуются), каждый тег - битовую карту целей в виде целого
+    числа Python: AND/OR/NOT над картами и подсчет целей выполняются
+    побитовыми операциями над машинными словами, без перебора целей.
+    Теги сравниваются без учета регистра.
+    """
+
+    name = "tags"
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._bitmaps: Dict[str, int] = {}
+        # Написание тега, встреченное первым (для вывода)
+        self._labels: Dict[str, str] = {}
+        self._ordinals: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._keys: Dict[str, List[str]] = {}
+        self._live = 0
+
+    def add(self, target: Dict):
+        if self._free:
+            ordinal = self._free.pop()
+            self._ids[ordinal] = target['id']
+        else:
+            ordinal = len(self._ids)
+            self._ids.append(target['id'])
+        self._ordinals[target['id']] = ordinal
+        bit = 1 << ordinal
+        self._live |= bit
+
+        keys = []
+        for tag in target.get('tags', []):
+            key = str(tag).strip().casefold()
+            if not key or key in keys:
+                continue
+            keys.append(key)
+            self._bitmaps[key] = self._bitmaps.get(key, 0) | bit
+            self._labels.setdefault(key, str(tag).strip())
+        self._keys[target['id']] = keys
+
+    def remove(self, target_id: str):
+        ordinal = self._ordinals.pop(target_id, None)
+        if ordinal is None:
+            return
+        mask = ~(1 << ordinal)
+        self._live &= mask
+        for key in self._keys.pop(target_id, ()):
+            bitmap = self._bitmaps[key] & mask
+            if bitmap:
+                self._bitmaps[key] = bitmap
+            else:
+                del self._bitmaps[key]
+                del self._labels[key]
+        self._ids[ordinal] = None
+        self._free.append(ordinal)
+
+    _STATE = ('_bitmaps', '_labels', '_ordinals', '_ids', '_free', '_keys', '_live')
+
+    def dump(self):
+        return {attr: getattr(self, attr) for attr in self._STATE}
+
+    def load(self, state):
+        for attr in self._STATE:
+            setattr(self, attr, state[attr])
+
+    def bitmap(self, tag: str) -> int:
+        """Битовая карта целей с тегом"""
+        return self._bitmaps.get(tag.strip().casefold(), 0)
+
+    def evaluate(self, expression: str) -> int:
+        """
+        Битовая карта целей, удовлетворяющих выражению над тегами
+
+        Операторы: AND/&, OR/|, NOT/! и скобки; AND связывает сильнее OR,
+        соседние теги без оператора объединяются через AND. Тег с пробелами
+        берется в кавычки: "красная зона" AND NOT архив
+        """
+        tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = _TAG_TOKENS.match(expression, position)
+            if match is None:
+                raise ValueError(f"Не удалось разобрать выражение: {expression[position:]}")
+            position = match.end()
+            opening, closing, operator, negation, quoted, word = match.groups()
+            if opening or closing:
+                tokens.append(opening or closing)
+            elif operator or negation:
+                tokens.append({'&': 'AND', '|': 'OR', '!': 'NOT'}[operator or negation])
+            elif quoted is not None:
+                tokens.append(('tag', quoted))
+            elif word.upper() in ('AND', 'OR', 'NOT'):
+                tokens.append(word.upper())
+            else:
+                tokens.append(('tag', word))
+        if not tokens:
+            raise ValueError("Пустое выражение")
+
+        def parse_or(i: int) -> Tuple[int, int]:
+            bitmap, i = parse_and(i)
+            while i < len(tokens) and tokens[i] == 'OR':
+                right, i = parse_and(i + 1)
+                bitmap |= right
+            return bitmap, i
+
+        def parse_and(i: int) -> Tuple[int, int]:
+            bitmap, i = parse_not(i)
+            while i < len(tokens) and tokens[i] not in ('OR', ')'):
+                if tokens[i] == 'AND':
+                    i += 1
+                right, i = parse_not(i)
+                bitmap &= right
+            return bitmap, i
+
+        def parse_not(i: int) -> Tuple[int, int]:
+            if i >= len(tokens):
+                raise ValueError("Выражение оборвано")
+            token = tokens[i]
+            if token == 'NOT':
+                bitmap, i = parse_not(i + 1)
+                return self._live & ~bitmap, i
+            if token == '(':
+                bitmap, i = parse_or(i + 1)
+                if i >= len(tokens) or tokens[i] != ')':
+                    raise ValueError("Не закрыта скобка")
+                return bitmap, i + 1
+            if isinstance(token, tuple):
+                return self.bitmap(token[1]), i + 1
+            raise ValueError(f"Неожиданный оператор: {token}")
+
+        bitmap, end = parse_or(0)
+        if end != len(tokens):
+            raise ValueError("Лишняя закрывающая скобка")
+        return bitmap
+
+    def ids(self, bitmap: int) -> List[str]:
+        """ID целей битовой карты (в порядке номеров)"""
+        bits = bin(bitmap)[:1:-1]
+        result = []
+        position = bits.find("1")
+        while position != -1:
+            result.append(self._ids[position])
+            position = bits.find("1", position + 1)
+        return result
+
+    def count(self, bitmap: int) -> int:
+        return _popcount(bitmap)
+
+    def counts(self) -> List[Tuple[str, int]]:
+        """(тег, число целей) по убыванию"""
+        rows = [(self._labels[key], _popcount(bitmap)) for key, bitmap in self._bitmaps.items()]
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        return rows
+
+    def cooccurring(self, bitmap: int, limit: int = 10,
+                    exclude: Iterable[str] = ()) -> List[Tuple[str, int]]:
+        """
+        Теги, чаще всего встречающиеся у целей битовой карты
+
+        Returns:
+            [(тег, число общих целей)] по убыванию, не больше limit
+        """
+        skip = {tag.strip().casefold() for tag in exclude}
+        rows = []
+        for key, tag_bitmap in self._bitmaps.items():
+            if key in skip:
+                continue
+            shared = _popcount(tag_bitmap & bitmap)
+            if shared:
+                rows.append((self._labels[key], shared))
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        return rows[:limit]
+
+
+_FIELD_SEPARATOR = "\x1f"
+
+
+def _search_text(target: Dict) -> Tuple[str, str]:
+    """Имя цели и текст для поиска: имя, теги и заметки в нижнем регистре"""
+    name = (target.get('personal') or {}).get('full_name') or ''
+    parts = [name.lower()]
+    parts.extend(str(tag).lower() for tag in target.get('tags', []))
+    if isinstance(target.get('notes'), str):
+        parts.append(target['notes'].lower())
+    return name, _FIELD_SEPARATOR.join(parts)
+
+
+class SearchIndex(Index):
+    """
+    Подстрочный поиск по имени, тегам и заметкам (как search_targets)
+
+    Тексты целей хранятся одной строкой UTF-8, записи разделены нулевым
+    байтом: запрос ищется в ней bytes.find, а цель по смещению находится
+    бинарным поиском по началам записей. Индекс, загруженный из файла,
+    ищет прямо в этой строке и разбирается на записи только при изменении.
+    """
+
+    name = "search"
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        # id -> (имя, текст); None - пока индекс только в упакованном виде
+        self._entries: Optional[Dict[str, Tuple[str, str]]] = {}
+        # (ID, имена, начала записей + конец, строка) или None, если устарела
+        self._packed: Optional[Tuple[List[str], List[str], List[int], bytes]] = None
+
+    def _unpack(self):
+        if self._entries is None:
+            ids, names, offsets, blob = self._packed
+            self._entries = {
+                target_id: (names[i], blob[offsets[i]:offsets[i + 1] - 1].decode('utf-8'))
+                for i, target_id in enumerate(ids)
+            }
+
+    def add(self, target: Dict):
+        self._unpack()
+        self._entries[target['id']] = _search_text(target)
+        self._packed = None
+
+    def remove(self, target_id: str):
+        self._unpack()
+        if self._entries.pop(target_id, None) is not None:
+            self._packed = None
+
+    def _pack(self) -> Tuple[List[str], List[str], List[int], bytes]:
+        if self._packed is None:
+            ids, names, offsets, chunks = [], [], [], []
+            position = 0
+            for target_id, (name, text) in self._entries.items():
+                data = text.encode('utf-8') + b"\0"
+                ids.append(target_id)
+                names.append(name)
+                offsets.append(position)
+                chunks.append(data)
+                position += len(data)
+            offsets.append(position)
+            self._packed = (ids, names, offsets, b"".join(chunks))
+        return self._packed
+
+    def search(self, query: str) -> List[Tuple[str, str]]:
+        """[(ID, имя)] целей, в имени, тегах или заметках которых есть query"""
+        needle = query.lower()
+        if "\0" in needle or _FIELD_SEPARATOR in needle:
+            return []
+        ids, names, offsets, blob = self._pack()
+        needle = needle.encode('utf-8')
+        results = []
+        position = blob.find(needle)
+        while position != -1 and position < offsets[-1]:
+            entry = bisect_right(offsets, position) - 1
+            results.append((ids[entry], names[entry]))
+            position = blob.find(needle, offsets[entry + 1])
+        return results
+
+    def dump(self):
+        ids, names, offsets, blob = self._pack()
+        return {'ids': ids, 'names': names, 'offsets': offsets, 'text': blob}
+
+    def load(self, state):
+        self._entries = None
+        self._packed = (state['ids'], state['names'], state['offsets'], state['text'])
+
+
+INDEXES = {
+    PivotIndex.name: PivotIndex,
+    TagIndex.name: TagIndex,
+    SearchIndex.name: SearchIndex,
+}
+
+
+def index_path(db_path: str, name: str) -> str:
+    """Файл индекса рядом с БД: <db>.<name>.idx или <директория>/<name>.idx"""
+    if os.path.isdir(db_path):
+        return os.path.join(db_path, f"{name}.idx")
+    return f"{os.path.splitext(db_path)[0]}.{name}.idx"
+
+
+def _freeze(value):
+    """Версия из JSON-заголовка: списки обратно в кортежи"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def save_index(path: str, index: Index):
+    """
+    Сохраняет индекс атомарно (через временный файл)
+
+    Формат: сигнатура INDEX_MAGIC, длина заголовка (4 байта), заголовок
+    JSON (имя и версия формата индекса, версия marshal, версия данных
+    базы) и состояние индекса в marshal.
+    """
+    header = json.dumps({
+        'index': index.name,
+        'format': index.format_version,
+        'marshal': marshal.version,
+        'version': index.version,
+    }).encode('utf-8')
+    with span("index.save", index=index.name):
+        body = marshal.dumps(index.dump())
+        tmp_path = temp_path(path)
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(body)
+        os.replace(tmp_path, path)
+    count("index.bytes_written", len(header) + len(body))
+
+
+def read_index_version(mapped, name: str, format_version: int) -> Optional[Tuple[tuple, int]]:
+    """
+    Версия данных из заголовка файла индекса и смещение состояния
+
+    Читается только заголовок; None - файл другого индекса, формата или
+    версии marshal (такой файл нужно перестроить).
+    """
+    prefix = len(INDEX_MAGIC) + 4
+    if mapped[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        return None
+    (length,) = struct.unpack("<I", mapped[len(INDEX_MAGIC):prefix])
+    header = json.loads(bytes(mapped[prefix:prefix + length]))
+    if (header.get('index'), header.get('format'), header.get('marshal')) != \
+            (name, format_version, marshal.version):
+        return None
+    return _freeze(header['version']), prefix + length
+
+
+def load_index(path: str, cls, accept) -> Optional[Index]:
+    """
+    Загружает индекс из файла через mmap
+
+    Args:
+        path: Файл индекса
+        cls: Класс индекса
+        accept: Функция от версии данных файла - можно ли его использовать
+                (версия совпадает или индекс можно догнать по журналу)
+
+    Returns:
+        Индекс или None (файла нет, он поврежден, другого формата или не
+        подходит по версии)
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header = read_index_version(mapped, cls.name, cls.format_version)
+            if header is None or not accept(header[0]):
+                return None
+            with span("index.load", index=cls.name, size=len(mapped)):
+                with memoryview(mapped)[header[1]:] as body:
+                    state = marshal.loads(body)
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        return None
+    index = cls()
+    index.load(state)
+    index.version = header[0]
+    return index
@@ -0,0 +1,247 @@
+"""
+OSINT Profiler - Job Queue
+Постоянная очередь заданий на отчеты в SQLite рядом с базой: статусы,
+время выполнения, ошибки, повторы с нарастающей паузой
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from core.profiling import count
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+# Попыток на задание по умолчанию (первая + повторы)
+MAX_ATTEMPTS = 3
+# Пауза перед повтором: BACKOFF_BASE * 2^(попытка - 1), не больше BACKOFF_MAX секунд
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+# Срок, на который воркер берет задание: задание процесса, который упал
+# или был остановлен, по истечении срока снова попадает в очередь
+LEASE_SECONDS = 900.0
+# Окно, за которое считается пропускная способность, секунд
+THROUGHPUT_WINDOW = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target_id TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'report',
+    params TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    lease_until REAL,
+    finished_at REAL,
+    duration REAL,
+    worker TEXT,
+    output TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at, id);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+
+def queue_path(db_path: str) -> str:
+    """Файл очереди рядом с БД: <db>.jobs.sqlite или <директория>/jobs.sqlite"""
+    if os.path.isdir(db_path):
+        return os.path.join(db_path, "jobs.sqlite")
+    return f"{os.path.splitext(db_path)[0]}.jobs.sqlite"
+
+
+def backoff_delay(attempt: int) -> float:
+    """Пауза перед повтором после неудачной попытки attempt (с 1)"""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+
+
+class JobQueue:
+    """
+    Очередь заданий в SQLite (режим WAL)
+
+    Задание проходит статусы queued -> running -> done; при ошибке оно
+    возвращается в queued с паузой backoff_delay, а после max_attempts
+    попыток остается в failed с текстом последней ошибки. Взятое задание
+    держится за воркером LEASE_SECONDS: если процесс упал, по истечении
+    срока задание снова выдается, так что пачка после перезапуска
+    продолжается с того же места. Состояние меняется короткими
+    транзакциями, очередь можно читать (status) во время работы воркеров.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция с блокировкой записи с самого начала (BEGIN IMMEDIATE)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def enqueue(self, target_ids: Iterable[str], kind: str = "report", params: Optional[Dict] = None,
+                max_attempts: int = MAX_ATTEMPTS) -> int:
+        """
+        Ставит задания в очередь; цели, для которых задание этого вида уже
+        ждет или выполняется, пропускаются
+
+        Returns:
+            Число новых заданий
+        """
+        now = time.time()
+        payload = json.dumps(params or {}, ensure_ascii=False, sort_keys=True)
+        with self._transaction() as conn:
+            pending = {row[0] for row in conn.execute(
+                "SELECT target_id FROM jobs WHERE kind = ? AND status IN ('queued', 'running')", (kind,))}
+            rows = []
+            for target_id in target_ids:
+                if target_id not in pending:
+                    pending.add(target_id)
+                    rows.append((target_id, kind, payload, max_attempts, now, now))
+            conn.executemany(
+                "INSERT INTO jobs (target_id, kind, params, max_attempts, enqueued_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        count("jobs.enqueued", len(rows))
+        return len(rows)
+
+    def claim(self, worker: str, limit: int = 1) -> List[Dict]:
+        """
+        Выдает до limit готовых заданий: ждущих, у которых прошла пауза
+        повтора, и взятых воркерами, срок которых истек
+
+        Returns:
+            [{'id', 'target_id', 'kind', 'params', 'attempt'}]
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, target_id, kind, params, attempts FROM jobs "
+                "WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY available_at, id LIMIT ?", (now, now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                "lease_until = ?, worker = ? WHERE id = ?",
+                [(now, now + LEASE_SECONDS, worker, row['id']) for row in rows])
+        return [{'id': row['id'], 'target_id': row['target_id'], 'kind': row['kind'],
+                 'params': json.loads(row['params']), 'attempt': row['attempts'] + 1} for row in rows]
+
+    def complete(self, job_id: int, output: Optional[str], duration: float):
+        """Отмечает задание выполненным"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, duration = ?, output = ?, "
+                         "error = NULL, lease_until = NULL WHERE id = ?",
+                         (time.time(), duration, output, job_id))
+        count("jobs.done")
+
+    def fail(self, job_id: int, error: str, duration: Optional[float] = None) -> bool:
+        """
+        Записывает ошибку попытки: задание ждет повтора или, если попытки
+        кончились, остается в failed
+
+        Returns:
+            True, если задание будет повторено
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            retry = row['attempts'] < row['max_attempts']
+            if retry:
+                conn.execute("UPDATE jobs SET status = 'queued', available_at = ?, duration = ?, error = ?, "
+                             "lease_until = NULL WHERE id = ?",
+                             (now + backoff_delay(row['attempts']), duration, error, job_id))
+            else:
+                conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, duration = ?, error = ?, "
+                             "lease_until = NULL WHERE id = ?", (now, duration, error, job_id))
+        count("jobs.retried" if retry else "jobs.failed")
+        return retry
+
+    def release(self, job_ids: Iterable[int]):
+        """Возвращает взятые задания в очередь без траты попытки (остановка воркера)"""
+        with self._transaction() as conn:
+            conn.executemany("UPDATE jobs SET status = 'queued', attempts = attempts - 1, "
+                             "lease_until = NULL WHERE id = ? AND status = 'running'",
+                             [(job_id,) for job_id in job_ids])
+
+    def retry_failed(self) -> int:
+        """Возвращает задания из failed в очередь с новым набором попыток"""
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, "
+                                  "finished_at = NULL WHERE status = 'failed'", (time.time(),))
+        return cursor.rowcount
+
+    def purge(self, statuses: Iterable[str] = ("done",)) -> int:
+        """Удаляет задания с указанными статусами"""
+        statuses = list(statuses)
+        with self._transaction() as conn:
+            cursor = conn.execute(f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(statuses))})",
+                                  statuses)
+        return cursor.rowcount
+
+    def next_available(self) -> Optional[float]:
+        """Время, когда станет готово ближайшее ждущее задание (None - таких нет)"""
+        return self._conn.execute("SELECT MIN(available_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def stats(self, window: float = THROUGHPUT_WINDOW) -> Dict:
+        """
+        Состояние очереди
+
+        Returns:
+            {'queued', 'ready', 'running', 'done', 'failed', 'retrying',
+            'throughput' (заданий в минуту за последние window секунд),
+            'avg_duration', 'oldest_queued' (секунд в очереди)}
+        """
+        now = time.time()
+        conn = self._conn
+        stats = {status: 0 for status in JOB_STATUSES}
+        for status, total in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            stats[status] = total
+        stats['ready'] = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND available_at <= ?",
+                                      (now,)).fetchone()[0]
+        stats['retrying'] = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND attempts > 0"
+                                         ).fetchone()[0]
+        recent, avg_duration = conn.execute(
+            "SELECT COUNT(*), AVG(duration) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+            (now - window,)).fetchone()
+        stats['throughput'] = recent * 60.0 / window
+        stats['avg_duration'] = avg_duration or conn.execute(
+            "SELECT AVG(duration) FROM jobs WHERE status = 'done'").fetchone()[0]
+        oldest = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        stats['oldest_queued'] = now - oldest if oldest is not None else None
+        return stats
+
+    def jobs(self, status: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Последние задания (с указанным статусом) - новые первыми"""
+        query = "SELECT * FROM jobs"
+        args: list = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY COALESCE(finished_at, started_at, enqueued_at) DESC, id DESC LIMIT ?"
+        args.append(limit)
+        return [dict(row) for row in self._conn.execute(query, args)]
@@ -0,0 +1,311 @@
+"""
+OSINT Profiler - Instrumentation
+Спаны и счетчики на горячих путях, экспорт в Chrome trace и сводная таблица
+
+Инструментирование выключено по умолчанию и включается переменной окружения
+OSINT_PROFILE=1 (OSINT_TRACE=<файл> дополнительно сохраняет трассу при выходе)
+или флагом --profile в main.py. Выключенный спан стоит одной проверки флага.
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Ограничение на число сохраняемых событий трассы: дальше копятся только агрегаты
+MAX_EVENTS = 500_000
+
+
+class _Recorder:
+    """Хранилище событий трассы и агрегатов по именам спанов"""
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.events: List[Dict] = []
+        self.dropped = 0
+        # имя -> [число вызовов, суммарное время, максимум]
+        self.spans: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    def reset(self):
+        with self.lock:
+            self.origin = time.perf_counter()
+            self.events = []
+            self.dropped = 0
+            self.spans = {}
+            self.counters = {}
+
+    def record(self, name: str, start: float, duration: float, args: Optional[Dict]):
+        with self.lock:
+            stat = self.spans.get(name)
+            if stat is None:
+                self.spans[name] = [1, duration, duration]
+            else:
+                stat[0] += 1
+                stat[1] += duration
+                if duration > stat[2]:
+                    stat[2] = duration
+
+            if len(self.events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            event = {
+                'name': name,
+                'cat': name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': round((start - self.origin) * 1e6, 1),
+                'dur': round(duration * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+            }
+            if args:
+                event['args'] = args
+            self.events.append(event)
+
+    def count(self, name: str, value: int):
+        with self.lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            if len(self.events) < MAX_EVENTS:
+                self.events.append({
+                    'name': name, 'ph': 'C',
+                    'ts': round((time.perf_counter() - self.origin) * 1e6, 1),
+                    'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'args': {'value': total},
+                })
+
+
+_recorder = _Recorder()
+
+
+def enable():
+    """Включает сбор спанов и счетчиков"""
+    _recorder.enabled = True
+
+
+def disable():
+    """Выключает сбор (накопленные данные сохраняются)"""
+    _recorder.enabled = False
+
+
+def is_enabled() -> bool:
+    return _recorder.enabled
+
+
+def reset():
+    """Очищает накопленные события и агрегаты"""
+    _recorder.reset()
+
+
+class _NullSpan:
+    """Спан, который ничего не делает (инструментирование выключено)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name: str, args: Optional[Dict]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _recorder.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+def span(name: str, **args):
+    """
+    Контекстный менеджер, замеряющий время блока
+
+    Пример:
+        with span("generator.render", target=target_id):
+            ...
+    """
+    if not _recorder.enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+
+def traced(name: str) -> Callable:
+    """Декоратор: замеряет каждый вызов функции как спан name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _recorder.record(name, start, time.perf_counter() - start, None)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    """Увеличивает счетчик (например, число записанных байт)"""
+    if _recorder.enabled:
+        _recorder.count(name, value)
+
+
+def summary() -> List[Dict]:
+    """
+    Returns:
+        Агрегаты по спанам, отсортированные по суммарному времени:
+        [{'name', 'calls', 'total_ms', 'avg_ms', 'max_ms'}]
+    """
+    with _recorder.lock:
+        spans = {name: list(stat) for name, stat in _recorder.spans.items()}
+    rows = [{
+        'name': name,
+        'calls': int(calls),
+        'total_ms': round(total * 1000, 3),
+        'avg_ms': round(total / calls * 1000, 3),
+        'max_ms': round(peak * 1000, 3),
+    } for name, (calls, total, peak) in spans.items()]
+    return sorted(rows, key=lambda row: -row['total_ms'])
+
+
+def counters() -> Dict[str, int]:
+    """Текущие значения счетчиков"""
+    with _recorder.lock:
+        return dict(_recorder.counters)
+
+
+def summary_table(title: str = "Профиль"):
+    """Сводная таблица спанов и счетчиков (rich.Table)"""
+    from rich.table import Table
+    from rich import box
+
+    table = Table(title=title, box=box.ROUNDED, border_style="cyan")
+    table.add_column("Спан", style="cyan")
+    table.add_column("Вызовов", justify="right")
+    table.add_column("Всего, мс", justify="right")
+    table.add_column("Среднее, мс", justify="right")
+    table.add_column("Макс, мс", justify="right")
+    for row in summary():
+        table.add_row(row['name'], str(row['calls']), f"{row['total_ms']:.1f}",
+                      f"{row['avg_ms']:.3f}", f"{row['max_ms']:.1f}")
+    for name, value in sorted(counters().items()):
+        table.add_row(f"[yellow]{name}[/yellow]", str(value), "", "", "")
+    return table
+
+
+def export_chrome_trace(path: str) -> str:
+    """
+    Сохраняет трассу в формате Chrome trace-event (chrome://tracing, Perfetto)
+
+    Returns:
+        Путь к файлу трассы
+    """
+    with _recorder.lock:
+        events = list(_recorder.events)
+        dropped = _recorder.dropped
+    trace = {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'dropped_events': dropped, 'counters': counters()},
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False)
+    return path
+
+
+class PeriodicSummary:
+    """Фоновый поток, печатающий сводную таблицу каждые interval секунд"""
+
+    def __init__(self, interval: float, console=None):
+        if console is None:
+            from rich.console import Console
+            console = Console(stderr=True)
+        self.interval = interval
+        self.console = console
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.console.print(summary_table("Профиль (промежуточный)"))
+
+    def start(self) -> "PeriodicSummary":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+
+@contextmanager
+def capture(cprofile_path: Optional[str] = None, memory: bool = False, console=None,
+            top: int = 20):
+    """
+    Снимает cProfile и/или tracemalloc для одного блока (одной команды)
+
+    Args:
+        cprofile_path: Файл для статистики cProfile (открывается snakeviz, pstats)
+        memory: Снимать ли распределение памяти через tracemalloc
+        console: rich.Console для вывода топа
+        top: Число строк в выводе
+    """
+    if console is None:
+        from rich.console import Console
+        console = Console(stderr=True)
+
+    profiler = cProfile.Profile() if cprofile_path else None
+    if memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+            console.print(f"[dim]cProfile: {cprofile_path}[/dim]")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            console.print(f"[bold]tracemalloc:[/bold] сейчас {current / 1024 / 1024:.1f} МБ, "
+                          f"пик {peak / 1024 / 1024:.1f} МБ")
+            for stat in snapshot.statistics('lineno')[:top]:
+                console.print(f"  {stat}")
+
+
+def _configure_from_env():
+    """Включает инструментирование по переменным окружения"""
+    if os.environ.get('OSINT_PROFILE', '').lower() in ('1', 'true', 'yes', 'on'):
+        enable()
+    trace_path = os.environ.get('OSINT_TRACE')
+    if trace_path:
+        enable()
+        atexit.register(export_chrome_trace, trace_path)
+
+
+_configure_from_env()
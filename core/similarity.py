@@ -0,0 +1,303 @@
+"""
+OSINT Profiler - Similarity
+Поиск похожих целей: разреженные TF-IDF векторы по общим тегам,
+работодателям, учебным заведениям, городам, платформам и связям
+"""
+
+import math
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.indexes import INDEXES, Index
+from core.summary import address_city
+
+try:
+    import numpy as np
+except ImportError:  # без NumPy сходство считается по обратным спискам признаков
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:  # без SciPy попарный режим считает цели по одной
+    sparse = None
+
+SIMILARITY_FEATURES = ("tag", "employer", "institution", "city", "platform", "connection")
+# Сколько измененных строк досчитывается поверх матрицы до ее пересборки
+MATRIX_REBUILD_ROWS = 256
+# Ячеек (строк блока x целей) в одном блоке попарного умножения
+PAIRS_BLOCK_CELLS = 4_000_000
+
+
+def target_features(target: Dict) -> Set[str]:
+    """Признаки цели вида "тип:значение" (значения без учета регистра)"""
+    features = set()
+
+    def put(kind: str, value):
+        if isinstance(value, str) and value.strip():
+            features.add(f"{kind}:{value.strip().casefold()}")
+
+    for tag in target.get('tags', []):
+        put("tag", tag)
+    for job in target.get('employment', []):
+        put("employer", job.get('company'))
+        put("city", job.get('location'))
+    for item in target.get('education', []):
+        put("institution", item.get('institution'))
+    for address in target.get('addresses', []):
+        put("city", address_city(address))
+    for social in target.get('social_media', []):
+        put("platform", social.get('platform'))
+    for connection in target.get('connections', []):
+        put("connection", connection.get('name'))
+    return features
+
+
+class SimilarityIndex(Index):
+    """
+    Косинусное сходство целей по TF-IDF весам признаков
+
+    Строка цели - множество номеров признаков, вес признака -
+    сглаженный IDF (редкий общий работодатель важнее общей платформы VK).
+    Частоты признаков поддерживаются при каждой записи, поэтому веса
+    всегда актуальны.
+
+    С NumPy строки собираются в CSR-матрицу (номер строки и номер признака
+    каждого ненулевого элемента), и сходство запроса со всеми целями - один
+    векторизованный проход по ней. Нормы строк кэшируются до следующего
+    изменения. Измененные после сборки строки досчитываются отдельно, матрица
+    пересобирается, когда их больше MATRIX_REBUILD_ROWS. Без NumPy
+    суммируются веса по обратным спискам признаков запроса.
+    """
+
+    name = "similarity"
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._features: Dict[str, int] = {}
+        self._labels: List[str] = []
+        self._df: List[int] = []
+        self._ordinals: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._rows: Dict[int, List[int]] = {}
+        self._reset_cache()
+
+    def _reset_cache(self):
+        # (номер строки, номер признака) ненулевых элементов и строки, измененные после сборки
+        self._matrix = None
+        self._changed: Set[int] = set()
+        self._norms = None
+        self._weights = None
+        self._postings: Optional[Dict[int, Set[int]]] = None
+
+    def add(self, target: Dict):
+        if self._free:
+            ordinal = self._free.pop()
+            self._ids[ordinal] = target['id']
+        else:
+            ordinal = len(self._ids)
+            self._ids.append(target['id'])
+        self._ordinals[target['id']] = ordinal
+
+        columns = []
+        for feature in sorted(target_features(target)):
+            column = self._features.get(feature)
+            if column is None:
+                column = self._features[feature] = len(self._labels)
+                self._labels.append(feature)
+                self._df.append(0)
+            self._df[column] += 1
+            columns.append(column)
+            if self._postings is not None:
+                self._postings.setdefault(column, set()).add(ordinal)
+        self._rows[ordinal] = columns
+        self._touch(ordinal)
+
+    def remove(self, target_id: str):
+        ordinal = self._ordinals.pop(target_id, None)
+        if ordinal is None:
+            return
+        for column in self._rows.pop(ordinal, ()):
+            self._df[column] -= 1
+            if self._postings is not None:
+                self._postings[column].discard(ordinal)
+        self._ids[ordinal] = None
+        self._free.append(ordinal)
+        self._touch(ordinal)
+
+    def _touch(self, ordinal: int):
+        self._norms = None
+        self._weights = None
+        if self._matrix is not None:
+            self._changed.add(ordinal)
+
+    def build(self, targets: Iterable[Dict]):
+        super().build(targets)
+        self._reset_cache()
+
+    _STATE = ('_features', '_labels', '_df', '_ordinals', '_ids', '_free', '_rows')
+
+    def dump(self):
+        return {attr: getattr(self, attr) for attr in self._STATE}
+
+    def load(self, state):
+        for attr in self._STATE:
+            setattr(self, attr, state[attr])
+        self._reset_cache()
+
+    # ---------- веса ----------
+
+    def _weight_sq(self):
+        """Квадраты сглаженных IDF признаков (массив NumPy, если он есть)"""
+        if self._weights is None:
+            total = len(self._ordinals)
+            weights = [(math.log((1 + total) / (1 + df)) + 1.0) ** 2 if df else 0.0 for df in self._df]
+            self._weights = np.asarray(weights, dtype=np.float64) if np is not None else weights
+        return self._weights
+
+    def _csr(self):
+        """(номера строк, номера признаков) ненулевых элементов; пересобирается при отставании"""
+        if self._matrix is None or len(self._changed) > MATRIX_REBUILD_ROWS:
+            ordinals = sorted(self._rows)
+            lengths = [len(self._rows[ordinal]) for ordinal in ordinals]
+            indices = np.fromiter(chain.from_iterable(self._rows[ordinal] for ordinal in ordinals),
+                                  dtype=np.int64, count=sum(lengths))
+            rows = np.repeat(np.asarray(ordinals, dtype=np.int64), lengths)
+            self._matrix = (rows, indices)
+            self._changed = set()
+        return self._matrix
+
+    def _row_sums(self, weights) -> "np.ndarray":
+        """Сумма весов признаков каждой строки (с досчетом измененных строк)"""
+        rows, indices = self._csr()
+        sums = np.bincount(rows, weights=weights[indices], minlength=len(self._ids))
+        for ordinal in self._changed:
+            sums[ordinal] = sum(weights[column] for column in self._rows.get(ordinal, ()))
+        return sums
+
+    def _norms_np(self, weight_sq) -> "np.ndarray":
+        if self._norms is None:
+            self._norms = np.sqrt(self._row_sums(weight_sq))
+        return self._norms
+
+    # ---------- запросы ----------
+
+    def similar(self, target_id: str, limit: int = 20) -> Optional[List[Tuple[str, float, List[str]]]]:
+        """
+        Цели, наиболее похожие на target_id
+
+        Returns:
+            [(ID, сходство 0..1, общие признаки)] по убыванию сходства или
+            None, если цели нет в индексе
+        """
+        ordinal = self._ordinals.get(target_id)
+        if ordinal is None:
+            return None
+        columns = self._rows.get(ordinal, [])
+        if not columns:
+            return []
+
+        weight_sq = self._weight_sq()
+        query_norm = math.sqrt(sum(weight_sq[column] for column in columns))
+        if np is not None:
+            scores = self._scores_np(columns, weight_sq, query_norm)
+            scores[ordinal] = 0.0
+            count = min(limit, int(np.count_nonzero(scores > 0)))
+            if not count:
+                return []
+            top = np.argpartition(-scores, count - 1)[:count]
+            ranked = sorted(((float(scores[i]), int(i)) for i in top), key=lambda item: (-item[0], item[1]))
+        else:
+            ranked = self._ranked_postings(ordinal, columns, weight_sq, query_norm, limit)
+
+        own = set(columns)
+        return [(self._ids[other], score,
+                 [self._labels[column] for column in self._rows[other] if column in own])
+                for score, other in ranked]
+
+    def _scores_np(self, columns: List[int], weight_sq, query_norm: float) -> "np.ndarray":
+        """Косинусное сходство запроса со всеми строками"""
+        query = np.zeros(len(self._labels), dtype=np.float64)
+        query[columns] = weight_sq[columns]
+        dots = self._row_sums(query)
+        norms = self._norms_np(weight_sq)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = dots / (norms * query_norm)
+        scores[~np.isfinite(scores)] = 0.0
+        return scores
+
+    def _ranked_postings(self, ordinal: int, columns: List[int], weight_sq,
+                         query_norm: float, limit: int) -> List[Tuple[float, int]]:
+        """Сходство без NumPy: суммирование по обратным спискам признаков запроса"""
+        if self._postings is None:
+            self._postings = defaultdict(set)
+            for row, row_columns in self._rows.items():
+                for column in row_columns:
+                    self._postings[column].add(row)
+        dots: Dict[int, float] = defaultdict(float)
+        for column in columns:
+            for other in self._postings.get(column, ()):
+                if other != ordinal:
+                    dots[other] += weight_sq[column]
+        ranked = []
+        for other, dot in dots.items():
+            norm = math.sqrt(sum(weight_sq[column] for column in self._rows[other]))
+            ranked.append((dot / (norm * query_norm), other))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return ranked[:limit]
+
+    def all_pairs(self, limit: int = 5) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Для каждой цели - limit самых похожих
+
+        С SciPy матрица нормированных строк умножается на себя
+        транспонированную блоками строк (не больше PAIRS_BLOCK_CELLS ячеек
+        результата за раз), без SciPy цели считаются по одной.
+
+        Returns:
+            {ID: [(ID, сходство)]}
+        """
+        if sparse is None or np is None:
+            return {target_id: [(other, score) for other, score, _ in self.similar(target_id, limit)]
+                    for target_id in self._ordinals}
+
+        weight_sq = self._weight_sq()
+        # Матрица нужна точная, без досчета измененных строк - собираем заново
+        self._matrix = None
+        rows, indices = self._csr()
+        norms = self._norms_np(weight_sq)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data = np.sqrt(weight_sq[indices]) / norms[rows]
+        data[~np.isfinite(data)] = 0.0
+        size = len(self._ids)
+        matrix = sparse.csr_matrix((data, (rows, indices)), shape=(size, len(self._labels)))
+        transposed = matrix.T.tocsc()
+
+        result: Dict[str, List[Tuple[str, float]]] = {}
+        block = max(1, PAIRS_BLOCK_CELLS // max(size, 1))
+        for start in range(0, size, block):
+            stop = min(start + block, size)
+            scores = (matrix[start:stop] @ transposed).toarray()
+            for offset in range(stop - start):
+                ordinal = start + offset
+                target_id = self._ids[ordinal]
+                if target_id is None:
+                    continue
+                row = scores[offset]
+                row[ordinal] = 0.0
+                count = min(limit, int(np.count_nonzero(row > 0)))
+                if not count:
+                    result[target_id] = []
+                    continue
+                top = np.argpartition(-row, count - 1)[:count]
+                ranked = sorted(((float(row[i]), int(i)) for i in top), key=lambda item: (-item[0], item[1]))
+                result[target_id] = [(self._ids[other], score) for score, other in ranked]
+        return result
+
+
+# Регистрация в общем реестре индексов DataManager
+INDEXES[SimilarityIndex.name] = SimilarityIndex
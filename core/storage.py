@@ -0,0 +1,1128 @@
+"""
+OSINT Profiler - Storage Backends
+Хранилища целей для DataManager: один JSON-файл, шарды по хешу ID или
+директория с файлом на каждую цель и каталогом
+"""
+
+import atexit
+import hashlib
+import itertools
+import json
+import os
+import signal
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from core.concurrency import file_lock, temp_path
+from core.derived import derived
+from core.profiling import count, span
+
+MANIFEST_FILE = "manifest.json"
+SHARDS_FORMAT = "osint-profiler-shards"
+DEFAULT_SHARDS = 16
+CATALOG_FILE = "catalog.json"
+CATALOG_FORMAT = "osint-profiler-catalog"
+# Файл межпроцессной блокировки записи в директории хранилища
+LOCK_FILE = ".lock"
+# Префикс меток незавершенной записи DirectoryStorage
+WRITING_PREFIX = ".writing."
+# Попытки снять согласованный срез, пока параллельная запись не завершится
+SNAPSHOT_RETRIES = 20
+
+
+def summarize(target: Dict) -> Dict:
+    """Краткая запись о цели для списков (как в каталоге DirectoryStorage)"""
+    return {
+        'id': target['id'],
+        'full_name': target.get('personal', {}).get('full_name', ''),
+        'birth_date': target.get('personal', {}).get('birth_date'),
+        'tags': target.get('tags', []),
+        'updated_at': target.get('updated_at'),
+        'stats': derived(target)['stats'],
+    }
+
+
+class Snapshot:
+    """
+    Неизменяемый срез хранилища
+
+    Хранилища не изменяют однажды выданные списки целей (каждая запись
+    создает новые), поэтому срез - это просто ссылки на списки одной
+    версии. Читатель, закрепивший срез, видит одну и ту же согласованную
+    базу, сколько бы записей ни было сделано после, а писателей срез не
+    блокирует. Интерфейс чтения тот же, что у хранилищ.
+    """
+
+    def __init__(self, version, parts: List[List[Dict]]):
+        """
+        Args:
+            version: Версия данных (сигнатура хранилища на момент среза)
+            parts: Списки целей по частям хранилища (шардам)
+        """
+        self.version = version
+        self._parts = parts
+        self._all: Optional[List[Dict]] = parts[0] if len(parts) == 1 else None
+        self._index: Optional[Dict[str, Dict]] = None
+
+    def signature(self):
+        return self.version
+
+    def snapshot(self) -> "Snapshot":
+        return self
+
+    def all(self) -> List[Dict]:
+        if self._all is None:
+            self._all = [target for part in self._parts for target in part]
+        return self._all
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        if self._index is None:
+            self._index = {target['id']: target for target in self.all()}
+        return self._index.get(target_id)
+
+    def summaries(self) -> List[Dict]:
+        return [summarize(target) for target in self.all()]
+
+    def partitions(self) -> List["Snapshot"]:
+        if len(self._parts) == 1:
+            return [self]
+        return [Snapshot(self.version, [part]) for part in self._parts]
+
+    def put_many(self, targets: Iterable[Dict]):
+        raise RuntimeError("Срез базы только для чтения")
+
+    def put(self, target: Dict):
+        self.put_many([target])
+
+    def delete(self, target_id: str) -> bool:
+        raise RuntimeError("Срез базы только для чтения")
+
+    def delete_many(self, target_ids: Iterable[str]) -> int:
+        raise RuntimeError("Срез базы только для чтения")
+
+
+class JsonFileStorage:
+    """
+    Все цели в одном JSON-файле ({"targets": [...]})
+
+    Разобранный файл кэшируется по сигнатуре (mtime, размер, inode) и
+    перечитывается только при изменении. Каждая запись создает новый
+    список целей (старый не изменяется), поэтому ранее полученные списки
+    остаются согласованными, а смена списка означает смену данных.
+
+    Чтение-изменение-запись файла идет под межпроцессной блокировкой
+    (файл <path>.lock), так что параллельные процессы не теряют записи
+    друг друга.
+    """
+
+    def __init__(self, path: str, indent: Optional[int] = 2, create: bool = True):
+        """
+        Args:
+            path: Путь к файлу БД
+            indent: Отступ JSON при записи (None - компактная запись)
+            create: Создать пустую БД, если файла нет
+        """
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.indent = indent
+        # Кэш: (сигнатура файла, данные, индекс {id: позиция})
+        self._cache: Optional[Tuple[Tuple[int, int, int], Dict, Dict[str, int]]] = None
+        if create and not os.path.exists(path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with file_lock(self.lock_path):
+                # Файл мог создать параллельный процесс
+                if not os.path.exists(path):
+                    self._save({"targets": []})
+
+    def signature(self) -> Tuple[int, int, int]:
+        """
+        Сигнатура файла (mtime, размер, inode) для проверки кэша
+
+        Файл заменяется атомарно через временный, так что каждая запись
+        дает новый inode - две записи одного размера в пределах разрешения
+        mtime тоже различимы.
+        """
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load(self) -> Tuple[Dict, Dict[str, int]]:
+        signature = self.signature()
+        if self._cache is not None and self._cache[0] == signature:
+            return self._cache[1], self._cache[2]
+
+        with span("db.load", size=signature[1]):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        index = {target['id']: i for i, target in enumerate(data['targets'])}
+        self._cache = (signature, data, index)
+        return data, index
+
+    def _save(self, data: Dict, index: Optional[Dict[str, int]] = None):
+        """Сохраняет данные атомарно, через временный файл"""
+        tmp_path = temp_path(self.path)
+        try:
+            with span("db.save"):
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=self.indent)
+                os.replace(tmp_path, self.path)
+        except Exception:
+            # Данные в памяти могли разойтись с диском - сбрасываем кэш
+            self._cache = None
+            raise
+        if index is None:
+            index = {target['id']: i for i, target in enumerate(data['targets'])}
+        self._cache = (self.signature(), data, index)
+        count("db.bytes_written", self._cache[0][1])
+
+    def all(self) -> List[Dict]:
+        """Все цели (общий список только для чтения)"""
+        return self._load()[0]['targets']
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        """Цель по ID (общий объект только для чтения) или None"""
+        data, index = self._load()
+        position = index.get(target_id)
+        return None if position is None else data['targets'][position]
+
+    def _with_targets(self, targets: Iterable[Dict]) -> Tuple[Dict, Dict[str, int]]:
+        """Новые данные и индекс с добавленными или замененными целями"""
+        data, index = self._load()
+        items = list(data['targets'])
+        index = dict(index)
+        for target in targets:
+            position = index.get(target['id'])
+            if position is None:
+                index[target['id']] = len(items)
+                items.append(target)
+            else:
+                items[position] = target
+        return dict(data, targets=items), index
+
+    def _without(self, target_ids: Iterable[str]) -> Optional[Tuple[Dict, Dict[str, int]]]:
+        """Новые данные и индекс без целей или None, если ни одной из них нет"""
+        data, index = self._load()
+        removed = {target_id for target_id in target_ids if target_id in index}
+        if not removed:
+            return None
+        items = [target for target in data['targets'] if target['id'] not in removed]
+        return dict(data, targets=items), {target['id']: i for i, target in enumerate(items)}
+
+    def put_many(self, targets: Iterable[Dict]):
+        """Добавляет или заменяет цели (по ID) одной записью файла"""
+        with file_lock(self.lock_path):
+            self._save(*self._with_targets(targets))
+
+    def put(self, target: Dict):
+        """Добавляет или заменяет цель"""
+        self.put_many([target])
+
+    def delete(self, target_id: str) -> bool:
+        """Удаляет цель, возвращает False если ее нет"""
+        return self.delete_many([target_id]) > 0
+
+    def delete_many(self, target_ids: Iterable[str]) -> int:
+        """Удаляет цели одной записью файла, возвращает число удаленных"""
+        with file_lock(self.lock_path):
+            before = len(self._load()[1])
+            updated = self._without(target_ids)
+            if updated is None:
+                return 0
+            self._save(*updated)
+        return before - len(updated[1])
+
+    def summaries(self) -> List[Dict]:
+        """Краткие записи о всех целях (id, full_name, birth_date, tags, updated_at, stats)"""
+        return [summarize(target) for target in self.all()]
+
+    def snapshot(self) -> Snapshot:
+        """Срез текущей версии файла (без копирования: файл заменяется атомарно)"""
+        self._load()
+        signature, data, _ = self._cache
+        return Snapshot(signature, [data['targets']])
+
+    def partitions(self) -> List["JsonFileStorage"]:
+        """Независимые части хранилища для параллельной обработки"""
+        return [self]
+
+
+class ShardFile:
+    """
+    Версия шарда, закрепленная открытым файлом (часть ShardedStorage.partitions())
+
+    Файл открывается сразу, а читается и разбирается только в all() и без
+    кэширования, так что перебор частей держит в памяти один шард.
+    Открытый файл остается читаемым, даже если писатель опубликовал новое
+    поколение и сборка мусора удалила эту версию (Windows удалить открытый
+    файл не даст). Интерфейс чтения тот же, что у хранилищ.
+    """
+
+    def __init__(self, version, path: str):
+        """
+        Args:
+            version: Версия хранилища (сигнатура манифеста, по которому открыт шард)
+            path: Путь к файлу версии шарда
+        """
+        self.version = version
+        self.path = path
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+
+    def signature(self):
+        return self.version
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            self._file.seek(0)
+            payload = self._file.read()
+        with span("db.load", size=len(payload)):
+            return json.loads(payload.decode('utf-8'))['targets']
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        return next((target for target in self.all() if target['id'] == target_id), None)
+
+    def summaries(self) -> List[Dict]:
+        return [summarize(target) for target in self.all()]
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot(self.version, [self.all()])
+
+    def partitions(self) -> List["ShardFile"]:
+        return [self]
+
+    def close(self):
+        self._file.close()
+
+    def __del__(self):
+        file = getattr(self, '_file', None)
+        if file is not None:
+            file.close()
+
+
+class ShardedStorage:
+    """
+    Цели, разбитые по хешу ID на N файлов-шардов, и манифест
+
+    Структура директории:
+        manifest.json           {"format", "version", "shards", "generation",
+                                 "files": [имя файла каждого шарда]}
+        shard_0000.json         {"targets": [...]} - цели с crc32(id) % N == 0
+        shard_0003.000017.json  версия шарда 3, записанная в поколении 17
+        ...
+
+    Чтение и запись цели затрагивают только ее шард, поэтому параллельные
+    пакетные задачи могут обрабатывать по шарду на процесс. Число шардов
+    меняется офлайн через migrate() в новую директорию.
+
+    Файлы шардов не перезаписываются: запись создает новые версии
+    затронутых шардов и атомарно заменяет манифест, который и является
+    точкой публикации. Срез читает файлы, перечисленные в одном манифесте,
+    поэтому видит пакет, затронувший несколько шардов, целиком или не
+    видит вовсе, и не ждет писателей.
+
+    Писатели (в том числе разные процессы) работают по очереди под
+    блокировкой файла .lock: манифест перечитывается под ней, так что
+    запись опирается на последнее поколение и не теряет чужих изменений.
+    Под той же блокировкой сборка мусора удаляет версии шардов, которых нет
+    ни в текущем, ни в предыдущем манифесте; читатель, не успевший открыть
+    удаленный файл, перечитывает манифест.
+    """
+
+    def __init__(self, directory: str, shards: Optional[int] = None):
+        """
+        Args:
+            directory: Директория шардов
+            shards: Число шардов для новой директории (для существующей
+                    берется из манифеста)
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        # Кэш манифеста: (сигнатура файла, манифест)
+        self._manifest: Optional[Tuple[Tuple[int, int, int], Dict]] = None
+        # Открытые версии шардов: имя файла -> JsonFileStorage
+        self._files: Dict[str, JsonFileStorage] = {}
+        self._snapshot: Optional[Snapshot] = None
+
+        if not os.path.exists(self.manifest_path):
+            os.makedirs(directory, exist_ok=True)
+            with file_lock(self.lock_path):
+                # Директорию мог создать параллельный процесс
+                if not os.path.exists(self.manifest_path):
+                    files = [f"shard_{i:04d}.json" for i in range(shards or DEFAULT_SHARDS)]
+                    for name in files:
+                        JsonFileStorage(os.path.join(directory, name), indent=None,
+                                        create=False)._save({"targets": []})
+                    _write_json_atomic(self.manifest_path, {'format': SHARDS_FORMAT, 'version': 2,
+                                                            'shards': len(files), 'generation': 0,
+                                                            'files': files})
+                    return
+
+        manifest = self._load_manifest()
+        if manifest.get('format') != SHARDS_FORMAT:
+            raise ValueError(f"{self.manifest_path}: неизвестный формат манифеста")
+        if shards is not None and shards != manifest['shards']:
+            raise ValueError(f"{directory} уже содержит {manifest['shards']} шардов; "
+                             f"для изменения числа шардов используйте migrate")
+
+    def _load_manifest(self, fresh: bool = False) -> Dict:
+        """
+        Манифест (кэшируется по сигнатуре файла)
+
+        Args:
+            fresh: Перечитать файл без сверки с кэшем - под блокировкой
+                   записи и после ошибки чтения шарда (сигнатура может
+                   совпасть у разных версий, если inode переиспользован)
+        """
+        st = os.stat(self.manifest_path)
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if fresh or self._manifest is None or self._manifest[0] != signature:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Манифест первой версии: файлы шардов с постоянными именами
+            manifest.setdefault('generation', 0)
+            manifest.setdefault('files', [f"shard_{i:04d}.json" for i in range(manifest['shards'])])
+            self._manifest = (signature, manifest)
+        return self._manifest[1]
+
+    def _open(self, name: str) -> JsonFileStorage:
+        """Версия шарда по имени файла (FileNotFoundError, если ее уже удалили)"""
+        storage = self._files.get(name)
+        if storage is None:
+            storage = JsonFileStorage(os.path.join(self.directory, name), indent=None, create=False)
+            self._files[name] = storage
+        return storage
+
+    def _forget_old(self, files: List[str]):
+        """Забывает кэш версий шардов, которых нет в текущем манифесте"""
+        current = set(files)
+        for name in list(self._files):
+            if name not in current:
+                del self._files[name]
+
+    @property
+    def shard_count(self) -> int:
+        return self._load_manifest()['shards']
+
+    def shard_of(self, target_id: str) -> int:
+        """Номер шарда цели (стабилен между запусками и платформами)"""
+        return zlib.crc32(target_id.encode('utf-8')) % self.shard_count
+
+    def signature(self) -> Tuple:
+        manifest = self._load_manifest()
+        return (manifest['generation'], tuple(manifest['files']))
+
+    def snapshot(self) -> Snapshot:
+        """Согласованный срез всех шардов одного поколения (кэшируется)"""
+        for attempt in range(SNAPSHOT_RETRIES):
+            manifest = self._load_manifest(fresh=attempt > 0)
+            version = (manifest['generation'], tuple(manifest['files']))
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            try:
+                with span("db.snapshot", shards=len(manifest['files'])):
+                    parts = [self._open(name).all() for name in manifest['files']]
+            except FileNotFoundError:
+                # Писатель опубликовал новое поколение и удалил старый файл
+                time.sleep(0.005 * attempt)
+                continue
+            self._forget_old(manifest['files'])
+            self._snapshot = Snapshot(version, parts)
+            return self._snapshot
+        raise RuntimeError(f"{self.directory}: не удалось прочитать согласованный срез шардов")
+
+    def all(self) -> List[Dict]:
+        """Все цели всех шардов (из согласованного среза)"""
+        return self.snapshot().all()
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        for attempt in range(SNAPSHOT_RETRIES):
+            manifest = self._load_manifest(fresh=attempt > 0)
+            try:
+                return self._open(manifest['files'][self.shard_of(target_id)]).get(target_id)
+            except FileNotFoundError:
+                time.sleep(0.005 * attempt)
+                continue
+        raise RuntimeError(f"{self.directory}: шард цели {target_id} недоступен")
+
+    def _publish(self, manifest: Dict, changes: Dict[int, Tuple[Dict, Dict[str, int]]]):
+        """
+        Записывает новые версии шардов и публикует их одним манифестом
+        (под блокировкой записи)
+
+        Args:
+            manifest: Манифест, прочитанный под блокировкой
+            changes: {номер шарда: (данные, индекс)}
+        """
+        generation = manifest['generation'] + 1
+        previous = manifest['files']
+        files = list(previous)
+        for shard, (data, index) in changes.items():
+            name = f"shard_{shard:04d}.{generation:06d}.json"
+            storage = JsonFileStorage(os.path.join(self.directory, name), indent=None, create=False)
+            storage._save(data, index)
+            self._files[name] = storage
+            files[shard] = name
+
+        _write_json_atomic(self.manifest_path, dict(manifest, generation=generation, files=files))
+        self._collect_garbage(set(files) | set(previous))
+        self._forget_old(files)
+
+    def _collect_garbage(self, keep: set):
+        """
+        Удаляет версии шардов, которых нет в keep (под блокировкой записи)
+
+        Версии предыдущего манифеста остаются до следующей записи, чтобы
+        читатель, только что прочитавший манифест, успел открыть свои файлы.
+        Заодно удаляются недописанные файлы упавших писателей.
+        """
+        for name in os.listdir(self.directory):
+            if not name.startswith("shard_") or name in keep:
+                continue
+            if name.endswith(".json") or ".json.tmp." in name:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # Windows не дает удалить открытый читателем файл - удалим в следующий раз
+                    pass
+
+    def put_many(self, targets: Iterable[Dict]):
+        """Добавляет или заменяет цели; каждый затронутый шард пишется один раз"""
+        groups: Dict[int, List[Dict]] = {}
+        for target in targets:
+            groups.setdefault(self.shard_of(target['id']), []).append(target)
+        with file_lock(self.lock_path):
+            manifest = self._load_manifest(fresh=True)
+            files = manifest['files']
+            self._publish(manifest, {shard: self._open(files[shard])._with_targets(items)
+                                     for shard, items in groups.items()})
+
+    def put(self, target: Dict):
+        self.put_many([target])
+
+    def delete(self, target_id: str) -> bool:
+        return self.delete_many([target_id]) > 0
+
+    def delete_many(self, target_ids: Iterable[str]) -> int:
+        """Удаляет цели; затронутые шарды публикуются одним поколением"""
+        groups: Dict[int, List[str]] = {}
+        for target_id in target_ids:
+            groups.setdefault(self.shard_of(target_id), []).append(target_id)
+        changes = {}
+        removed = 0
+        with file_lock(self.lock_path):
+            manifest = self._load_manifest(fresh=True)
+            files = manifest['files']
+            for shard, ids in groups.items():
+                current = self._open(files[shard])
+                updated = current._without(ids)
+                if updated is not None:
+                    changes[shard] = updated
+                    removed += len(current._load()[1]) - len(updated[1])
+            if changes:
+                self._publish(manifest, changes)
+        return removed
+
+    def summaries(self) -> List[Dict]:
+        return [summarize(target) for target in self.all()]
+
+    def partitions(self) -> List[ShardFile]:
+        """
+        Шарды одного поколения для перебора по одному
+
+        Все файлы закрепляются по одному манифесту сразу, а читаются по мере
+        перебора: в отличие от snapshot(), шарды не загружаются заранее.
+        """
+        for attempt in range(SNAPSHOT_RETRIES):
+            manifest = self._load_manifest(fresh=attempt > 0)
+            version = (manifest['generation'], tuple(manifest['files']))
+            parts: List[ShardFile] = []
+            try:
+                for name in manifest['files']:
+                    parts.append(ShardFile(version, os.path.join(self.directory, name)))
+            except FileNotFoundError:
+                for part in parts:
+                    part.close()
+                time.sleep(0.005 * attempt)
+                continue
+            return parts
+        raise RuntimeError(f"{self.directory}: не удалось прочитать согласованный срез шардов")
+
+
+class DirectoryStorage:
+    """
+    Файл на каждую цель и компактный каталог
+
+    Структура директории:
+        catalog.json            {"format", "version", "targets": {id: {full_name,
+                                 birth_date, tags, updated_at, stats, hash}}}
+        targets/<id>.json       данные одной цели
+        .writing.<pid>.<n>      метки незавершенных записей (своя у каждой)
+
+    get читает один небольшой файл, список целей (summaries) - только
+    каталог, запись цели переписывает ее файл и каталог. Досье отдельных
+    целей можно синхронизировать (rsync) и сравнивать по одному; после
+    изменения файлов в обход DataManager каталог пересобирается
+    rebuild_catalog().
+
+    Записи (в том числе из разных процессов) идут по очереди под
+    блокировкой файла .lock, а каталог перечитывается под ней, так что
+    параллельные писатели не теряют записей каталога друг друга.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.targets_dir = os.path.join(directory, "targets")
+        self.catalog_path = os.path.join(directory, CATALOG_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        # Кэш каталога: (сигнатура файла, записи)
+        self._catalog: Optional[Tuple[Tuple[int, int, int], Dict[str, Dict]]] = None
+        # Разобранные цели: id -> (hash, данные)
+        self._objects: Dict[str, Tuple[str, Dict]] = {}
+        self._snapshot: Optional[Snapshot] = None
+
+        os.makedirs(self.targets_dir, exist_ok=True)
+        if not os.path.exists(self.catalog_path):
+            with file_lock(self.lock_path):
+                if not os.path.exists(self.catalog_path):
+                    self._save_catalog({})
+
+    def _target_path(self, target_id: str) -> str:
+        # ID может содержать символы, недопустимые в имени файла
+        return os.path.join(self.targets_dir, quote(target_id, safe="") + ".json")
+
+    def signature(self) -> Tuple[int, int, int]:
+        st = os.stat(self.catalog_path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load_catalog(self, fresh: bool = False) -> Dict[str, Dict]:
+        """Записи каталога (fresh - перечитать без сверки с кэшем, под блокировкой записи)"""
+        signature = self.signature()
+        if not fresh and self._catalog is not None and self._catalog[0] == signature:
+            return self._catalog[1]
+
+        with span("db.catalog_load", size=signature[1]):
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        if catalog.get('format') != CATALOG_FORMAT:
+            raise ValueError(f"{self.catalog_path}: неизвестный формат каталога")
+        self._catalog = (signature, catalog['targets'])
+        return catalog['targets']
+
+    def _save_catalog(self, entries: Dict[str, Dict]):
+        _write_json_atomic(self.catalog_path,
+                           {'format': CATALOG_FORMAT, 'version': 1, 'targets': entries})
+        self._catalog = (self.signature(), entries)
+
+    def _write_target(self, target: Dict) -> Dict:
+        """Пишет файл цели, возвращает ее запись каталога"""
+        payload = json.dumps(target, ensure_ascii=False, indent=2).encode('utf-8')
+        digest = hashlib.sha256(payload).hexdigest()[:16]
+        _write_bytes_atomic(self._target_path(target['id']), payload)
+        self._objects[target['id']] = (digest, target)
+        entry = summarize(target)
+        del entry['id']
+        entry['hash'] = digest
+        return entry
+
+    def _read_target(self, target_id: str, digest: str) -> Optional[Dict]:
+        cached = self._objects.get(target_id)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        try:
+            with open(self._target_path(target_id), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        target = json.loads(payload.decode('utf-8'))
+        # Кэшируем под фактическим хешем: файл мог измениться после чтения каталога
+        self._objects[target_id] = (hashlib.sha256(payload).hexdigest()[:16], target)
+        return target
+
+    def snapshot(self) -> Snapshot:
+        """
+        Согласованный срез: цели ровно тех версий, что записаны в каталоге
+
+        Файлы целей пишутся до каталога, поэтому во время записи файл может
+        быть новее каталога. Пока есть хоть одна метка записи, срез
+        перечитывается (не дольше SNAPSHOT_RETRIES попыток);
+        без метки расхождение означает правку файлов в обход программы
+        (нужен rebuild_catalog), и срез берется как есть.
+        """
+        for attempt in range(SNAPSHOT_RETRIES):
+            catalog = self._load_catalog()
+            signature = self._catalog[0]
+            if self._snapshot is not None and self._snapshot.version == signature:
+                return self._snapshot
+
+            targets = []
+            consistent = True
+            with span("db.load_all", targets=len(catalog)):
+                for target_id, entry in catalog.items():
+                    target = self._read_target(target_id, entry['hash'])
+                    if target is None or self._objects[target_id][0] != entry['hash']:
+                        consistent = False
+                    if target is not None:
+                        targets.append(target)
+
+            if consistent or self.signature() == signature and not self._writing_in_progress():
+                self._snapshot = Snapshot(signature, [targets])
+                return self._snapshot
+            time.sleep(0.005 * (attempt + 1))
+        return Snapshot(signature, [targets])
+
+    def all(self) -> List[Dict]:
+        """Все цели (читаются только файлы, изменившиеся с прошлого вызова)"""
+        return self.snapshot().all()
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        entry = self._load_catalog().get(target_id)
+        return None if entry is None else self._read_target(target_id, entry['hash'])
+
+    def put_many(self, targets: Iterable[Dict]):
+        """Пишет файлы целей и один раз - каталог"""
+        with span("db.save"), file_lock(self.lock_path), self._writing():
+            entries = dict(self._load_catalog(fresh=True))
+            for target in targets:
+                entries[target['id']] = self._write_target(target)
+            self._save_catalog(entries)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Метка записи на время изменения файлов целей и каталога
+
+        У каждой записи своя метка (процесс и номер записи в нем), так что
+        писатели не удаляют метки друг друга.
+        """
+        path = os.path.join(self.directory, f"{WRITING_PREFIX}{os.getpid()}.{next(_writing_numbers)}")
+        open(path, 'w').close()
+        try:
+            yield
+        finally:
+            os.remove(path)
+
+    def _writing_in_progress(self) -> bool:
+        """Есть ли метка незавершенной записи (любого писателя)"""
+        return any(name.startswith(WRITING_PREFIX) for name in os.listdir(self.directory))
+
+    def put(self, target: Dict):
+        self.put_many([target])
+
+    def delete(self, target_id: str) -> bool:
+        return self.delete_many([target_id]) > 0
+
+    def delete_many(self, target_ids: Iterable[str]) -> int:
+        """Удаляет файлы целей и один раз переписывает каталог"""
+        with file_lock(self.lock_path):
+            entries = dict(self._load_catalog(fresh=True))
+            removed = [target_id for target_id in target_ids if entries.pop(target_id, None) is not None]
+            if not removed:
+                return 0
+            # Сначала файлы: запись каталога без файла get обработает как отсутствующую цель
+            with self._writing():
+                for target_id in removed:
+                    try:
+                        os.remove(self._target_path(target_id))
+                    except FileNotFoundError:
+                        pass
+                    self._objects.pop(target_id, None)
+                self._save_catalog(entries)
+        return len(removed)
+
+    def summaries(self) -> List[Dict]:
+        """Список целей только по каталогу, без чтения файлов целей"""
+        return [{'id': target_id, 'full_name': entry.get('full_name', ''),
+                 'birth_date': entry.get('birth_date'), 'tags': entry.get('tags', []),
+                 'updated_at': entry.get('updated_at'), 'stats': entry.get('stats')}
+                for target_id, entry in self._load_catalog().items()]
+
+    def partitions(self) -> List["DirectoryStorage"]:
+        return [self]
+
+    def rebuild_catalog(self) -> Dict[str, int]:
+        """
+        Пересобирает каталог по файлам целей (после rsync или ручной правки)
+
+        Returns:
+            {'added', 'changed', 'removed'} - число расхождений с прежним каталогом
+        """
+        with file_lock(self.lock_path):
+            old = self._load_catalog(fresh=True)
+            entries: Dict[str, Dict] = {}
+            for name in os.listdir(self.targets_dir):
+                if not name.endswith(".json"):
+                    continue
+                with open(os.path.join(self.targets_dir, name), 'rb') as f:
+                    payload = f.read()
+                target = json.loads(payload.decode('utf-8'))
+                if quote(target['id'], safe="") != name[:-len(".json")]:
+                    raise ValueError(f"{name}: ID в файле ({target['id']}) не совпадает с именем файла")
+                entry = summarize(target)
+                del entry['id']
+                entry['hash'] = hashlib.sha256(payload).hexdigest()[:16]
+                entries[target['id']] = entry
+
+            self._objects.clear()
+            self._save_catalog(entries)
+        return {
+            'added': len(entries.keys() - old.keys()),
+            'changed': sum(1 for key in entries.keys() & old.keys()
+                           if entries[key]['hash'] != old[key]['hash']),
+            'removed': len(old.keys() - entries.keys()),
+        }
+
+
+class BufferedStorage:
+    """
+    Хранилище с отложенной записью поверх любого другого
+
+    put/delete только обновляют словарь ожидающих изменений в памяти (и
+    сразу видны читателям), а фоновый поток-писатель сбрасывает их в
+    базовое хранилище: все, что накопилось, пока шла предыдущая запись,
+    уходит одним put_many/delete_many. Так десятки потоков, меняющих разные
+    цели, дают одну запись файла вместо десятков.
+
+    С quiet_period запись откладывается (write-behind): писатель ждет, пока
+    изменения не прекратятся на quiet_period секунд, но не дольше max_delay
+    от первого незаписанного изменения. Серия правок в интерактивной сессии
+    дает одну запись. Незаписанные изменения сбрасываются при выходе
+    (atexit, SIGTERM, SIGHUP) и по flush()/close().
+
+    Вместе с изменениями можно ставить в очередь записи журнала
+    (append_records): по одной последней записи на цель, они передаются
+    колбэку journal в том же проходе писателя, сразу после записи пачки в
+    базовое хранилище, так что журнал не опережает данные на диске.
+
+    Методы потокобезопасны. Ошибка записи не теряет изменения: они
+    возвращаются в очередь, а flush() пробрасывает ошибку.
+    """
+
+    def __init__(self, base, quiet_period: float = 0.0, max_delay: float = 5.0,
+                 journal: Optional[Callable[[List[Dict]], None]] = None):
+        """
+        Args:
+            base: Базовое хранилище
+            quiet_period: Пауза без изменений перед записью, секунд
+                          (0 - писать сразу, объединяя то, что накопилось)
+            max_delay: Наибольшая задержка записи первого изменения, секунд
+            journal: Запись пачки записей журнала (после записи данных)
+        """
+        self.base = base
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.journal = journal
+        # Повторно входимая: delete_many проверяет наличие целей под той же блокировкой
+        self._cond = threading.Condition(threading.RLock())
+        # id -> цель или None (удаление); ожидают записи
+        self._pending: Dict[str, Optional[Dict]] = {}
+        # То же для пачки, которую писатель сейчас сбрасывает
+        self._inflight: Dict[str, Optional[Dict]] = {}
+        # id -> последняя запись журнала; ожидают записи и записываются сейчас
+        self._records: Dict[str, Dict] = {}
+        self._inflight_records: Dict[str, Dict] = {}
+        self._version = 0
+        self._failures = 0
+        self._error: Optional[BaseException] = None
+        self._closing = False
+        self._flush_requested = False
+        # Время первого и последнего незаписанного изменения (time.monotonic)
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._snapshot: Optional[Snapshot] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- запись ----------
+
+    def _enqueue(self, changes: Dict[str, Optional[Dict]]):
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Хранилище закрыто")
+            now = time.monotonic()
+            if not self._pending:
+                self._first_change = now
+            self._last_change = now
+            self._pending.update(changes)
+            self._version += 1
+            self._start_writer()
+            self._cond.notify_all()
+
+    def _start_writer(self):
+        """Запускает поток-писатель при первом изменении (под self._cond)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="osint-db-writer", daemon=True)
+            self._thread.start()
+            _flush_on_exit(self)
+
+    def put_many(self, targets: Iterable[Dict]):
+        self._enqueue({target['id']: target for target in targets})
+
+    def append_records(self, records: Iterable[Dict]):
+        """
+        Ставит в очередь записи журнала к уже поставленным изменениям
+
+        Запись цели заменяет ее прежнюю незаписанную запись: в журнал
+        попадает одна, последняя версия цели за проход писателя.
+        """
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Хранилище закрыто")
+            for record in records:
+                self._records.pop(record['id'], None)
+                self._records[record['id']] = record
+            self._start_writer()
+            self._cond.notify_all()
+
+    def put(self, target: Dict):
+        self.put_many([target])
+
+    def delete_many(self, target_ids: Iterable[str]) -> int:
+        with self._cond:
+            existing = [target_id for target_id in dict.fromkeys(target_ids)
+                        if self.get(target_id) is not None]
+            if existing:
+                self._enqueue({target_id: None for target_id in existing})
+        return len(existing)
+
+    def delete(self, target_id: str) -> bool:
+        return self.delete_many([target_id]) > 0
+
+    def _wait_for_work(self) -> bool:
+        """Ждет изменений; False - хранилище закрыто и все записано"""
+        while not (self._pending or self._records):
+            if self._closing:
+                return False
+            self._cond.wait()
+
+        # Write-behind: ждем паузы в изменениях, но не дольше max_delay
+        while self.quiet_period and not (self._flush_requested or self._closing):
+            deadline = min(self._last_change + self.quiet_period,
+                           self._first_change + self.max_delay)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        self._flush_requested = False
+        return True
+
+    def _run(self):
+        """Поток-писатель: сбрасывает накопившиеся изменения пачками"""
+        while True:
+            with self._cond:
+                if not self._wait_for_work():
+                    return
+                batch, self._pending, self._inflight = self._pending, {}, self._pending
+                records, self._records, self._inflight_records = self._records, {}, self._records
+            try:
+                with span("db.flush", changes=len(batch)):
+                    puts = [target for target in batch.values() if target is not None]
+                    deletes = [target_id for target_id, target in batch.items() if target is None]
+                    if puts:
+                        self.base.put_many(puts)
+                    if deletes:
+                        self.base.delete_many(deletes)
+                    if records and self.journal is not None:
+                        self.journal(list(records.values()))
+            except Exception as e:
+                with self._cond:
+                    # Более новые изменения тех же целей важнее возвращаемых
+                    batch.update(self._pending)
+                    self._pending, self._inflight = batch, {}
+                    for target_id, record in self._records.items():
+                        records.pop(target_id, None)
+                        records[target_id] = record
+                    self._records, self._inflight_records = records, {}
+                    self._failures += 1
+                    self._error = e
+                    self._cond.notify_all()
+                    # Пауза перед повтором (flush() будит раньше)
+                    self._cond.wait(1.0)
+                continue
+            with self._cond:
+                self._inflight = {}
+                self._inflight_records = {}
+                self._error = None
+                self._cond.notify_all()
+
+    def flush(self):
+        """Ждет, пока все изменения, сделанные до вызова, будут записаны"""
+        with self._cond:
+            failures = self._failures
+            if self._pending or self._records:
+                self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._inflight or self._records or self._inflight_records:
+                if self._failures != failures:
+                    raise self._error
+                self._cond.wait()
+
+    def close(self):
+        """Записывает оставшиеся изменения и останавливает поток-писатель"""
+        self.flush()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def dirty(self) -> bool:
+        """Есть ли изменения, еще не записанные в базовое хранилище"""
+        with self._cond:
+            return bool(self._pending or self._inflight)
+
+    # ---------- чтение ----------
+
+    def _overlay(self) -> Dict[str, Optional[Dict]]:
+        if not self._inflight:
+            return self._pending
+        overlay = dict(self._inflight)
+        overlay.update(self._pending)
+        return overlay
+
+    def get(self, target_id: str) -> Optional[Dict]:
+        with self._cond:
+            overlay = self._overlay()
+            if target_id in overlay:
+                return overlay[target_id]
+        return self.base.get(target_id)
+
+    def snapshot(self) -> Snapshot:
+        """
+        Срез: базовое хранилище с наложенными незаписанными изменениями
+
+        Без незаписанных изменений это срез самого базового хранилища (с его
+        версией), поэтому воркеры, читающие базу с диска, его узнают.
+        """
+        with self._cond:
+            overlay = dict(self._overlay())
+            base = self.base.snapshot()
+            version = (base.version, self._version)
+        if not overlay:
+            return base
+        if self._snapshot is not None and self._snapshot.version == version:
+            return self._snapshot
+
+        parts = []
+        for part in base.partitions():
+            items = []
+            for target in part.all():
+                target = overlay.pop(target['id'], target)
+                if target is not None:
+                    items.append(target)
+            parts.append(items)
+        # Новые цели - в последнюю часть
+        parts[-1].extend(target for target in overlay.values() if target is not None)
+        self._snapshot = Snapshot(version, parts)
+        return self._snapshot
+
+    def signature(self):
+        """Версия данных, как у snapshot().version, но без сборки среза"""
+        with self._cond:
+            if not (self._pending or self._inflight):
+                return self.base.signature()
+            return (self.base.signature(), self._version)
+
+    def all(self) -> List[Dict]:
+        return self.snapshot().all()
+
+    def summaries(self) -> List[Dict]:
+        if not self.dirty:
+            return self.base.summaries()
+        return self.snapshot().summaries()
+
+    def partitions(self) -> List:
+        # Без незаписанных изменений - части самого базового хранилища (шарды не читаются заранее)
+        if not self.dirty:
+            return self.base.partitions()
+        return self.snapshot().partitions()
+
+
+_open_buffers: "weakref.WeakSet[BufferedStorage]" = weakref.WeakSet()
+# Номера меток записи DirectoryStorage в этом процессе
+_writing_numbers = itertools.count()
+_exit_hooks_installed = False
+
+
+def _flush_all_buffers():
+    """Сбрасывает все хранилища с отложенной записью (при выходе)"""
+    for buffered in list(_open_buffers):
+        try:
+            buffered.close()
+        except Exception as e:
+            print(f"❌ Не удалось записать отложенные изменения: {e}")
+
+
+def _exit_on_signal(signum, frame):
+    # SystemExit вместо немедленного завершения: отработают finally и atexit
+    raise SystemExit(128 + signum)
+
+
+def _flush_on_exit(buffered: BufferedStorage):
+    """
+    Регистрирует хранилище для сброса при выходе из программы
+
+    SIGTERM и SIGHUP по умолчанию завершают процесс без atexit, поэтому,
+    если программа не поставила свои обработчики, они заменяются выходом
+    через SystemExit (только из главного потока - иначе signal недоступен).
+    """
+    global _exit_hooks_installed
+    _open_buffers.add(buffered)
+    if _exit_hooks_installed:
+        return
+    _exit_hooks_installed = True
+    atexit.register(_flush_all_buffers)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for name in ("SIGTERM", "SIGHUP"):
+        signum = getattr(signal, name, None)
+        if signum is not None and signal.getsignal(signum) == signal.SIG_DFL:
+            signal.signal(signum, _exit_on_signal)
+
+
+def _write_bytes_atomic(path: str, payload: bytes):
+    tmp_path = temp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    count("db.bytes_written", len(payload))
+
+
+def _write_json_atomic(path: str, data: Dict):
+    _write_bytes_atomic(path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+def open_storage(path: str):
+    """
+    Открывает хранилище по пути: директория с манифестом шардов -
+    ShardedStorage, директория с каталогом - DirectoryStorage, иначе JSON-файл
+    """
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            return ShardedStorage(path)
+        if os.path.exists(os.path.join(path, CATALOG_FILE)):
+            return DirectoryStorage(path)
+    return JsonFileStorage(path)
+
+
+def migrate(source, destination) -> int:
+    """
+    Копирует все цели из одного хранилища в другое (офлайн)
+
+    Используется для перехода между форматами и для изменения числа
+    шардов: ShardedStorage(new_dir, shards=N). Источник читается по
+    частям, каждая часть записывается в приемник одним вызовом.
+
+    Returns:
+        Число перенесенных целей
+    """
+    total = 0
+    for partition in source.partitions():
+        targets = partition.all()
+        destination.put_many(targets)
+        total += len(targets)
+    return total
@@ -0,0 +1,131 @@
+"""
+OSINT Profiler - Summary Aggregation
+Однопроходная агрегация по целям для сводного отчета с ограниченной памятью
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.derived import derived
+from core.geo import GridClusterer, collect_points
+
+
+class SpaceSaving:
+    """
+    Скетч Space-Saving для поиска самых частых значений (heavy hitters)
+
+    Хранит не более capacity счетчиков. Если различных значений не больше
+    capacity, счет точный; иначе погрешность каждого счетчика не превышает
+    n / capacity, а все значения с частотой выше этого порога гарантированно
+    присутствуют в скетче.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._counts: Dict[str, int] = {}
+        # Min-куча (счет, значение) с ленивым удалением устаревших записей
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, value: str, count: int = 1):
+        """Учитывает значение"""
+        counts = self._counts
+        if value in counts:
+            counts[value] += count
+        elif len(counts) < self.capacity:
+            counts[value] = count
+        else:
+            # Вытесняем минимальный счетчик, новое значение наследует его счет
+            while counts.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            floor, victim = heapq.heappop(self._heap)
+            del counts[victim]
+            counts[value] = floor + count
+
+        heapq.heappush(self._heap, (counts[value], value))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, v) for v, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, values: Iterable[str]):
+        """Учитывает несколько значений"""
+        for value in values:
+            self.add(value)
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Возвращает n самых частых значений с их (оценочными) частотами"""
+        return sorted(self._counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+
+def address_city(address: Dict) -> Optional[str]:
+    """Город адреса - первая часть строки адреса до запятой"""
+    text = (address.get('city') or address.get('address') or '').strip()
+    city = text.split(',')[0].strip()
+    return city or None
+
+
+class SummaryAggregator:
+    """
+    Потоковый агрегатор сводной статистики
+
+    Цели обрабатываются по одной: счетчики, скетчи частых тегов, платформ,
+    компаний и городов, кластеры карты. Память не зависит от числа целей
+    (кроме числа занятых ячеек карты).
+    """
+
+    def __init__(self, top_n: int = 10, sketch_capacity: int = 200, map_max_zoom: int = 10):
+        self.top_n = top_n
+        self.total_targets = 0
+        self.total_connections = 0
+        self.total_addresses = 0
+        self.total_social_accounts = 0
+        self.tags = SpaceSaving(sketch_capacity)
+        self.platforms = SpaceSaving(sketch_capacity)
+        self.companies = SpaceSaving(sketch_capacity)
+        self.cities = SpaceSaving(sketch_capacity)
+        self.clusterer = GridClusterer(max_zoom=map_max_zoom)
+
+    def add(self, target: Dict) -> Dict:
+        """
+        Учитывает цель
+
+        Returns:
+            Строка сводной таблицы для этой цели
+        """
+        stats = derived(target)['stats']
+        addresses = target.get('addresses', [])
+        social = target.get('social_media', [])
+
+        self.total_targets += 1
+        self.total_connections += stats['connections']
+        self.total_addresses += stats['addresses']
+        self.total_social_accounts += stats['social_accounts']
+
+        self.tags.update(target.get('tags', []))
+        self.platforms.update(s['platform'].lower() for s in social if s.get('platform'))
+        self.companies.update(j['company'] for j in target.get('employment', []) if j.get('company'))
+        self.cities.update(c for c in (address_city(a) for a in addresses) if c)
+
+        name = target.get('personal', {}).get('full_name', '')
+        self.clusterer.add_points(collect_points(target, label_prefix=f"{name or target['id']}: "))
+
+        return {
+            'id': target['id'],
+            'full_name': name,
+            'connections': stats['connections'],
+            'addresses': stats['addresses'],
+            'social_accounts': stats['social_accounts'],
+            'tags': target.get('tags', []),
+        }
+
+    def result(self) -> Dict:
+        """Возвращает итоговые показатели"""
+        return {
+            'total_targets': self.total_targets,
+            'total_connections': self.total_connections,
+            'total_addresses': self.total_addresses,
+            'total_social_accounts': self.total_social_accounts,
+            'top_tags': self.tags.top(self.top_n),
+            'top_platforms': self.platforms.top(self.top_n),
+            'top_companies': self.companies.top(self.top_n),
+            'top_cities': self.cities.top(self.top_n),
+        }
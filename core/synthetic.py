@@ -0,0 +1,271 @@
+"""
+OSINT Profiler - Synthetic Targets
+Детерминированный генератор правдоподобных синтетических целей для бенчмарков
+"""
+
+import json
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional
+
+FIRST_NAMES = {
+    'male': ["Алексей", "Иван", "Дмитрий", "Сергей", "Андрей", "Михаил", "Николай",
+             "Павел", "Артем", "Егор", "Максим", "Роман", "Олег", "Владимир"],
+    'female': ["Анна", "Мария", "Елена", "Ольга", "Наталья", "Татьяна", "Ирина",
+               "Екатерина", "Дарья", "Юлия", "Светлана", "Ксения", "Алина", "Вера"],
+}
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев",
+              "Морозов", "Волков", "Соколов", "Лебедев", "Козлов", "Новиков", "Федоров",
+              "Михайлов", "Орлов", "Зайцев", "Павлов", "Семенов", "Голубев"]
+PATRONYMICS = {
+    'male': ["Иванович", "Петрович", "Сергеевич", "Андреевич", "Николаевич", "Олегович"],
+    'female': ["Ивановна", "Петровна", "Сергеевна", "Андреевна", "Николаевна", "Олеговна"],
+}
+# Город: (lat, lon)
+CITIES = {
+    "Москва": (55.7558, 37.6173), "Санкт-Петербург": (59.9343, 30.3351),
+    "Новосибирск": (55.0084, 82.9357), "Екатеринбург": (56.8389, 60.6057),
+    "Казань": (55.7963, 49.1088), "Нижний Новгород": (56.2965, 43.9361),
+    "Самара": (53.1959, 50.1002), "Краснодар": (45.0355, 38.9753),
+    "Владивосток": (43.1155, 131.8855), "Калининград": (54.7104, 20.4522),
+}
+STREETS = ["ул. Ленина", "ул. Пушкина", "Невский проспект", "ул. Гагарина", "ул. Мира",
+           "ул. Советская", "пр. Победы", "ул. Садовая", "наб. Фонтанки", "ул. Лесная"]
+COMPANIES = ["Яндекс", "VK", "Сбер", "Тинькофф", "Газпром", "Ростелеком", "Лаборатория Касперского",
+             "Ozon", "Wildberries", "МТС", "Авито", "JetBrains", "1С", "РЖД", "Аэрофлот"]
+POSITIONS = ["Junior Developer", "Senior Developer", "Team Lead", "Аналитик", "Менеджер проектов",
+             "Инженер", "Дизайнер", "Бухгалтер", "Юрист", "Директор"]
+INSTITUTIONS = ["МГУ им. Ломоносова", "СПбГУ", "МФТИ", "ИТМО", "НГУ", "УрФУ", "КФУ", "ВШЭ"]
+PLATFORMS = ["vk", "instagram", "telegram", "github", "linkedin", "twitter", "facebook", "youtube"]
+RELATIONS = ["friend", "colleague", "classmate", "relative", "partner", "neighbor", "unknown"]
+SOURCES = ["VK", "LinkedIn", "Instagram", "Telegram", "GitHub", "Twitter", "Утечка БД", "Поиск"]
+EVENT_CATEGORIES = ["personal", "education", "employment", "relocation", "travel", "social"]
+FOOTPRINT_TYPES = ["post", "comment", "photo", "check-in", "registration", "leak"]
+TAGS = ["IT", "developer", "finance", "journalist", "student", "traveler", "crypto", "gamer",
+        "activist", "blogger", "security", "marketing", "science", "sport", "art"]
+
+EPOCH = date(1960, 1, 1)
+
+
+class SyntheticTargetGenerator:
+    """
+    Генератор синтетических целей
+
+    Цель с номером i зависит только от зерна и i, поэтому набор можно
+    генерировать потоково, по частям или параллельно и всегда получать
+    одни и те же данные. Часть связей указывает на другие синтетические
+    цели (по полному имени), так что граф связей получается общим.
+    """
+
+    def __init__(self, seed: int = 42, total: int = 1000, timeline: int = 20,
+                 connections: int = 15, addresses: int = 3, footprint: int = 10,
+                 target_link_ratio: float = 0.3):
+        """
+        Args:
+            seed: Зерно генератора
+            total: Размер набора (для ссылок между целями)
+            timeline: Среднее число событий таймлайна на цель
+            connections: Среднее число связей на цель
+            addresses: Среднее число адресов на цель
+            footprint: Среднее число записей цифрового следа на цель
+            target_link_ratio: Доля связей, ведущих к другим целям набора
+        """
+        self.seed = seed
+        self.total = max(total, 1)
+        self.timeline = timeline
+        self.connections = connections
+        self.addresses = addresses
+        self.footprint = footprint
+        self.target_link_ratio = target_link_ratio
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def _count(self, rng: random.Random, mean: int) -> int:
+        """Число записей раздела: равномерно от половины до полутора средних"""
+        return rng.randint(mean // 2, mean + mean // 2) if mean > 0 else 0
+
+    @staticmethod
+    def _date(rng: random.Random, start: date, end: date) -> str:
+        span = max((end - start).days, 1)
+        return (start + timedelta(days=rng.randrange(span))).isoformat()
+
+    def target_id(self, index: int) -> str:
+        """ID синтетической цели"""
+        return f"synthetic_{self.seed}_{index:07d}"
+
+    def full_name(self, index: int) -> str:
+        """Полное имя синтетической цели (без генерации всей цели)"""
+        rng = self._rng(index)
+        gender = rng.choice(('male', 'female'))
+        last = rng.choice(LAST_NAMES) + ("а" if gender == 'female' else "")
+        return f"{last} {rng.choice(FIRST_NAMES[gender])} {rng.choice(PATRONYMICS[gender])}"
+
+    def _random_person(self, rng: random.Random) -> str:
+        gender = rng.choice(('male', 'female'))
+        last = rng.choice(LAST_NAMES) + ("а" if gender == 'female' else "")
+        return f"{last} {rng.choice(FIRST_NAMES[gender])}"
+
+    def target(self, index: int) -> Dict:
+        """Генерирует цель с номером index"""
+        full_name = self.full_name(index)
+        # Отдельный поток случайных чисел для остальных полей
+        rng = random.Random((self.seed * 1_000_003 + index) * 31 + 7)
+        gender = 'female' if full_name.split()[0].endswith("а") else 'male'
+        birth = date.fromisoformat(self._date(rng, EPOCH, date(2004, 1, 1)))
+        today = date(2025, 1, 1)
+        login = f"user{index}_{rng.randrange(10000)}"
+        home = rng.choice(list(CITIES))
+
+        addresses = []
+        for _ in range(max(self._count(rng, self.addresses), 1)):
+            city = rng.choice(list(CITIES)) if addresses else home
+            lat, lon = CITIES[city]
+            addresses.append({
+                "type": rng.choice(("residence", "registration", "work")),
+                "address": f"{city}, {rng.choice(STREETS)} {rng.randint(1, 150)}, кв. {rng.randint(1, 300)}",
+                "start_date": self._date(rng, birth, today),
+                "end_date": None,
+                "coordinates": {"lat": round(lat + rng.uniform(-0.1, 0.1), 5),
+                                "lon": round(lon + rng.uniform(-0.1, 0.1), 5)},
+            })
+
+        connections = []
+        for _ in range(self._count(rng, self.connections)):
+            if rng.random() < self.target_link_ratio and self.total > 1:
+                other = rng.randrange(self.total)
+                name = self.full_name(other) if other != index else self._random_person(rng)
+            else:
+                name = self._random_person(rng)
+            connections.append({
+                "name": name,
+                "relation": rng.choice(RELATIONS),
+                "context": f"Контакт через {rng.choice(SOURCES)}",
+                "source": rng.choice(SOURCES),
+                "strength": rng.randint(1, 10),
+            })
+
+        timeline = []
+        for _ in range(self._count(rng, self.timeline)):
+            timeline.append({
+                "date": self._date(rng, birth, today),
+                "event": f"Событие: {rng.choice(EVENT_CATEGORIES)}",
+                "location": rng.choice(list(CITIES)),
+                "category": rng.choice(EVENT_CATEGORIES),
+            })
+
+        footprint = []
+        for _ in range(self._count(rng, self.footprint)):
+            source = rng.choice(SOURCES)
+            footprint.append({
+                "source": source,
+                "type": rng.choice(FOOTPRINT_TYPES),
+                "url": f"https://example.com/{source.lower()}/{login}/{rng.randrange(10 ** 6)}",
+                "date": self._date(rng, birth, today),
+                "content": f"Запись пользователя {login}",
+                "screenshot": None,
+            })
+
+        employment = []
+        for _ in range(rng.randint(0, 4)):
+            start = self._date(rng, birth + timedelta(days=18 * 365), today)
+            employment.append({
+                "company": rng.choice(COMPANIES),
+                "position": rng.choice(POSITIONS),
+                "location": rng.choice(list(CITIES)),
+                "start_date": start,
+                "end_date": rng.choice((None, self._date(rng, date.fromisoformat(start), today))),
+                "description": "",
+            })
+
+        social_media = [{
+            "platform": platform,
+            "url": f"https://{platform}.com/{login}",
+            "username": login,
+            "followers": rng.randint(0, 5000),
+            "posts_count": rng.randint(0, 1000),
+        } for platform in rng.sample(PLATFORMS, rng.randint(1, 4))]
+
+        created = self._date(rng, date(2023, 1, 1), today) + "T12:00:00"
+        return {
+            "id": self.target_id(index),
+            "created_at": created,
+            "updated_at": created,
+            "personal": {
+                "full_name": full_name,
+                "birth_date": birth.isoformat(),
+                "birth_place": f"{home}, Россия",
+                "gender": gender,
+                "aliases": [login],
+                "photo_url": "",
+            },
+            "contacts": {
+                "phones": [f"+7-9{rng.randint(10, 99)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}"],
+                "emails": [f"{login}@example.com"],
+                "messengers": {"telegram": f"@{login}"},
+            },
+            "social_media": social_media,
+            "family": [{
+                "relation": relation,
+                "full_name": self._random_person(rng),
+                "birth_date": self._date(rng, EPOCH - timedelta(days=30 * 365), birth),
+                "occupation": rng.choice(POSITIONS),
+                "workplace": rng.choice(COMPANIES),
+                "notes": "",
+            } for relation in rng.sample(("mother", "father", "sibling", "spouse"), rng.randint(0, 3))],
+            "education": [{
+                "type": "university",
+                "institution": rng.choice(INSTITUTIONS),
+                "location": rng.choice(list(CITIES)),
+                "start_date": (birth + timedelta(days=17 * 365)).isoformat(),
+                "end_date": (birth + timedelta(days=22 * 365)).isoformat(),
+                "degree": rng.choice(("Бакалавр", "Магистр", "Специалист")),
+            }] if rng.random() < 0.7 else [],
+            "employment": employment,
+            "addresses": addresses,
+            "connections": connections,
+            "assets": {"vehicles": [], "property": []},
+            "timeline": timeline,
+            "digital_footprint": footprint,
+            "notes": "",
+            "tags": rng.sample(TAGS, rng.randint(1, 4)),
+        }
+
+    def iter_targets(self, count: Optional[int] = None, start: int = 0) -> Iterator[Dict]:
+        """Перебирает цели start..start+count (по умолчанию - весь набор)"""
+        stop = self.total if count is None else start + count
+        for index in range(start, stop):
+            yield self.target(index)
+
+    def write_database(self, path: str, count: Optional[int] = None) -> int:
+        """
+        Записывает набор в файл БД в формате data/database.json
+
+        Цели пишутся потоково, поэтому даже набор из миллиона целей не
+        собирается в памяти целиком.
+
+        Returns:
+            Число записанных целей
+        """
+        written = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"targets": [')
+            for target in self.iter_targets(count):
+                if written:
+                    f.write(',')
+                f.write('\n')
+                json.dump(target, f, ensure_ascii=False)
+                written += 1
+            f.write('\n]}\n')
+        return written
+
+
+def parse_scale(value: str) -> int:
+    """Разбирает размер набора: 1000, 10k, 1M"""
+    text = value.strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1_000_000, text[:-1]
+    return int(float(text) * multiplier)
@@ -0,0 +1,258 @@
+"""
+OSINT Profiler - Watch
+Слежение за базой для режима watch: ожидание изменений (inotify или опрос)
+и определение целей, изменившихся с прошлого прогона
+"""
+
+import copy
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.concurrency import temp_path
+from core.derived import DERIVED_FIELD
+from core.profiling import count, span
+
+try:
+    import inotify_simple
+except ImportError:  # без inotify_simple изменения базы отслеживаются опросом
+    inotify_simple = None
+
+WATCH_STATE_FILE = ".watch-state.json"
+WATCH_STATE_FORMAT = 1
+
+
+def content_hash(target: Dict) -> str:
+    """Хеш содержимого цели (без производных полей, они следуют из содержимого)"""
+    data = {key: value for key, value in target.items() if key != DERIVED_FIELD}
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def inotify_available() -> bool:
+    """Можно ли ждать изменений через inotify (иначе - опрос)"""
+    return inotify_simple is not None
+
+
+def store_signature(data_manager) -> tuple:
+    """Сигнатура базы и ее журнала изменений: меняется при каждой записи"""
+    log_stat = None
+    if data_manager.changes is not None:
+        try:
+            st = os.stat(data_manager.changes.log_path)
+            log_stat = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+    return (data_manager.version, log_stat)
+
+
+class StoreMonitor:
+    """
+    Ожидание изменений базы
+
+    Признак изменения - сигнатура (функция signature): при ее смене база
+    считается измененной. С inotify_simple (Linux) процесс просыпается по
+    событию файловой системы в директории базы и сразу сверяет сигнатуру,
+    без него сигнатура опрашивается каждые interval секунд. Серия быстрых
+    записей объединяется: после первого изменения ждем, пока база не
+    простоит debounce секунд (но не дольше max_delay).
+    """
+
+    def __init__(self, path: str, signature: Callable[[], object], interval: float = 1.0,
+                 debounce: float = 0.5, max_delay: float = 5.0, use_inotify: bool = True):
+        self.signature = signature
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._last = signature()
+        self._inotify = None
+        if use_inotify and inotify_simple is not None:
+            directory = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+            try:
+                self._inotify = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                self._inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+                                        | flags.DELETE | flags.MODIFY)
+            except OSError:
+                self._inotify = None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._inotify is not None else "poll"
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _sleep(self, timeout: float):
+        """Ждет события файловой системы (или просто timeout при опросе)"""
+        if self._inotify is not None:
+            self._inotify.read(timeout=max(int(timeout * 1000), 1))
+        else:
+            time.sleep(timeout)
+
+    def _changed(self) -> bool:
+        current = self.signature()
+        if current == self._last:
+            return False
+        self._last = current
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждет изменения базы и паузы после него
+
+        Returns:
+            True - база изменилась, False - истек timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._changed():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            # С inotify сигнатура все равно сверяется время от времени -
+            # на случай пропущенного события (например, сетевой ФС)
+            step = self.interval if self._inotify is None else max(self.interval, 30.0)
+            if deadline is not None:
+                step = min(step, max(deadline - time.monotonic(), 0.0))
+            self._sleep(step)
+
+        started = time.monotonic()
+        quiet_since = started
+        while True:
+            now = time.monotonic()
+            if now - quiet_since >= self.debounce or now - started >= self.max_delay:
+                break
+            self._sleep(min(self.debounce, self.interval))
+            if self._changed():
+                quiet_since = time.monotonic()
+                count("watch.debounced_writes")
+        return True
+
+
+class ChangeTracker:
+    """
+    Какие цели изменились с прошлого прогона
+
+    Состояние прогона (хеш содержимого, updated_at и файл отчета каждой
+    цели, номер журнала изменений) хранится в файле state_path. Если у базы
+    есть журнал изменений той же реплики, кандидаты берутся из его хвоста
+    после сохраненного номера; иначе - сравнением updated_at из кратких
+    записей целей. Кандидат считается измененным, только если изменился
+    хеш его содержимого.
+
+    Хранилище может отставать от журнала (запись другим процессом еще не
+    видна), поэтому версия кандидата берется из последней записи журнала,
+    если она новее цели в хранилище: иначе прогон запомнил бы номер журнала
+    со старым содержимым, и правка не была бы перестроена.
+    """
+
+    def __init__(self, data_manager, state_path: str):
+        self.dm = data_manager
+        self.state_path = state_path
+        self.state = self._load()
+        self._seq: Optional[int] = None
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('format') == WATCH_STATE_FORMAT and state.get('db') == os.path.abspath(self.dm.db_path):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'format': WATCH_STATE_FORMAT, 'db': os.path.abspath(self.dm.db_path),
+                'replica': None, 'seq': 0, 'targets': {}, 'retry': []}
+
+    def save(self):
+        tmp_path = temp_path(self.state_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def _candidates(self) -> Tuple[set, set, Dict[str, Dict]]:
+        """
+        (ID, которые могли измениться, ID, которые могли быть удалены,
+        последняя запись журнала по каждому ID из хвоста журнала)
+        """
+        known = self.state['targets']
+        log = self.dm.changes
+        if log is not None:
+            log.refresh()
+            if log.exists and self.state['replica'] == log.replica and self.state['seq'] <= log.last_seq:
+                latest: Dict[str, Dict] = {}
+                for record in log.since(self.state['seq']):
+                    latest[record['id']] = record
+                    self._seq = record['seq']
+                ids = set(latest)
+                count("watch.log_records", len(ids))
+                return ids, ids, latest
+            if log.exists:
+                self.state['replica'] = log.replica
+                self._seq = log.last_seq
+
+        # Без журнала (или он другой реплики) - по updated_at всех целей
+        summaries = self.dm.list_targets()
+        present = {summary['id'] for summary in summaries}
+        changed = {summary['id'] for summary in summaries
+                   if known.get(summary['id'], {}).get('updated_at') != summary['updated_at']}
+        return changed, set(known) - present, {}
+
+    def _current(self, target_id: str, record: Optional[Dict]) -> Optional[Dict]:
+        """Версия цели из хранилища или из записи журнала, если запись новее"""
+        target = self.dm.get_target(target_id)
+        if record is None or record['at'] <= ((target or {}).get('updated_at') or ''):
+            return target
+        count("watch.storage_behind_log")
+        return copy.deepcopy(record['target']) if record['op'] == 'put' else None
+
+    def pending(self) -> Tuple[List[Dict], List[str]]:
+        """
+        Изменения с прошлого прогона
+
+        Returns:
+            (цели, чьи отчеты нужно перестроить; ID удаленных целей)
+        """
+        with span("watch.diff"):
+            candidates, maybe_deleted, records = self._candidates()
+            candidates |= set(self.state['retry'])
+            changed, deleted = [], []
+            for target_id in sorted(candidates | maybe_deleted):
+                target = self._current(target_id, records.get(target_id))
+                if target is None:
+                    if target_id in self.state['targets']:
+                        deleted.append(target_id)
+                    continue
+                if target_id in candidates and \
+                        self.state['targets'].get(target_id, {}).get('hash') != content_hash(target):
+                    changed.append(target)
+        count("watch.changed_targets", len(changed))
+        return changed, deleted
+
+    def report_path(self, target_id: str) -> Optional[str]:
+        """Файл отчета цели, записанный прошлым прогоном"""
+        return self.state['targets'].get(target_id, {}).get('path')
+
+    def commit(self, rendered: Dict[str, Tuple[Dict, str]], failed: List[str], deleted: List[str]):
+        """
+        Запоминает результат прогона
+
+        Args:
+            rendered: {ID: (цель, путь к отчету)}
+            failed: ID целей, отчеты которых не удалось построить - они
+                    будут перестроены при следующем прогоне
+            deleted: ID удаленных целей
+        """
+        targets = self.state['targets']
+        for target_id, (target, path) in rendered.items():
+            targets[target_id] = {'hash': content_hash(target), 'updated_at': target.get('updated_at'),
+                                  'path': path}
+        for target_id in deleted:
+            targets.pop(target_id, None)
+        self.state['retry'] = sorted(set(failed))
+        if self._seq is not None:
+            self.state['seq'] = self._seq
+            self._seq = None
+        self.save()
@@ -4,6 +4,7 @@ OSINT Profiler - Demo Script
 Демонстрационный скрипт для тестирования системы
 """
 from core.data_manager import DataManager
+from core.derived import derived
 from generator import ReportGenerator
 from rich.console import Console
 from rich.progress import track
@@ -381,16 +382,17 @@ def show_demo_statistics(target: dict):
     stats_table.add_column("Параметр", style="cyan")
     stats_table.add_column("Значение", justify="right", style="green")
     
-    stats_table.add_row("Соцсети", str(len(target.get('social_media', []))))
-    stats_table.add_row("Связи", str(len(target.get('connections', []))))
-    stats_table.add_row("Адреса", str(len(target.get('addresses', []))))
-    stats_table.add_row("Места работы", str(len(target.get('employment', []))))
-    stats_table.add_row("Образование", str(len(target.get('education', []))))
-    stats_table.add_row("Члены семьи", str(len(target.get('family', []))))
-    stats_table.add_row("События в таймлайне", str(len(target.get('timeline', []))))
-    stats_table.add_row("Цифровой след", str(len(target.get('digital_footprint', []))))
-    stats_table.add_row("Активы", str(len(target.get('assets', {}).get('vehicles', [])) + len(target.get('assets', {}).get('property', []))))
-    stats_table.add_row("Теги", str(len(target.get('tags', []))))
+    stats = derived(target)['stats']
+    stats_table.add_row("Соцсети", str(stats['social_accounts']))
+    stats_table.add_row("Связи", str(stats['connections']))
+    stats_table.add_row("Адреса", str(stats['addresses']))
+    stats_table.add_row("Места работы", str(stats['jobs']))
+    stats_table.add_row("Образование", str(stats['education']))
+    stats_table.add_row("Члены семьи", str(stats['family']))
+    stats_table.add_row("События в таймлайне", str(stats['timeline']))
+    stats_table.add_row("Цифровой след", str(stats['digital_footprint']))
+    stats_table.add_row("Активы", str(stats['assets']))
+    stats_table.add_row("Теги", str(stats['tags']))
     
     console.print(stats_table)
 
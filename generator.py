@@ -1,20 +1,171 @@
 """
 OSINT Profiler - Report Generator
-Генератор HTML-отчетов из данных OSINT
+Генератор отчетов из данных OSINT: HTML-отчет, краткая справка в Markdown
+и JSON-досье
 """
+import json
 import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from typing import Dict, Optional, List
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from typing import Callable, Dict, Optional, List, Sequence, Tuple
+from core.bundler import AssetBundle, BatchWriter, build_bundle, check_compression, write_file
 from core.data_manager import DataManager
+from core.derived import age_on, derived
+from core.geo import cluster_points, collect_points
+from core.graph import ConnectionGraph, build_network_payload
+from core.jobs import JobQueue
+from core.watch import WATCH_STATE_FILE, ChangeTracker, StoreMonitor, store_signature
+from core.profiling import count, span, traced
+from core.summary import SummaryAggregator
+
+# Разделы, которые при большом числе записей отдаются в отчет как компактный
+# JSON и рендерятся на клиенте (колонки - поля, попадающие в JSON)
+LAZY_SECTION_COLUMNS = {
+    'timeline': ['date', 'event', 'location', 'category'],
+    'connections': ['name', 'relation', 'context', 'source', 'strength'],
+    'digital_footprint': ['date', 'source', 'type', 'content', 'url'],
+}
+
+# Форматы отчета: формат -> (шаблон, расширение файла). JSON-досье
+# сериализуется без шаблона; вместо формата можно указать имя своего
+# шаблона из templates/ (например, "card.txt" -> <имя>.card.txt)
+REPORT_FORMATS = {
+    'html': ('report.html', '.html'),
+    'md': ('brief.md', '.md'),
+    'json': (None, '.json'),
+}
+DOSSIER_FORMAT = "osint-profiler-dossier"
+DOSSIER_VERSION = 1
+# Записей раздела в краткой справке
+BRIEF_LIMIT = 10
+
+
+def format_extension(fmt: str) -> str:
+    """Расширение файла отчета в формате fmt"""
+    if fmt in REPORT_FORMATS:
+        return REPORT_FORMATS[fmt][1]
+    return f".{fmt}"
+
+
+def check_formats(formats: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Проверяет список форматов отчета (без повторов, порядок сохраняется)
+
+    Raises:
+        ValueError: Если формат неизвестен и не похож на имя шаблона
+    """
+    checked = []
+    for fmt in formats:
+        fmt = fmt.strip()
+        if fmt not in REPORT_FORMATS and not os.path.splitext(fmt)[1]:
+            raise ValueError(f"Неизвестный формат отчета: {fmt} "
+                             f"(доступны: {', '.join(REPORT_FORMATS)} или имя шаблона)")
+        if fmt and fmt not in checked:
+            checked.append(fmt)
+    if not checked:
+        raise ValueError("Не указан ни один формат отчета")
+    return tuple(checked)
+
+
+def _render_partition(settings: Dict, db_path: str, partition: int, version,
+                      assets: Optional[AssetBundle], compress: Sequence[str]) -> Optional[List[str]]:
+    """
+    Генерирует отчеты для целей одной части хранилища (в процессе-воркере)
+
+    Воркер работает только с той версией базы, которую закрепил
+    родительский процесс: если база успела измениться, возвращается None,
+    и часть рендерится в родителе из его среза.
+    """
+    snapshot = DataManager(db_path, changes=False).snapshot()
+    if snapshot.version != version:
+        return None
+    generator = ReportGenerator(data_manager=snapshot, **settings)
+    return generator._write_targets(snapshot.iter_targets(partition), assets, compress)
+
+
+# Генератор процесса-воркера очереди заданий: (генератор, бандл, сжатие)
+_job_worker = None
+
+
+def _init_job_worker(settings: Dict, db_path: str, assets: Optional[AssetBundle], compress: Sequence[str]):
+    """Создает генератор один раз на процесс-воркер"""
+    global _job_worker
+    generator = ReportGenerator(data_manager=DataManager(db_path, changes=False), **settings)
+    _job_worker = (generator, assets, compress)
+
+
+def _execute_job(generator: "ReportGenerator", job: Dict, assets: Optional[AssetBundle],
+                 compress: Sequence[str]) -> Tuple[bool, str, float]:
+    """
+    Выполняет задание на отчет
+
+    Returns:
+        (успех, путь к отчету или текст ошибки, длительность в секундах)
+    """
+    started = time.perf_counter()
+    try:
+        if 'target' in job:
+            # Режим watch передает уже прочитанную версию цели (база воркера может отставать)
+            path = generator._write_report(job['target'], job['params'].get('output_filename'),
+                                           assets, compress)
+        else:
+            path = generator.generate_report(job['target_id'], job['params'].get('output_filename'),
+                                             assets, compress)
+        return True, path, time.perf_counter() - started
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def _run_job(job: Dict) -> Tuple[bool, str, float]:
+    generator, assets, compress = _job_worker
+    return _execute_job(generator, job, assets, compress)
+
 
 class ReportGenerator:
-    """Класс для генерации HTML-отчетов"""
+    """Класс для генерации отчетов (HTML, Markdown, JSON)"""
 
-    def __init__(self, templates_dir: str = "templates", output_dir: str = "output"):
+    def __init__(self, templates_dir: str = "templates", output_dir: str = "output",
+                 data_manager: Optional[DataManager] = None, static_dir: str = "static",
+                 lazy_threshold: Optional[int] = 200, lazy_page_size: int = 100,
+                 graph_depth: int = 2, graph_max_nodes: int = 2000,
+                 map_max_zoom: int = 14, summary_map_max_zoom: int = 10,
+                 formats: Sequence[str] = ("html",)):
+        """
+        Args:
+            templates_dir: Директория шаблонов
+            output_dir: Директория для отчетов
+            data_manager: Общий DataManager (по умолчанию создается новый)
+            static_dir: Директория статических файлов
+            lazy_threshold: Число записей, начиная с которого раздел отчета
+                            встраивается как JSON и рендерится на клиенте
+                            постранично (None - всегда рендерить в HTML)
+            lazy_page_size: Размер страницы для таких разделов
+            graph_depth: Глубина эго-сети в графе связей (0 - без графа)
+            graph_max_nodes: Максимальное число узлов графа в отчете
+            map_max_zoom: Максимальный уровень кластеризации карты в отчете
+            summary_map_max_zoom: То же для карты сводного отчета
+            formats: Форматы отчета цели (см. REPORT_FORMATS); первый -
+                     основной, его путь возвращает generate_report
+        """
         self.templates_dir = templates_dir
         self.output_dir = output_dir
-        self.data_manager = DataManager()
+        self.static_dir = static_dir
+        self.lazy_threshold = lazy_threshold
+        self.lazy_page_size = lazy_page_size
+        self.graph_depth = graph_depth
+        self.graph_max_nodes = graph_max_nodes
+        self.map_max_zoom = map_max_zoom
+        self.summary_map_max_zoom = summary_map_max_zoom
+        self.formats = check_formats(formats)
+        self.data_manager = data_manager or DataManager()
+
+        # Граф связей строится один раз на снимок данных
+        self._graph: Optional[ConnectionGraph] = None
+        self._graph_source: Optional[List[Dict]] = None
 
         # Настраиваем Jinja2
         self.env = Environment(
@@ -44,19 +195,8 @@ class ReportGenerator:
             return str(date_string) if date_string else "N/A"
 
     def _calculate_age(self, birth_date: str) -> int:
-        """Вычисляет возраст"""
-        if not birth_date:
-            return 0
-        
-        try:
-            # Используем replace для корректной обработки Z-суффикса
-            birth = datetime.fromisoformat(birth_date.replace('Z', '+00:00'))
-            today = datetime.now()
-            age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
-            return max(0, age)  # Не возвращаем отрицательный возраст
-        except (ValueError, TypeError, AttributeError):
-            # Если формат даты неверен, возвращаем 0
-            return 0
+        """Вычисляет возраст (0, если дата не задана или неверна)"""
+        return age_on(birth_date)
 
     def _calculate_duration(self, start_date: str, end_date: Optional[str] = None) -> str:
         """Вычисляет продолжительность между двумя датами"""
@@ -82,6 +222,7 @@ class ReportGenerator:
         except (ValueError, TypeError, AttributeError):
             return "N/A"
 
+    @traced("generator.prepare")
     def _prepare_data(self, target: Dict) -> Dict:
         """
         Подготавливает данные для шаблона
@@ -90,8 +231,11 @@ class ReportGenerator:
             target: Данные цели
 
         Returns:
-            Обработанные данные
+            Обработанные данные (поверхностная копия, исходный словарь
+            не изменяется)
         """
+        target = dict(target)
+
         # Безопасная сортировка timeline
         if 'timeline' in target and target.get('timeline'):
             valid_timeline_items = []
@@ -136,20 +280,80 @@ class ReportGenerator:
                                          key=lambda x: x.get('start_date', ''), 
                                          reverse=True)
 
-        # Считаем статистику, проверяя наличие ключей
-        stats = {
-            'social_accounts': len(target.get('social_media', [])),
-            'connections': len(target.get('connections', [])),
-            'addresses': len(target.get('addresses', [])),
-            'jobs': len(target.get('employment', [])),
-            'education': len(target.get('education', [])),
-            'family': len(target.get('family', [])),
-            'assets': len(target.get('assets', {}).get('vehicles', [])) + len(target.get('assets', {}).get('property', []))
-        }
-        target['stats'] = stats
+        # Счетчики, возраст, текущие работа и адрес - из блока, который
+        # DataManager обновляет при записи (без него - считаются здесь)
+        target['derived'] = derived(target)
+        target['stats'] = target['derived']['stats']
+
+        # Большие разделы отдаем клиенту как компактный JSON
+        target['lazy_sections'] = self._build_lazy_sections(target)
 
         return target
 
+    def _build_lazy_sections(self, target: Dict) -> Dict[str, Dict]:
+        """
+        Упаковывает большие разделы в компактный JSON (колонки + строки)
+
+        Returns:
+            Словарь {раздел: {'count', 'payload'}} для разделов выше порога
+        """
+        if self.lazy_threshold is None:
+            return {}
+
+        sections = {}
+        for name, columns in LAZY_SECTION_COLUMNS.items():
+            items = target.get(name) or []
+            if len(items) <= self.lazy_threshold:
+                continue
+
+            rows = [[item.get(column) for column in columns] for item in items]
+            sections[name] = {
+                'count': len(items),
+                'payload': self._to_script_json({'columns': columns, 'rows': rows}),
+            }
+
+        return sections
+
+    def _get_graph(self) -> ConnectionGraph:
+        """
+        Возвращает граф связей по всем целям
+
+        Граф перестраивается только если DataManager вернул другой список
+        целей (т.е. база изменилась), поэтому пакетная генерация строит его
+        один раз для всех отчетов.
+        """
+        targets = self.data_manager.get_all_targets()
+        if self._graph is None or self._graph_source is not targets:
+            self._graph = ConnectionGraph(targets)
+            self._graph_source = targets
+        return self._graph
+
+    def _build_network(self, target: Dict) -> Optional[str]:
+        """Строит эго-сеть цели с укладкой и упаковывает ее в JSON"""
+        if not self.graph_depth or not target.get('connections'):
+            return None
+
+        network = build_network_payload(self._get_graph(), target['id'],
+                                        self.graph_depth, self.graph_max_nodes)
+        if network is None:
+            return None
+
+        return self._to_script_json(network)
+
+    def _build_map(self, points, max_zoom: int) -> Optional[str]:
+        """Кластеризует точки по уровням масштаба и упаковывает в JSON"""
+        clusters = cluster_points(points, max_zoom=max_zoom)
+        if clusters is None:
+            return None
+        return self._to_script_json(clusters)
+
+    @staticmethod
+    def _to_script_json(data) -> str:
+        """Сериализует данные для встраивания в <script type="application/json">"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        # "</" внутри <script> закрыл бы тег раньше времени
+        return payload.replace('</', '<\\/')
+
     def _sanitize_filename(self, filename: str, max_length: int = 100) -> str:
         """Очищает имя файла от недопустимых символов"""
         # Удаляем недопустимые символы
@@ -162,16 +366,21 @@ class ReportGenerator:
         # Если имя пустое, используем дефолт
         return safe_name if safe_name else "report"
 
-    def generate_report(self, target_id: str, output_filename: Optional[str] = None) -> str:
+    def generate_report(self, target_id: str, output_filename: Optional[str] = None,
+                        assets: Optional[AssetBundle] = None, compress: Sequence[str] = ()) -> str:
         """
-        Генерирует HTML-отчет для цели
+        Генерирует отчет для цели во всех форматах генератора
 
         Args:
             target_id: ID цели
-            output_filename: Имя выходного файла (опционально)
+            output_filename: Имя выходного файла (опционально); файлы
+                             остальных форматов получают то же имя с
+                             другим расширением
+            assets: Бандл статических ресурсов (по умолчанию - ссылки на static/)
+            compress: Форматы предварительного сжатия ("gzip", "br")
 
         Returns:
-            Путь к созданному файлу
+            Путь к файлу основного (первого) формата
             
         Raises:
             ValueError: Если цель не найдена
@@ -182,71 +391,357 @@ class ReportGenerator:
         if not target:
             raise ValueError(f"Цель с ID {target_id} не найдена")
 
-        # Подготавливаем данные
-        target = self._prepare_data(target)
+        return self._write_report(target, output_filename, assets, compress)
 
-        # Загружаем шаблон
-        try:
-            template = self.env.get_template('report.html')
-        except Exception as e:
-            raise ValueError(f"Ошибка при загрузке шаблона: {e}")
+    def _write_report(self, target: Dict, output_filename: Optional[str] = None,
+                      assets: Optional[AssetBundle] = None, compress: Sequence[str] = (),
+                      writer: Optional[BatchWriter] = None) -> str:
+        """
+        Рендерит все форматы отчета для уже загруженной цели и сохраняет их
+
+        С writer файлы отдаются на пакетную запись (ошибки записи вернет
+        writer.close()), без него - записываются сразу.
 
-        # Рендерим HTML
-        html_content = template.render(target=target, generated_at=datetime.now())
+        Returns:
+            Путь к файлу основного формата
+        """
+        # Подготавливаем данные один раз и рендерим все форматы
+        contents = self.render_formats(target, assets)
 
-        # Определяем имя файла
-        if not output_filename:
+        # Определяем имя файла (без расширения - оно свое у каждого формата)
+        if output_filename:
+            stem = os.path.splitext(output_filename)[0]
+        else:
             # Используем 'full_name' из 'personal', если существует, иначе 'target_id'
-            safe_name_part = target.get('personal', {}).get('full_name', target_id)
+            safe_name_part = target.get('personal', {}).get('full_name', target['id'])
             safe_name = self._sanitize_filename(safe_name_part)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_filename = f"{safe_name}_{timestamp}.html"
+            stem = f"{safe_name}_{timestamp}"
 
-        # Сохраняем файл
-        output_path = os.path.join(self.output_dir, output_filename)
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-        except IOError as e:
-            raise ValueError(f"Ошибка при сохранении файла: {e}")
+        # Сохраняем файлы
+        paths = []
+        for fmt, content in contents.items():
+            output_path = os.path.join(self.output_dir, stem + format_extension(fmt))
+            data = content.encode('utf-8')
+            if writer is not None:
+                writer.write(output_path, data)
+            else:
+                try:
+                    with span("generator.write"):
+                        write_file(output_path, data, compress)
+                except IOError as e:
+                    raise ValueError(f"Ошибка при сохранении файла: {e}")
+            count("generator.bytes_written", len(data))
+            paths.append(output_path)
 
-        return output_path
+        return paths[0]
+
+    def report_paths(self, path: str) -> List[str]:
+        """Файлы всех форматов отчета по пути к файлу основного формата"""
+        extension = format_extension(self.formats[0])
+        stem = path[:-len(extension)] if path.endswith(extension) else os.path.splitext(path)[0]
+        return [stem + format_extension(fmt) for fmt in self.formats]
+
+    def build_assets(self, mode: str = "inline", compress: Sequence[str] = ()) -> AssetBundle:
+        """
+        Собирает бандл CSS/JS один раз для пачки отчетов
+
+        Args:
+            mode: "inline" - встроить ресурсы в каждый отчет,
+                  "shared" - записать один хешированный файл в output/assets
+            compress: Форматы предварительного сжатия общего файла
+
+        Returns:
+            Бандл для передачи в generate_report
+        """
+        assets = build_bundle(self.static_dir, mode)
+        if mode == "shared":
+            assets.write_shared(self.output_dir, compress=compress)
+        return assets
 
-    def generate_all_reports(self) -> List[str]:
+    @traced("generator.report_all")
+    def generate_all_reports(self, bundle: Optional[str] = None,
+                             compress: Sequence[str] = (), workers: int = 0) -> List[str]:
         """
         Генерирует отчеты для всех целей
+
+        Args:
+            bundle: Режим бандла ресурсов ("inline", "shared" или None -
+                    ссылки на static/ как в одиночном отчете)
+            compress: Форматы предварительного сжатия ("gzip", "br")
+            workers: Число процессов; при шардированной БД каждый процесс
+                     обрабатывает свои шарды (0 - в текущем процессе)
         
         Returns:
             Список путей к созданным файлам
         """
-        targets = self.data_manager.get_all_targets()
+        compress = check_compression(compress)
+        assets = self.build_assets(bundle, compress) if bundle else None
+
+        # Все отчеты пачки строятся по одной версии базы; правки, сделанные
+        # во время генерации, попадут в следующий запуск
+        snapshot = self.data_manager.snapshot()
+        generator = ReportGenerator(data_manager=snapshot, **self._worker_settings())
+
+        partitions = snapshot.partition_count()
+        if workers > 0 and partitions > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, partitions)) as pool:
+                futures = [pool.submit(_render_partition, self._worker_settings(),
+                                       snapshot.db_path, partition, snapshot.version, assets, compress)
+                           for partition in range(partitions)]
+                generated = []
+                for partition, future in enumerate(futures):
+                    paths = future.result()
+                    if paths is None:
+                        count("generator.stale_partitions")
+                        paths = generator._write_targets(snapshot.iter_targets(partition), assets, compress)
+                    generated.extend(paths)
+                return generated
+
+        return generator._write_targets(snapshot.get_all_targets(), assets, compress)
+
+    @traced("generator.run_jobs")
+    def run_jobs(self, queue: JobQueue, workers: int = 0, prefetch: int = 2,
+                 bundle: Optional[str] = "shared", compress: Sequence[str] = (), wait_retries: bool = True,
+                 progress: Optional[Callable[[Dict, bool, str], None]] = None) -> Dict[str, int]:
+        """
+        Выполняет задания очереди, пока она не опустеет
+
+        Процессы-воркеры (workers > 0) создают генератор один раз и рендерят
+        задания, а этот процесс берет задания из очереди с запасом (prefetch
+        на воркер), чтобы воркеры не простаивали, и записывает результаты.
+        Неудачные задания возвращаются в очередь с паузой (см.
+        core.jobs.JobQueue.fail). При остановке (Ctrl+C) взятые, но не
+        выполненные задания возвращаются в очередь; при падении процесса
+        их выдаст заново истекший срок аренды.
+
+        Args:
+            queue: Очередь заданий
+            workers: Число процессов (0 - в текущем процессе)
+            prefetch: Заданий в работе на один воркер
+            bundle: Режим бандла ресурсов (см. generate_all_reports)
+            compress: Форматы предварительного сжатия
+            wait_retries: Дожидаться отложенных повторов (иначе выйти,
+                          когда готовых заданий не осталось)
+            progress: Вызывается после каждой попытки: (задание, успех,
+                      путь или текст ошибки)
+
+        Returns:
+            {'done', 'retried', 'failed'} - итоги попыток этого запуска
+        """
+        compress = check_compression(compress)
+        assets = self.build_assets(bundle, compress) if bundle else None
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        capacity = max(1, workers) * max(1, prefetch)
+        totals = {'done': 0, 'retried': 0, 'failed': 0}
+
+        def record(job: Dict, ok: bool, value: str, duration: Optional[float]):
+            if ok:
+                queue.complete(job['id'], value, duration)
+                totals['done'] += 1
+            else:
+                totals['retried' if queue.fail(job['id'], value, duration) else 'failed'] += 1
+            if progress:
+                progress(job, ok, value)
+
+        def new_pool():
+            return ProcessPoolExecutor(max_workers=workers, initializer=_init_job_worker,
+                                       initargs=(self._worker_settings(), self.data_manager.db_path,
+                                                 assets, compress))
+
+        pool = new_pool() if workers > 0 else None
+        in_flight: Dict = {}
+        try:
+            while True:
+                if len(in_flight) < capacity:
+                    for job in queue.claim(worker, capacity - len(in_flight)):
+                        if pool is None:
+                            in_flight[job['id']] = job
+                        else:
+                            in_flight[pool.submit(_run_job, job)] = job
+
+                if not in_flight:
+                    next_at = queue.next_available() if wait_retries else None
+                    if next_at is None:
+                        break
+                    time.sleep(min(max(next_at - time.time(), 0.05), 5.0))
+                    continue
+
+                if pool is None:
+                    for job_id in list(in_flight):
+                        result = _execute_job(self, in_flight[job_id], assets, compress)
+                        record(in_flight.pop(job_id), *result)
+                    continue
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        result = (False, f"BrokenProcessPool: {e}", None)
+                    record(job, *result)
+                if broken:
+                    # Упавший воркер ломает весь пул - создаем новый
+                    count("generator.job_pool_restarts")
+                    pool.shutdown(wait=False)
+                    pool = new_pool()
+        finally:
+            if in_flight:
+                queue.release(job['id'] for job in in_flight.values())
+            if pool is not None:
+                for future in in_flight:
+                    future.cancel()
+                pool.shutdown(wait=True)
+        return totals
+
+    def report_filename(self, target: Dict) -> str:
+        """Постоянное имя файла отчета цели (для режима watch): имя и ID"""
+        name = self._sanitize_filename(target.get('personal', {}).get('full_name') or target['id'])
+        return f"{name}_{self._sanitize_filename(target['id'])}{format_extension(self.formats[0])}"
+
+    def sync_reports(self, tracker: ChangeTracker, pool: Optional[ProcessPoolExecutor] = None,
+                     assets: Optional[AssetBundle] = None, compress: Sequence[str] = (),
+                     progress: Optional[Callable[[str, bool, str], None]] = None) -> Dict[str, int]:
+        """
+        Перестраивает отчеты только измененных с прошлого прогона целей и
+        удаляет отчеты удаленных
+
+        Returns:
+            {'rendered', 'failed', 'deleted'}
+        """
+        changed, deleted = tracker.pending()
+        jobs = [{'target_id': target['id'], 'target': target,
+                 'params': {'output_filename': self.report_filename(target)}}
+                for target in changed]
+        if pool is not None:
+            results = list(pool.map(_run_job, jobs))
+        else:
+            results = [_execute_job(self, job, assets, compress) for job in jobs]
+
+        rendered, failed = {}, []
+        for target, (ok, value, _) in zip(changed, results):
+            if ok:
+                previous = tracker.report_path(target['id'])
+                if previous and previous != value:
+                    # Имя цели изменилось - старые файлы больше не нужны
+                    self._remove_reports(previous)
+                rendered[target['id']] = (target, value)
+            else:
+                failed.append(target['id'])
+            if progress:
+                progress(target['id'], ok, value)
+        for target_id in deleted:
+            path = tracker.report_path(target_id)
+            if path:
+                self._remove_reports(path)
+            if progress:
+                progress(target_id, True, "удален")
+        tracker.commit(rendered, failed, deleted)
+        return {'rendered': len(rendered), 'failed': len(failed), 'deleted': len(deleted)}
+
+    def _remove_reports(self, path: str):
+        """Удаляет файлы всех форматов отчета (и их сжатые копии)"""
+        for report_path in self.report_paths(path):
+            for candidate in (report_path, f"{report_path}.gz", f"{report_path}.br"):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+
+    def watch(self, workers: int = 0, interval: float = 1.0, debounce: float = 0.5, max_delay: float = 5.0,
+              bundle: Optional[str] = "shared", compress: Sequence[str] = (), once: bool = False,
+              progress: Optional[Callable[[str, bool, str], None]] = None,
+              on_cycle: Optional[Callable[[Dict[str, int]], None]] = None):
+        """
+        Держит output/ в соответствии с базой
+
+        Первый прогон строит отчеты целей, которых нет в состоянии прошлого
+        прогона (output/.watch-state.json); дальше после каждого изменения
+        базы (см. core.watch.StoreMonitor) перестраиваются только цели с
+        изменившимся содержимым - параллельно в workers процессах, - а
+        отчеты удаленных целей удаляются. Имена файлов постоянные, так что
+        отчет обновляется на месте.
+
+        Args:
+            workers: Число процессов (0 - в текущем процессе)
+            interval: Период опроса базы без inotify, секунд
+            debounce: Пауза без записей перед перестроением, секунд
+            max_delay: Наибольшая задержка перестроения при непрерывных записях
+            bundle: Режим бандла ресурсов (см. generate_all_reports)
+            compress: Форматы предварительного сжатия
+            once: Один прогон без ожидания изменений
+            progress: Вызывается для каждой цели: (ID, успех, путь или ошибка)
+            on_cycle: Вызывается после каждого прогона с его итогами
+        """
+        compress = check_compression(compress)
+        assets = self.build_assets(bundle, compress) if bundle else None
+        dm = self.data_manager
+        tracker = ChangeTracker(dm, os.path.join(self.output_dir, WATCH_STATE_FILE))
+        monitor = None if once else StoreMonitor(dm.db_path, lambda: store_signature(dm),
+                                                 interval, debounce, max_delay)
+        pool = None
+        if workers > 0:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_job_worker,
+                                       initargs=(self._worker_settings(), dm.db_path, assets, compress))
+        try:
+            while True:
+                with span("watch.cycle"):
+                    totals = self.sync_reports(tracker, pool, assets, compress, progress)
+                if on_cycle:
+                    on_cycle(totals)
+                if monitor is None:
+                    return
+                monitor.wait()
+        finally:
+            if monitor is not None:
+                monitor.close()
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    def _worker_settings(self) -> Dict:
+        """Параметры конструктора для копии генератора в процессе-воркере"""
+        return {
+            'templates_dir': self.templates_dir, 'output_dir': self.output_dir,
+            'static_dir': self.static_dir, 'lazy_threshold': self.lazy_threshold,
+            'lazy_page_size': self.lazy_page_size, 'graph_depth': self.graph_depth,
+            'graph_max_nodes': self.graph_max_nodes, 'map_max_zoom': self.map_max_zoom,
+            'summary_map_max_zoom': self.summary_map_max_zoom, 'formats': self.formats,
+        }
+
+    def _write_targets(self, targets, assets: Optional[AssetBundle],
+                       compress: Sequence[str]) -> List[str]:
+        """
+        Пишет отчеты для набора целей, ошибки отдельных целей не прерывают пачку
+
+        Файлы всех форматов копятся в BatchWriter и пишутся пачками в
+        фоновом потоке, пока рендерятся следующие цели.
+        """
         generated = []
 
-        for target in targets:
-            try:
-                path = self.generate_report(target['id'])
-                generated.append(path)
-                print(f"✅ Отчет создан: {path}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании отчета для {target.get('id', 'unknown')}: {e}")
+        writer = BatchWriter(compress)
+        try:
+            for target in targets:
+                try:
+                    path = self._write_report(target, assets=assets, compress=compress, writer=writer)
+                    generated.append(path)
+                    print(f"✅ Отчет создан: {path}")
+                except Exception as e:
+                    print(f"❌ Ошибка при создании отчета для {target.get('id', 'unknown')}: {e}")
+        finally:
+            with span("generator.write"):
+                errors = writer.close()
 
-        return generated
+        if errors:
+            # Отчет с хотя бы одним незаписанным файлом считается неудачным
+            owners = {report_path: path for path in generated for report_path in self.report_paths(path)}
+            failed = set()
+            for path, error in errors:
+                print(f"❌ Ошибка при сохранении файла {path}: {error}")
+                failed.add(owners.get(path))
+            generated = [path for path in generated if path not in failed]
 
-def __init__(self, templates_dir: str = "templates", output_dir: str = "output"):
-    self.templates_dir = templates_dir
-    self.output_dir = output_dir
-    self.data_manager = DataManager()
-
-    # Настраиваем Jinja2 - добавляем текущую директорию и родительскую
-    self.env = Environment(
-        loader=FileSystemLoader([
-            self.templates_dir,
-            ".",  # Текущая директория
-            os.path.dirname(__file__)  # Директория со скриптом
-        ]),
-        autoescape=select_autoescape(['html', 'xml'])
-    )
-    # ...
+        return generated
 
     def preview_report(self, target_id: str) -> str:
         """
@@ -266,48 +761,162 @@ def __init__(self, templates_dir: str = "templates", output_dir: str = "output")
         if not target:
             raise ValueError(f"Цель с ID {target_id} не найдена")
 
+        return self.render_target(target)
+
+    def render_target(self, target: Dict, assets: Optional[AssetBundle] = None) -> str:
+        """
+        Подготавливает данные цели и рендерит HTML-отчет без записи на диск
+
+        Args:
+            target: Данные цели (не изменяются)
+            assets: Бандл статических ресурсов (опционально)
+
+        Returns:
+            HTML-код отчета
+
+        Raises:
+            ValueError: Если шаблон не удалось загрузить
+        """
+        return self.render_formats(target, assets, ("html",))["html"]
+
+    def render_formats(self, target: Dict, assets: Optional[AssetBundle] = None,
+                       formats: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Рендерит отчет цели в нескольких форматах без записи на диск
+
+        Данные готовятся один раз (_prepare_data) и общие для всех форматов;
+        граф связей и карта строятся, только если нужен шаблон, кроме
+        краткой справки, - так что лишний формат стоит только своего
+        рендеринга.
+
+        Args:
+            target: Данные цели (не изменяются)
+            assets: Бандл статических ресурсов (опционально)
+            formats: Форматы (по умолчанию - форматы генератора)
+
+        Returns:
+            {формат: содержимое} в порядке форматов
+
+        Raises:
+            ValueError: Если шаблон не удалось загрузить
+        """
+        formats = self.formats if formats is None else check_formats(formats)
         target = self._prepare_data(target)
-        template = self.env.get_template('report.html')
+        generated_at = datetime.now()
 
-        return template.render(target=target, generated_at=datetime.now())
+        network = geo_map = None
+        if any(fmt not in ('md', 'json') for fmt in formats):
+            with span("generator.graph"):
+                network = self._build_network(target)
+            with span("generator.map"):
+                geo_map = self._build_map(collect_points(target), self.map_max_zoom)
 
-    def generate_summary_report(self, output_filename: str = "summary.html") -> str:
+        contents = {}
+        for fmt in formats:
+            if fmt == 'json':
+                with span("generator.render", target=target.get('id'), format=fmt):
+                    contents[fmt] = self._render_dossier(target, generated_at)
+                continue
+
+            try:
+                template = self.env.get_template(REPORT_FORMATS[fmt][0] if fmt in REPORT_FORMATS else fmt)
+            except Exception as e:
+                raise ValueError(f"Ошибка при загрузке шаблона: {e}")
+
+            with span("generator.render", target=target.get('id'), format=fmt):
+                contents[fmt] = template.render(target=target, generated_at=generated_at, assets=assets,
+                                                lazy_page_size=self.lazy_page_size, network=network,
+                                                geo_map=geo_map, brief_limit=BRIEF_LIMIT)
+        return contents
+
+    @staticmethod
+    def _render_dossier(target: Dict, generated_at: datetime) -> str:
+        """JSON-досье: подготовленные данные цели без служебных полей отчета"""
+        data = {key: value for key, value in target.items() if key not in ('lazy_sections', 'stats')}
+        dossier = {'format': DOSSIER_FORMAT, 'version': DOSSIER_VERSION,
+                   'generated_at': generated_at.isoformat(timespec='seconds'), 'target': data}
+        return json.dumps(dossier, ensure_ascii=False, indent=2, default=str)
+
+    @traced("generator.summary")
+    def generate_summary_report(self, output_filename: str = "summary.html",
+                                page_size: int = 500) -> str:
         """
         Генерирует сводный отчет по всем целям
-        
+
+        Цели обрабатываются за один проход потоковым агрегатором
+        (core.summary.SummaryAggregator), а строки таблицы целей пишутся
+        страницами по page_size штук по мере прохода (<имя>_page_0001.html,
+        ...). Индексная страница с итогами, частыми тегами, платформами,
+        компаниями, городами, картой и ссылками на страницы записывается
+        последней.
+
         Args:
-            output_filename: Имя выходного файла
-            
+            output_filename: Имя индексного файла
+            page_size: Число целей на странице таблицы
+
         Returns:
-            Путь к созданному файлу
+            Путь к индексному файлу
         """
-        targets = self.data_manager.get_all_targets()
-        
-        # Подготавливаем сводные данные
-        summary_data = {
-            'total_targets': len(targets),
-            'total_connections': sum(len(t.get('connections', [])) for t in targets),
-            'total_addresses': sum(len(t.get('addresses', [])) for t in targets),
-            'total_social_accounts': sum(len(t.get('social_media', [])) for t in targets),
-            'generated_at': datetime.now(),
-            'targets': targets
-        }
-        
-        # Если есть summary.html шаблон, используем его, иначе создаем базовый
-        try:
-            template = self.env.get_template('summary.html')
-        except:
-            # Создаем базовый отчет
-            template = self.env.from_string(self._get_default_summary_template())
-        
+        stem = os.path.splitext(output_filename)[0]
+        generated_at = datetime.now()
+        page_template = self._get_summary_template('summary_page.html',
+                                                   self._get_default_summary_page_template())
+        aggregator = SummaryAggregator(map_max_zoom=self.summary_map_max_zoom)
+        pages: List[Dict] = []
+        rows: List[Dict] = []
+
+        def flush(has_next: bool):
+            number = len(pages) + 1
+            filename = f"{stem}_page_{number:04d}.html"
+            html_content = page_template.render(
+                rows=rows, number=number, generated_at=generated_at,
+                index_filename=output_filename,
+                prev_filename=pages[-1]['filename'] if pages else None,
+                next_filename=f"{stem}_page_{number + 1:04d}.html" if has_next else None,
+            )
+            with open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            pages.append({'number': number, 'filename': filename,
+                          'first': rows[0]['full_name'] or rows[0]['id'],
+                          'last': rows[-1]['full_name'] or rows[-1]['id'],
+                          'count': len(rows)})
+            rows.clear()
+
+        # Шарды одного поколения читаются по одному, а не загружаются все сразу
+        for target in self.data_manager.iter_targets():
+            # Страница пишется, только когда известно, что за ней есть следующая
+            if len(rows) >= page_size:
+                flush(has_next=True)
+            rows.append(aggregator.add(target))
+        if rows:
+            flush(has_next=False)
+
+        summary_data = aggregator.result()
+        summary_data.update(generated_at=generated_at, pages=pages, page_size=page_size)
+
+        # Карта всех адресов всех целей: кластеры считаются здесь, а не в браузере
+        geo_map = aggregator.clusterer.result()
+        summary_data['geo_map'] = self._to_script_json(geo_map) if geo_map else None
+        if geo_map:
+            summary_data['map_js'] = build_bundle(self.static_dir, css_files=[],
+                                                  js_files=['js/map.js']).js
+
+        template = self._get_summary_template('summary.html', self._get_default_summary_template())
         html_content = template.render(**summary_data)
-        
+
         output_path = os.path.join(self.output_dir, output_filename)
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(html_content)
-        
+
         return output_path
 
+    def _get_summary_template(self, name: str, default: str):
+        """Шаблон сводного отчета из директории шаблонов или встроенный"""
+        try:
+            return self.env.get_template(name)
+        except TemplateNotFound:
+            return self.env.from_string(default)
+
     def _get_default_summary_template(self) -> str:
         """Возвращает дефолтный шаблон сводного отчета"""
         return """
@@ -328,7 +937,14 @@ def __init__(self, templates_dir: str = "templates", output_dir: str = "output")
         th, td { padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }
         th { background: #007bff; color: white; }
         tr:hover { background: #f9f9f9; }
+        .tops { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; }
+        .geo-map { height: 480px; margin-top: 20px; border: 1px solid #ddd; }
+        .map-cluster { background: rgba(255, 0, 110, 0.8); color: white; border-radius: 50%;
+                       display: flex; align-items: center; justify-content: center; font-weight: bold; }
     </style>
+    {% if geo_map %}
+    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+    {% endif %}
 </head>
 <body>
     <div class="container">
@@ -355,7 +971,85 @@ def __init__(self, templates_dir: str = "templates", output_dir: str = "output")
             </div>
         </div>
         
+        {% if geo_map %}
+        <h2>Карта</h2>
+        <div class="geo-map" data-source="summary-map-data"></div>
+        <script type="application/json" id="summary-map-data">{{ geo_map|safe }}</script>
+        {% endif %}
+
+        <h2>Частые значения</h2>
+        <div class="tops">
+            {% for title, items in [('Теги', top_tags), ('Платформы', top_platforms),
+                                    ('Компании', top_companies), ('Города', top_cities)] %}
+            <table>
+                <thead><tr><th>{{ title }}</th><th>Целей</th></tr></thead>
+                <tbody>
+                    {% for value, count in items %}
+                    <tr><td>{{ value }}</td><td>{{ count }}</td></tr>
+                    {% else %}
+                    <tr><td colspan="2">—</td></tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+            {% endfor %}
+        </div>
+
         <h2>Цели</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Страница</th>
+                    <th>Цели</th>
+                    <th>Количество</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for page in pages %}
+                <tr>
+                    <td><a href="{{ page.filename }}">{{ page.number }}</a></td>
+                    <td>{{ page.first }} — {{ page.last }}</td>
+                    <td>{{ page.count }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+    {% if geo_map %}
+    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+    <script>{{ map_js|safe }}</script>
+    {% endif %}
+</body>
+</html>
+        """
+
+    def _get_default_summary_page_template(self) -> str:
+        """Возвращает дефолтный шаблон страницы таблицы целей сводного отчета"""
+        return """
+<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <title>OSINT Summary Report - {{ number }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; }
+        h1 { color: #333; border-bottom: 2px solid #007bff; padding-bottom: 10px; }
+        nav { display: flex; gap: 20px; margin: 10px 0; }
+        table { width: 100%; border-collapse: collapse; margin-top: 20px; }
+        th, td { padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }
+        th { background: #007bff; color: white; }
+        tr:hover { background: #f9f9f9; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>📊 Сводный отчет OSINT — страница {{ number }}</h1>
+        <p>Создан: {{ generated_at.strftime('%Y-%m-%d %H:%M:%S') }}</p>
+        <nav>
+            {% if prev_filename %}<a href="{{ prev_filename }}">← Назад</a>{% endif %}
+            <a href="{{ index_filename }}">Сводка</a>
+            {% if next_filename %}<a href="{{ next_filename }}">Вперед →</a>{% endif %}
+        </nav>
         <table>
             <thead>
                 <tr>
@@ -364,16 +1058,18 @@ def __init__(self, templates_dir: str = "templates", output_dir: str = "output")
                     <th>Связи</th>
                     <th>Адреса</th>
                     <th>Соцсети</th>
+                    <th>Теги</th>
                 </tr>
             </thead>
             <tbody>
-                {% for target in targets %}
+                {% for row in rows %}
                 <tr>
-                    <td>{{ target.id }}</td>
-                    <td>{{ target.personal.full_name }}</td>
-                    <td>{{ target.connections|length }}</td>
-                    <td>{{ target.addresses|length }}</td>
-                    <td>{{ target.social_media|length }}</td>
+                    <td>{{ row.id }}</td>
+                    <td>{{ row.full_name }}</td>
+                    <td>{{ row.connections }}</td>
+                    <td>{{ row.addresses }}</td>
+                    <td>{{ row.social_accounts }}</td>
+                    <td>{{ row.tags|join(', ') }}</td>
                 </tr>
                 {% endfor %}
             </tbody>
@@ -3,6 +3,8 @@
 OSINT Profiler - Main Application
 Главный файл приложения с CLI-интерфейсом
 """
+import argparse
+import os
 import sys
 from rich.console import Console
 from rich.panel import Panel
@@ -10,8 +12,17 @@ from rich.table import Table
 from rich.prompt import Prompt, Confirm
 from rich import box
 from rich.text import Text
+from core import profiling
+from core.aggregates import AGGREGATE_DIMENSIONS
+from core.bundler import BUNDLE_MODES, COMPRESSION_FORMATS
+from core.changes import read_payload, summarize_changes, write_payload
 from core.data_manager import DataManager
-from generator import ReportGenerator
+from core.derived import age_on
+from core.indexes import PIVOT_KINDS
+from core.jobs import MAX_ATTEMPTS, JobQueue, queue_path
+from core.watch import inotify_available
+from core.profiling import span
+from core.storage import DirectoryStorage, JsonFileStorage, ShardedStorage, migrate
 import json
 from datetime import datetime
 import re
@@ -22,9 +33,22 @@ console = Console()
 class OSINTProfilerCLI:
     """CLI-интерфейс для OSINT Profiler"""
 
-    def __init__(self):
-        self.dm = DataManager()
-        self.generator = ReportGenerator()
+    def __init__(self, db_path: str = "data/database.json", write_delay: float = 1.0,
+                 formats: tuple = ("html",)):
+        # Правки сессии (мастер, редактирование, события) сохраняются одной
+        # записью после паузы write_delay; при выходе - сразу
+        self.dm = DataManager(db_path, write_behind=write_delay > 0, quiet_period=write_delay)
+        self.formats = formats
+        self._generator = None
+
+    @property
+    def generator(self):
+        """Генератор отчётов (Jinja2, NumPy) - загружается при первом отчёте,
+        чтобы быстрые команды вроде search стартовали без него"""
+        if self._generator is None:
+            from generator import ReportGenerator
+            self._generator = ReportGenerator(data_manager=self.dm, formats=self.formats)
+        return self._generator
 
     def show_banner(self):
         """Показывает баннер приложения"""
@@ -293,7 +317,8 @@ class OSINTProfilerCLI:
 
     def list_targets(self):
         """Показывает список целей"""
-        targets = self.dm.get_all_targets()
+        # Краткие записи со счетчиками из блока derived - без чтения целей целиком
+        targets = self.dm.list_targets()
         if not targets:
             console.print("\n[yellow]Нет целей в базе данных[/yellow]\n")
             return
@@ -302,13 +327,18 @@ class OSINTProfilerCLI:
         table.add_column("ID", style="cyan", no_wrap=True)
         table.add_column("Имя", style="white")
         table.add_column("Дата рождения", style="dim")
+        table.add_column("Связи", justify="right")
+        table.add_column("Соцсети", justify="right")
         table.add_column("Теги", style="yellow")
         table.add_column("Обновлено", style="dim")
 
         for target in targets:
             target_id = target['id']
-            name = target.get('personal', {}).get('full_name', 'N/A')
-            birth = target.get('personal', {}).get('birth_date', 'N/A')
+            name = target.get('full_name') or 'N/A'
+            birth = target.get('birth_date') or 'N/A'
+            if target.get('birth_date'):
+                birth += f" ({age_on(target['birth_date'])})"
+            stats = target.get('stats') or {}
             tags = ", ".join(target.get('tags', [])[:3])
             if len(target.get('tags', [])) > 3:
                 tags += "..."
@@ -319,14 +349,16 @@ class OSINTProfilerCLI:
             except (ValueError, TypeError):
                 pass
 
-            table.add_row(target_id, name, birth, tags, updated)
+            table.add_row(target_id, name, birth, str(stats.get('connections', '-')),
+                          str(stats.get('social_accounts', '-')), tags, updated)
 
         console.print("\n", table, "\n")
 
-    def generate_report_for_target(self):
+    def generate_report_for_target(self, target_id: str = None):
         """Генерирует отчёт для выбранной цели"""
-        self.list_targets()
-        target_id = Prompt.ask("\n[cyan]Введите ID цели[/cyan]").strip()
+        if target_id is None:
+            self.list_targets()
+            target_id = Prompt.ask("\n[cyan]Введите ID цели[/cyan]").strip()
         if not target_id:
             console.print("[red]✗ ID цели не может быть пустым.[/red]\n")
             return
@@ -335,18 +367,22 @@ class OSINTProfilerCLI:
             console.print(f"\n[yellow]⏳ Генерация отчёта...[/yellow]")
             output_path = self.generator.generate_report(target_id)
             console.print(f"\n[bold green]✓ Отчёт успешно создан![/bold green]")
-            console.print(f"[cyan]→ Путь:[/cyan] {output_path}\n")
+            for path in self.generator.report_paths(output_path):
+                console.print(f"[cyan]→ Путь:[/cyan] {path}")
+            console.print()
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка:[/bold red] {e}\n")
 
-    def generate_all_reports(self):
+    def generate_all_reports(self, confirm: bool = True, workers: int = 0, bundle: str = "shared",
+                             compress: tuple = ()):
         """Генерирует отчёты для всех целей"""
-        if not Confirm.ask("\n[yellow]Генерировать отчёты для всех целей?[/yellow]", default=True):
+        if confirm and not Confirm.ask("\n[yellow]Генерировать отчёты для всех целей?[/yellow]", default=True):
             return
 
         console.print("\n[yellow]⏳ Генерация отчётов...\n[/yellow]")
         try:
-            paths = self.generator.generate_all_reports()
+            # По умолчанию - общий хешированный бандл CSS/JS вместо копии в каждом отчёте
+            paths = self.generator.generate_all_reports(bundle=bundle, compress=compress, workers=workers)
             if paths:
                 console.print(f"\n[bold green]✓ Создано отчётов: {len(paths)}[/bold green]\n")
             else:
@@ -354,6 +390,105 @@ class OSINTProfilerCLI:
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка при генерации:[/bold red] {e}\n")
 
+    def _job_queue(self) -> JobQueue:
+        """Очередь заданий на отчёты рядом с базой"""
+        return JobQueue(queue_path(self.dm.db_path))
+
+    def enqueue_reports(self, target_ids: list, all_targets: bool = False, max_attempts: int = MAX_ATTEMPTS):
+        """Ставит отчёты в очередь заданий"""
+        if all_targets:
+            target_ids = [target['id'] for target in self.dm.list_targets()]
+        if not target_ids:
+            console.print("[red]✗ Укажите ID целей или --all[/red]\n")
+            return
+        with self._job_queue() as queue:
+            added = queue.enqueue(target_ids, max_attempts=max_attempts)
+        skipped = len(target_ids) - added
+        console.print(f"\n[bold green]✓ В очередь поставлено заданий: {added}[/bold green]"
+                      + (f" [dim](уже в очереди: {skipped})[/dim]" if skipped else "") + "\n")
+
+    def run_report_queue(self, workers: int = 0, prefetch: int = 2, wait_retries: bool = True,
+                         bundle: str = "shared", compress: tuple = ()):
+        """Выполняет задания очереди до её опустошения (повторный запуск продолжает с места остановки)"""
+        def progress(job, ok, value):
+            if ok:
+                console.print(f"[green]✓[/green] {job['target_id']} → {value}")
+            else:
+                console.print(f"[red]✗[/red] {job['target_id']} (попытка {job['attempt']}): {value}")
+
+        started = datetime.now()
+        with self._job_queue() as queue:
+            try:
+                totals = self.generator.run_jobs(queue, workers=workers, prefetch=prefetch, bundle=bundle,
+                                                 compress=compress, wait_retries=wait_retries,
+                                                 progress=progress)
+            except KeyboardInterrupt:
+                console.print("\n[yellow]Остановлено: невыполненные задания возвращены в очередь[/yellow]\n")
+                return
+        elapsed = (datetime.now() - started).total_seconds()
+        console.print(f"\n[bold green]✓ Выполнено: {totals['done']}[/bold green], "
+                      f"повторов: {totals['retried']}, с ошибкой: {totals['failed']} "
+                      f"[dim]({elapsed:.1f} с)[/dim]\n")
+
+    def watch_reports(self, workers: int = 0, interval: float = 1.0, debounce: float = 0.5, once: bool = False,
+                      bundle: str = "shared", compress: tuple = ()):
+        """Перестраивает отчёты изменённых целей при каждом изменении базы"""
+        def progress(target_id, ok, value):
+            if ok:
+                console.print(f"[green]✓[/green] {target_id} → {value}")
+            else:
+                console.print(f"[red]✗[/red] {target_id}: {value}")
+
+        def on_cycle(totals):
+            if any(totals.values()):
+                console.print(f"[dim]{datetime.now():%H:%M:%S}[/dim] отчётов обновлено: {totals['rendered']}, "
+                              f"ошибок: {totals['failed']}, удалено: {totals['deleted']}")
+
+        if not once:
+            mode = "inotify" if inotify_available() else f"опрос раз в {interval:g} с"
+            console.print(f"\n[cyan]Слежение за {self.dm.db_path} ({mode}), Ctrl+C - выход[/cyan]\n")
+        try:
+            self.generator.watch(workers=workers, interval=interval, debounce=debounce, once=once,
+                                 bundle=bundle, compress=compress, progress=progress, on_cycle=on_cycle)
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Слежение остановлено[/yellow]\n")
+
+    def show_queue_status(self, limit: int = 10):
+        """Глубина очереди, пропускная способность и последние ошибки"""
+        with self._job_queue() as queue:
+            stats = queue.stats()
+            failures = queue.jobs("failed", limit)
+            retrying = [job for job in queue.jobs("queued", 1000) if job['error']][:limit]
+
+        table = Table(title="Очередь отчётов", box=box.ROUNDED, border_style="cyan")
+        table.add_column("Параметр", style="cyan")
+        table.add_column("Значение", justify="right", style="green")
+        table.add_row("В очереди", f"{stats['queued']} (готовы: {stats['ready']}, повторы: {stats['retrying']})")
+        table.add_row("Выполняются", str(stats['running']))
+        table.add_row("Выполнено", str(stats['done']))
+        table.add_row("С ошибкой", str(stats['failed']))
+        table.add_row("Пропускная способность", f"{stats['throughput']:.1f} в минуту")
+        if stats['avg_duration'] is not None:
+            table.add_row("Среднее время отчёта", f"{stats['avg_duration']:.2f} с")
+        if stats['oldest_queued'] is not None:
+            table.add_row("Дольше всех ждёт", f"{stats['oldest_queued']:.0f} с")
+        console.print()
+        console.print(table)
+
+        errors = failures + retrying
+        if errors:
+            errors_table = Table(title="Ошибки", box=box.ROUNDED, border_style="red")
+            errors_table.add_column("Задание", justify="right", style="dim")
+            errors_table.add_column("Цель", style="cyan")
+            errors_table.add_column("Статус")
+            errors_table.add_column("Попыток", justify="right")
+            errors_table.add_column("Ошибка", style="red")
+            for job in errors:
+                errors_table.add_row(str(job['id']), job['target_id'], job['status'],
+                                     f"{job['attempts']}/{job['max_attempts']}", job['error'] or "")
+            console.print(errors_table)
+        console.print()
+
     def delete_target(self):
         """Удаляет цель"""
         self.list_targets()
@@ -377,21 +512,22 @@ class OSINTProfilerCLI:
             except Exception as e:
                 console.print(f"\n[bold red]✗ Ошибка при удалении:[/bold red] {e}\n")
 
-    def search_targets(self):
+    def search_targets(self, query: str = None):
         """Поиск целей"""
-        query = Prompt.ask("\n[cyan]Поисковый запрос[/cyan]").strip()
+        if query is None:
+            query = Prompt.ask("\n[cyan]Поисковый запрос[/cyan]").strip()
         if not query:
             console.print("[red]✗ Запрос не может быть пустым.[/red]\n")
             return
 
-        results = self.dm.search_targets(query)
+        results = self.dm.search_summaries(query)
         if not results:
             console.print(f"\n[yellow]По запросу '{query}' ничего не найдено[/yellow]\n")
             return
 
         console.print(f"\n[green]✓ Найдено результатов: {len(results)}[/green]\n")
         for target in results:
-            name = target.get('personal', {}).get('full_name', 'N/A')
+            name = target['full_name'] or 'N/A'
             target_id = target['id']
             console.print(f"  [cyan]→[/cyan] {name} [dim]({target_id})[/dim]")
         console.print()
@@ -427,6 +563,23 @@ class OSINTProfilerCLI:
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка при получении статистики:[/bold red] {e}\n")
 
+    def show_aggregate(self, dimension: str, limit: int = 20):
+        """Число целей по группам: тегам, работодателям, городам, платформам, типам связей"""
+        titles = {'tag': "Тег", 'company': "Компания", 'city': "Город",
+                  'platform': "Платформа", 'relation': "Тип связи"}
+        rows = self.dm.aggregate(dimension, limit)
+        if not rows:
+            console.print("\n[yellow]Нет данных для группировки[/yellow]\n")
+            return
+        table = Table(title=f"[bold cyan]Цели по группам: {titles[dimension].lower()}[/bold cyan]",
+                      box=box.ROUNDED, border_style="cyan")
+        table.add_column(titles[dimension], style="yellow")
+        table.add_column("Целей", justify="right", style="green")
+        table.add_column("Записей", justify="right", style="dim")
+        for value, targets, items in rows:
+            table.add_row(value, str(targets), str(items))
+        console.print("\n", table, "\n")
+
     def export_import_menu(self):
         """Меню экспорта/импорта"""
         console.print("\n[bold cyan]╔═══ Экспорт/Импорт ═══╗[/bold cyan]\n")
@@ -450,24 +603,27 @@ class OSINTProfilerCLI:
         elif choice == "3":
             self._import_from_json()
 
-    def _export_all_json(self):
+    def _export_all_json(self, filename: str = None):
         """Экспортирует все цели в JSON"""
         try:
             targets = self.dm.get_all_targets()
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"osint_export_{timestamp}.json"
+            if not filename:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"osint_export_{timestamp}.json"
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({"targets": targets}, f, indent=2, ensure_ascii=False)
+            with span("cli.export", targets=len(targets)):
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump({"targets": targets}, f, indent=2, ensure_ascii=False)
             
             console.print(f"\n[bold green]✓ Экспорт завершён![/bold green] [dim]Файл: {filename}[/dim]\n")
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка при экспорте:[/bold red] {e}\n")
 
-    def _export_target_json(self):
+    def _export_target_json(self, target_id: str = None, filename: str = None):
         """Экспортирует одну цель в JSON"""
-        self.list_targets()
-        target_id = Prompt.ask("\n[cyan]Введите ID цели для экспорта[/cyan]").strip()
+        if target_id is None:
+            self.list_targets()
+            target_id = Prompt.ask("\n[cyan]Введите ID цели для экспорта[/cyan]").strip()
         if not target_id:
             console.print("[red]✗ ID цели не может быть пустым.[/red]\n")
             return
@@ -478,39 +634,42 @@ class OSINTProfilerCLI:
                 console.print(f"\n[bold red]✗ Цель не найдена[/bold red]\n")
                 return
             
-            name = target.get('personal', {}).get('full_name', target_id)
-            safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{safe_name}_{timestamp}.json"
+            if not filename:
+                name = target.get('personal', {}).get('full_name', target_id)
+                safe_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"{safe_name}_{timestamp}.json"
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(target, f, indent=2, ensure_ascii=False)
+            with span("cli.export", targets=1):
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(target, f, indent=2, ensure_ascii=False)
             
             console.print(f"\n[bold green]✓ Экспорт завершён![/bold green] [dim]Файл: {filename}[/dim]\n")
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка при экспорте:[/bold red] {e}\n")
 
-    def _import_from_json(self):
+    def _import_from_json(self, filename: str = None):
         """Импортирует цель из JSON файла"""
-        filename = Prompt.ask("\n[cyan]Введите имя JSON файла[/cyan]").strip()
+        if filename is None:
+            filename = Prompt.ask("\n[cyan]Введите имя JSON файла[/cyan]").strip()
         if not filename:
             console.print("[red]✗ Имя файла не может быть пустым.[/red]\n")
             return
         
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Проверяем формат
-            if "targets" in data:
-                # Это экспорт всех целей
-                for target in data["targets"]:
-                    self.dm.create_target(target)
-                console.print(f"\n[bold green]✓ Импортировано целей: {len(data['targets'])}[/bold green]\n")
-            else:
-                # Это одна цель
-                self.dm.create_target(data)
-                console.print(f"\n[bold green]✓ Цель импортирована![/bold green]\n")
+            with span("cli.import"):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                # Проверяем формат
+                if "targets" in data:
+                    # Это экспорт всех целей: одна запись БД на всю пачку
+                    self.dm.import_targets(data["targets"])
+                    console.print(f"\n[bold green]✓ Импортировано целей: {len(data['targets'])}[/bold green]\n")
+                else:
+                    # Это одна цель
+                    self.dm.create_target(data)
+                    console.print(f"\n[bold green]✓ Цель импортирована![/bold green]\n")
         except FileNotFoundError:
             console.print(f"\n[bold red]✗ Файл '{filename}' не найден[/bold red]\n")
         except json.JSONDecodeError:
@@ -518,6 +677,352 @@ class OSINTProfilerCLI:
         except Exception as e:
             console.print(f"\n[bold red]✗ Ошибка при импорте:[/bold red] {e}\n")
 
+    def generate_summary_report(self, page_size: int = 500):
+        """Генерирует сводный отчёт по всем целям"""
+        try:
+            output_path = self.generator.generate_summary_report(page_size=page_size)
+            console.print(f"\n[bold green]✓ Сводный отчёт создан:[/bold green] {output_path}\n")
+        except Exception as e:
+            console.print(f"\n[bold red]✗ Ошибка:[/bold red] {e}\n")
+
+    @staticmethod
+    def _new_storage(destination: str, shards: int, layout: str = None):
+        """Пустое хранилище для migrate/clone (None, если путь занят)"""
+        if os.path.exists(destination):
+            console.print(f"\n[bold red]✗ '{destination}' уже существует[/bold red]\n")
+            return None
+        if layout is None:
+            layout = "sharded" if shards else "json"
+        if layout == "sharded":
+            return ShardedStorage(destination, shards or None)
+        if layout == "dir":
+            return DirectoryStorage(destination)
+        return JsonFileStorage(destination)
+
+    def migrate_storage(self, destination: str, shards: int, layout: str = None):
+        """Переносит базу в новое хранилище (например, с другим числом шардов)"""
+        storage = self._new_storage(destination, shards, layout)
+        if storage is None:
+            return
+        with span("cli.migrate"):
+            total = migrate(self.dm.storage, storage)
+        console.print(f"\n[bold green]✓ Перенесено целей: {total}[/bold green] [dim]→ {destination}[/dim]\n")
+
+    def rebuild_catalog(self):
+        """Пересобирает каталог хранилища-директории по файлам целей"""
+        if not isinstance(self.dm.storage, DirectoryStorage):
+            console.print("\n[red]✗ Каталог есть только у хранилища-директории (migrate --layout dir)[/red]\n")
+            return
+        changes = self.dm.storage.rebuild_catalog()
+        console.print(f"\n[bold green]✓ Каталог пересобран:[/bold green] добавлено {changes['added']}, "
+                      f"изменено {changes['changed']}, удалено {changes['removed']}\n")
+
+    def export_changes(self, output: str, since: int = 0, peer: str = None):
+        """Сохраняет пакет изменений после номера since (или после закладки пира)"""
+        if peer:
+            since = self.dm.peer_seq(peer)
+        with span("cli.changes_export"):
+            payload = self.dm.export_changes(since, exclude_origin=peer)
+            write_payload(payload, output)
+        counts = summarize_changes(payload['changes'])
+        console.print(f"\n[bold green]✓ Изменения {payload['since']}..{payload['until']} сохранены:[/bold green] "
+                      f"{output} [dim](новых версий {counts['put']}, удалений {counts['delete']}, "
+                      f"{os.path.getsize(output) / 1024:.1f} КБ)[/dim]\n")
+
+    def apply_changes(self, filename: str, strategy: str = "lww"):
+        """Применяет пакет изменений другой копии базы"""
+        try:
+            with span("cli.changes_apply"):
+                result = self.dm.apply_changes(read_payload(filename), strategy)
+        except (OSError, ValueError) as e:
+            console.print(f"\n[bold red]✗ Ошибка:[/bold red] {e}\n")
+            return
+        console.print(f"\n[bold green]✓ Применено:[/bold green] версий {result['put']}, "
+                      f"удалений {result['delete']}, пропущено {result['skipped']}\n")
+
+    def show_changes_status(self):
+        """Показывает состояние журнала изменений и закладки пиров"""
+        log = self.dm.change_log()
+        table = Table(title="Журнал изменений", box=box.ROUNDED, border_style="cyan")
+        table.add_column("Параметр", style="cyan")
+        table.add_column("Значение", style="green")
+        table.add_row("Реплика", log.replica)
+        table.add_row("Последний номер", str(log.last_seq))
+        table.add_row("Размер журнала", f"{os.path.getsize(log.log_path) / 1024:.1f} КБ")
+        table.add_row("Надгробий", str(len(log.state['tombstones'])))
+        for replica, seq in sorted(log.state['peers'].items()):
+            table.add_row(f"Пир {replica}", f"получено до №{seq}")
+        console.print()
+        console.print(table)
+        console.print()
+
+    def compact_changes(self):
+        """Сжимает журнал изменений до последней записи по каждой цели"""
+        removed = self.dm.change_log().compact()
+        console.print(f"\n[bold green]✓ Журнал сжат:[/bold green] удалено записей {removed}\n")
+
+    def clone_database(self, destination: str, shards: int = 0, layout: str = None):
+        """Копия базы с общим журналом изменений (для последующего sync)"""
+        storage = self._new_storage(destination, shards, layout)
+        if storage is None:
+            return
+        with span("cli.clone"):
+            clone = self.dm.clone(destination, storage)
+        console.print(f"\n[bold green]✓ Копия создана:[/bold green] {destination} "
+                      f"[dim](реплика {clone.changes.replica})[/dim]\n")
+
+    def sync_with(self, other_db: str, strategy: str = "lww"):
+        """
+        Двусторонняя синхронизация с другой копией базы
+
+        Каждая сторона получает только изменения после своей закладки и без
+        изменений, которые сама же и прислала.
+        """
+        other = DataManager(other_db)
+        local_replica = self.dm.change_log().replica
+        remote_replica = other.change_log().replica
+
+        with span("cli.sync"):
+            incoming = other.export_changes(self.dm.peer_seq(remote_replica), exclude_origin=local_replica)
+            pulled = self.dm.apply_changes(incoming, strategy)
+            outgoing = self.dm.export_changes(other.peer_seq(local_replica), exclude_origin=remote_replica)
+            pushed = other.apply_changes(outgoing, strategy)
+
+        console.print(f"\n[bold green]✓ Синхронизировано с {other_db}[/bold green]")
+        console.print(f"  получено: версий {pulled['put']}, удалений {pulled['delete']}, "
+                      f"пропущено {pulled['skipped']}")
+        console.print(f"  отправлено: версий {pushed['put']}, удалений {pushed['delete']}, "
+                      f"пропущено {pushed['skipped']}\n")
+
+    def pivot(self, kind: str = None, value: str = None, shared: bool = False, limit: int = 50):
+        """Цели с общим идентификатором или отчет об общих идентификаторах"""
+        if shared or value is None:
+            self.show_shared_identifiers(kind, limit)
+            return
+        try:
+            results = self.dm.pivot(kind, value)
+        except ValueError as e:
+            console.print(f"\n[bold red]✗ Ошибка:[/bold red] {e}\n")
+            return
+        if not results:
+            console.print(f"\n[yellow]{kind} '{value}' не встречается ни у одной цели[/yellow]\n")
+            return
+
+        table = Table(title=f"[bold cyan]{kind}: {value}[/bold cyan]", box=box.ROUNDED, border_style="cyan")
+        table.add_column("ID", style="cyan", no_wrap=True)
+        table.add_column("Имя", style="white")
+        table.add_column("Где найден", style="dim")
+        for target in results:
+            table.add_row(target['id'], target.get('personal', {}).get('full_name', 'N/A'),
+                          ", ".join(target['_pivot_sources']))
+        console.print("\n", table, "\n")
+
+    def show_shared_identifiers(self, kind: str = None, limit: int = 50):
+        """Идентификаторы, общие для нескольких целей"""
+        rows = self.dm.shared_identifiers(kind)
+        if not rows:
+            console.print("\n[yellow]Общих идентификаторов не найдено[/yellow]\n")
+            return
+
+        table = Table(title="[bold cyan]Общие идентификаторы[/bold cyan]", box=box.ROUNDED, border_style="cyan")
+        table.add_column("Тип", style="yellow")
+        table.add_column("Значение", style="white")
+        table.add_column("Целей", justify="right")
+        table.add_column("ID целей", style="cyan")
+        for row in rows[:limit]:
+            ids = sorted(row['targets'])
+            table.add_row(row['kind'], row['value'], str(len(ids)),
+                          ", ".join(ids[:5]) + ("..." if len(ids) > 5 else ""))
+        console.print("\n", table)
+        if len(rows) > limit:
+            console.print(f"[dim]Показано {limit} из {len(rows)}[/dim]")
+        console.print()
+
+    def show_tags(self, expression: str = None, related: str = None, limit: int = 20):
+        """Частые теги, цели по выражению над тегами или теги, встречающиеся вместе"""
+        if related:
+            rows = self.dm.related_tags(related, limit)
+            title = f"Теги вместе с «{related}»"
+        elif expression:
+            try:
+                total = self.dm.tag_count(expression)
+                results = self.dm.tag_query(expression)[:limit] if total else []
+            except ValueError as e:
+                console.print(f"\n[bold red]✗ Ошибка в выражении:[/bold red] {e}\n")
+                return
+            console.print(f"\n[green]✓ Целей по выражению «{expression}»: {total}[/green]\n")
+            for target in results:
+                name = target.get('personal', {}).get('full_name', 'N/A')
+                console.print(f"  [cyan]→[/cyan] {name} [dim]({target['id']})[/dim]")
+            if total > limit:
+                console.print(f"  [dim]... и ещё {total - limit}[/dim]")
+            console.print()
+            return
+        else:
+            rows = self.dm.tag_counts()[:limit]
+            title = "Теги"
+
+        if not rows:
+            console.print("\n[yellow]Тегов не найдено[/yellow]\n")
+            return
+        table = Table(title=f"[bold yellow]{title}[/bold yellow]", box=box.ROUNDED, border_style="yellow")
+        table.add_column("Тег", style="yellow")
+        table.add_column("Целей", justify="right")
+        for tag, total in rows:
+            table.add_row(tag, str(total))
+        console.print("\n", table, "\n")
+
+    def show_similar(self, target_id: str, limit: int = 20):
+        """Цели, наиболее похожие на выбранную"""
+        results = self.dm.similar_targets(target_id, limit)
+        if results is None:
+            console.print(f"\n[bold red]✗ Цель не найдена:[/bold red] {target_id}\n")
+            return
+        if not results:
+            console.print("\n[yellow]Похожих целей не найдено[/yellow]\n")
+            return
+
+        table = Table(title=f"[bold cyan]Похожие на {target_id}[/bold cyan]", box=box.ROUNDED, border_style="cyan")
+        table.add_column("ID", style="cyan", no_wrap=True)
+        table.add_column("Имя", style="white")
+        table.add_column("Сходство", justify="right", style="green")
+        table.add_column("Общее", style="dim")
+        for target in results:
+            shared = target['_shared_features']
+            table.add_row(target['id'], target.get('personal', {}).get('full_name', 'N/A'),
+                          f"{target['_similarity']:.2f}",
+                          ", ".join(shared[:4]) + ("..." if len(shared) > 4 else ""))
+        console.print("\n", table, "\n")
+
+    def export_similarity_pairs(self, output: str, limit: int = 5):
+        """Для каждой цели - самые похожие, в JSON-файл"""
+        with span("cli.similarity_pairs"):
+            pairs = self.dm.similarity_pairs(limit)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({target_id: [{'id': other, 'score': round(score, 4)} for other, score in matches]
+                       for target_id, matches in pairs.items()}, f, ensure_ascii=False, indent=2)
+        console.print(f"\n[bold green]✓ Похожие цели для {len(pairs)} целей:[/bold green] {output}\n")
+
+    def show_copresence(self, target_id: str = None, window_days: int = 0, city_only: bool = False,
+                        footprint: bool = True, limit: int = 20, output: str = None):
+        """Цели, бывавшие в одном месте в один день (или в пределах окна)"""
+        with span("cli.copresence"):
+            table = self.dm.copresence(window_days, target_id, limit, city_only, footprint)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(table, f, ensure_ascii=False, indent=2)
+            console.print(f"\n[bold green]✓ Совместное присутствие для {len(table)} целей:[/bold green] {output}\n")
+            return
+
+        if target_id:
+            rows = [(target_id, row) for row in table.get(target_id, [])]
+            title = f"Совместное присутствие: {target_id}"
+        else:
+            # Каждая пара есть в таблице дважды - оставляем одну запись
+            rows = [(own, row) for own, own_rows in table.items() for row in own_rows if own < row['target_id']]
+            rows.sort(key=lambda item: (-item[1]['score'], item[0], item[1]['target_id']))
+            rows = rows[:limit]
+            title = "Совместное присутствие: самые частые пары"
+        if not rows:
+            console.print("\n[yellow]Совпадений по месту и дате не найдено[/yellow]\n")
+            return
+
+        names = {target['id']: target['full_name'] for target in self.dm.list_targets()}
+        table_view = Table(title=f"[bold cyan]{title}[/bold cyan]", box=box.ROUNDED, border_style="cyan")
+        if not target_id:
+            table_view.add_column("Цель", style="cyan")
+        table_view.add_column("Вместе с", style="cyan")
+        table_view.add_column("Оценка", justify="right", style="green")
+        table_view.add_column("Совпадений", justify="right")
+        table_view.add_column("Период", style="white", no_wrap=True)
+        table_view.add_column("Места", style="dim")
+        for own, row in rows:
+            period = row['first'] if row['first'] == row['last'] else f"{row['first']} — {row['last']}"
+            cells = [f"{names.get(row['target_id'], 'N/A')}\n[dim]{row['target_id']}[/dim]",
+                     f"{row['score']:.2f}", str(row['matches']), period, ", ".join(row['places'][:3])]
+            if not target_id:
+                cells.insert(0, f"{names.get(own, 'N/A')}\n[dim]{own}[/dim]")
+            table_view.add_row(*cells)
+        console.print("\n", table_view, "\n")
+
+    def run_command(self, args: argparse.Namespace):
+        """Выполняет одну команду из командной строки (без меню)"""
+        if args.command == "report":
+            self.generate_report_for_target(args.target_id)
+        elif args.command == "report-all":
+            self.generate_all_reports(confirm=False, workers=args.workers, bundle=args.bundle,
+                                      compress=args.compress)
+        elif args.command == "summary":
+            self.generate_summary_report(args.page_size)
+        elif args.command == "list":
+            self.list_targets()
+        elif args.command == "search":
+            self.search_targets(args.query)
+        elif args.command == "stats":
+            if args.refresh_derived:
+                updated = self.dm.refresh_derived()
+                console.print(f"\n[bold green]✓ Производные поля пересчитаны:[/bold green] {updated} целей")
+            if args.rebuild:
+                self.dm.rebuild_index("aggregates")
+            if args.by:
+                self.show_aggregate(args.by, args.limit)
+            else:
+                self.show_statistics()
+        elif args.command == "import":
+            self._import_from_json(args.file)
+        elif args.command == "export":
+            if args.id:
+                self._export_target_json(args.id, args.output)
+            else:
+                self._export_all_json(args.output)
+        elif args.command == "migrate":
+            self.migrate_storage(args.destination, args.shards, args.layout)
+        elif args.command == "catalog":
+            self.rebuild_catalog()
+        elif args.command == "changes":
+            if args.changes_command == "export":
+                self.export_changes(args.output, args.since, args.peer)
+            elif args.changes_command == "apply":
+                self.apply_changes(args.file, args.strategy)
+            elif args.changes_command == "compact":
+                self.compact_changes()
+            elif args.changes_command == "clone":
+                self.clone_database(args.destination, args.shards, args.layout)
+            else:
+                self.show_changes_status()
+        elif args.command == "watch":
+            self.watch_reports(args.workers, args.interval, args.debounce, args.once, args.bundle, args.compress)
+        elif args.command == "queue":
+            if args.queue_command == "add":
+                self.enqueue_reports(args.target_ids, args.all, args.max_attempts)
+            elif args.queue_command == "run":
+                self.run_report_queue(args.workers, args.prefetch, not args.no_wait, args.bundle, args.compress)
+            elif args.queue_command == "retry":
+                with self._job_queue() as queue:
+                    console.print(f"\n[bold green]✓ Возвращено в очередь:[/bold green] {queue.retry_failed()}\n")
+            elif args.queue_command == "purge":
+                with self._job_queue() as queue:
+                    removed = queue.purge(["done", "failed"] if args.failed else ["done"])
+                console.print(f"\n[bold green]✓ Удалено заданий:[/bold green] {removed}\n")
+            else:
+                self.show_queue_status()
+        elif args.command == "sync":
+            self.sync_with(args.other_db, args.strategy)
+        elif args.command == "pivot":
+            self.pivot(args.kind, args.value, args.shared, args.limit)
+        elif args.command == "similar":
+            if args.all:
+                self.export_similarity_pairs(args.output, args.limit)
+            elif args.target_id:
+                self.show_similar(args.target_id, args.limit)
+            else:
+                console.print("[red]✗ Укажите ID цели или --all[/red]\n")
+        elif args.command == "tags":
+            self.show_tags(args.expression, args.related, args.limit)
+        elif args.command == "copresence":
+            self.show_copresence(args.target, args.window, args.city, not args.no_footprint,
+                                 args.limit, args.output)
+
     def run(self):
         """Главный цикл приложения"""
         self.show_banner()
@@ -549,17 +1054,182 @@ class OSINTProfilerCLI:
                 self.export_import_menu()
 
 
+def compress_formats(value: str) -> tuple:
+    """Список форматов сжатия из аргумента --compress ("gzip,br")"""
+    formats = tuple(fmt.strip() for fmt in value.split(",") if fmt.strip())
+    unknown = [fmt for fmt in formats if fmt not in COMPRESSION_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"неизвестный формат сжатия: {', '.join(unknown)} "
+                                         f"(доступны: {', '.join(COMPRESSION_FORMATS)})")
+    return formats
+
+
+def add_output_options(parser: argparse.ArgumentParser):
+    """Параметры записи пачки отчётов: бандл ресурсов и предварительное сжатие"""
+    parser.add_argument("--bundle", choices=BUNDLE_MODES, default="shared",
+                        help="CSS/JS: shared - общий хешированный файл, inline - внутри каждого отчёта")
+    parser.add_argument("--compress", type=compress_formats, default=(), metavar="LIST",
+                        help="Сжатые копии для веб-сервера через запятую: gzip, br")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Аргументы командной строки (без команды запускается интерактивное меню)"""
+    parser = argparse.ArgumentParser(description="OSINT Profiler")
+    parser.add_argument("--db", default="data/database.json",
+                        help="Путь к базе данных (JSON-файл, директория шардов или целей)")
+    parser.add_argument("--write-delay", type=float, default=1.0, metavar="SEC",
+                        help="Сохранять изменения после SEC секунд без правок (0 - сразу)")
+    parser.add_argument("--formats", default="html", metavar="LIST",
+                        help="Форматы отчётов через запятую: html, md (краткая справка), json (досье) "
+                             "или имя своего шаблона; первый - основной (по умолчанию html)")
+
+    profile = parser.add_argument_group("профилирование")
+    profile.add_argument("--profile", action="store_true",
+                         help="Замерять спаны и вывести сводную таблицу при выходе")
+    profile.add_argument("--trace", metavar="FILE",
+                         help="Сохранить трассу в формате Chrome trace-event")
+    profile.add_argument("--profile-interval", type=float, metavar="SEC",
+                         help="Печатать промежуточную таблицу каждые SEC секунд")
+    profile.add_argument("--cprofile", metavar="FILE", help="Снять cProfile команды в файл")
+    profile.add_argument("--tracemalloc", action="store_true",
+                         help="Снять распределение памяти команды (tracemalloc)")
+
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    report = commands.add_parser("report", help="Отчёт для одной цели")
+    report.add_argument("target_id", help="ID цели")
+    report_all = commands.add_parser("report-all", help="Отчёты для всех целей")
+    report_all.add_argument("--workers", type=int, default=0,
+                            help="Число процессов (при шардированной БД - по шардам)")
+    add_output_options(report_all)
+    summary = commands.add_parser("summary", help="Сводный отчёт")
+    summary.add_argument("--page-size", type=int, default=500, help="Целей на странице")
+    commands.add_parser("list", help="Список целей")
+    search = commands.add_parser("search", help="Поиск целей")
+    search.add_argument("query", help="Поисковый запрос")
+    stats = commands.add_parser("stats", help="Статистика базы данных")
+    stats.add_argument("--refresh-derived", action="store_true",
+                       help="Пересчитать производные поля (derived) у целей без актуального блока")
+    stats.add_argument("--by", choices=AGGREGATE_DIMENSIONS, help="Число целей по группам измерения")
+    stats.add_argument("--limit", type=int, default=20, help="Групп в таблице --by")
+    stats.add_argument("--rebuild", action="store_true", help="Пересчитать группировки по всей базе")
+    import_parser = commands.add_parser("import", help="Импорт из JSON")
+    import_parser.add_argument("file", help="JSON-файл (цель или экспорт всех целей)")
+    export = commands.add_parser("export", help="Экспорт в JSON")
+    export.add_argument("--id", help="ID цели (по умолчанию - все цели)")
+    export.add_argument("-o", "--output", help="Имя файла")
+    migrate_parser = commands.add_parser("migrate", help="Перенос базы в новое хранилище")
+    migrate_parser.add_argument("destination", help="Новый JSON-файл или директория шардов")
+    migrate_parser.add_argument("--layout", choices=["json", "sharded", "dir"],
+                                help="Формат: один JSON-файл, шарды или файл на цель с каталогом "
+                                     "(по умолчанию - sharded при --shards, иначе json)")
+    migrate_parser.add_argument("--shards", type=int, default=0,
+                                help="Число шардов (0 - один JSON-файл)")
+    commands.add_parser("catalog", help="Пересобрать каталог хранилища-директории")
+
+    changes = commands.add_parser("changes", help="Журнал изменений: экспорт и применение пакетов")
+    changes_commands = changes.add_subparsers(dest="changes_command", metavar="action")
+    changes_commands.add_parser("status", help="Номер журнала, надгробия и закладки пиров")
+    changes_export = changes_commands.add_parser("export", help="Сохранить пакет изменений")
+    changes_export.add_argument("-o", "--output", default="changes.json.gz",
+                                help="Файл пакета (.gz - со сжатием)")
+    changes_export.add_argument("--since", type=int, default=0,
+                                help="Номер, после которого нужны изменения")
+    changes_export.add_argument("--peer", help="ID реплики-получателя: с ее закладки и без ее изменений")
+    changes_apply = changes_commands.add_parser("apply", help="Применить пакет изменений")
+    changes_apply.add_argument("file", help="Файл пакета")
+    changes_apply.add_argument("--strategy", choices=["lww", "field"], default="lww",
+                               help="lww - новая версия целиком, field - пополевое слияние")
+    changes_commands.add_parser("compact", help="Оставить в журнале последнюю запись по каждой цели")
+    changes_clone = changes_commands.add_parser("clone", help="Копия базы с общим журналом для sync")
+    changes_clone.add_argument("destination", help="Путь к новой базе")
+    changes_clone.add_argument("--layout", choices=["json", "sharded", "dir"], help="Формат хранилища")
+    changes_clone.add_argument("--shards", type=int, default=0, help="Число шардов")
+    watch = commands.add_parser("watch", help="Обновлять отчёты изменённых целей при изменении базы")
+    watch.add_argument("--workers", type=int, default=0, help="Число процессов (0 - в текущем процессе)")
+    watch.add_argument("--interval", type=float, default=1.0, help="Период опроса без inotify, секунд")
+    watch.add_argument("--debounce", type=float, default=0.5, help="Пауза без записей перед обновлением, секунд")
+    watch.add_argument("--once", action="store_true", help="Один прогон: обновить изменённое и выйти")
+    add_output_options(watch)
+    queue = commands.add_parser("queue", help="Очередь заданий на отчёты: повторы, возобновление после перезапуска")
+    queue_commands = queue.add_subparsers(dest="queue_command", metavar="action")
+    queue_commands.add_parser("status", help="Глубина очереди, пропускная способность, ошибки")
+    queue_add = queue_commands.add_parser("add", help="Поставить отчёты в очередь")
+    queue_add.add_argument("target_ids", nargs="*", help="ID целей")
+    queue_add.add_argument("--all", action="store_true", help="Все цели базы")
+    queue_add.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Попыток на задание")
+    queue_run = queue_commands.add_parser("run", help="Выполнить задания очереди")
+    queue_run.add_argument("--workers", type=int, default=0, help="Число процессов (0 - в текущем процессе)")
+    queue_run.add_argument("--prefetch", type=int, default=2, help="Заданий в работе на процесс")
+    queue_run.add_argument("--no-wait", action="store_true",
+                           help="Не ждать отложенных повторов - выйти, когда готовых заданий нет")
+    add_output_options(queue_run)
+    queue_commands.add_parser("retry", help="Вернуть задания с ошибкой в очередь")
+    queue_purge = queue_commands.add_parser("purge", help="Удалить выполненные задания")
+    queue_purge.add_argument("--failed", action="store_true", help="И задания с ошибкой")
+    sync = commands.add_parser("sync", help="Двусторонняя синхронизация с другой копией базы")
+    sync.add_argument("other_db", help="Путь к другой базе данных")
+    sync.add_argument("--strategy", choices=["lww", "field"], default="lww",
+                      help="lww - новая версия целиком, field - пополевое слияние")
+    pivot = commands.add_parser("pivot", help="Цели с общим телефоном, email, логином или номером машины")
+    pivot.add_argument("kind", nargs="?", choices=PIVOT_KINDS, help="Тип идентификатора")
+    pivot.add_argument("value", nargs="?", help="Значение (без него - отчёт об общих идентификаторах)")
+    pivot.add_argument("--shared", action="store_true",
+                       help="Идентификаторы, общие для нескольких целей (можно ограничить типом)")
+    pivot.add_argument("--limit", type=int, default=50, help="Строк в отчёте об общих идентификаторах")
+    similar = commands.add_parser("similar", help="Похожие цели (общие теги, работа, учёба, города, связи)")
+    similar.add_argument("target_id", nargs="?", help="ID цели")
+    similar.add_argument("--limit", type=int, default=20, help="Число похожих целей")
+    similar.add_argument("--all", action="store_true", help="Похожие для каждой цели - в JSON-файл")
+    similar.add_argument("-o", "--output", default="similar.json", help="Файл для --all")
+    tags = commands.add_parser("tags", help="Теги: частота, выборка по выражению, совместная встречаемость")
+    tags.add_argument("expression", nargs="?",
+                      help='Выражение над тегами: "moscow AND (it OR finance) AND NOT archived"')
+    tags.add_argument("--related", metavar="TAG", help="Теги, чаще всего встречающиеся вместе с TAG")
+    tags.add_argument("--limit", type=int, default=20, help="Наибольшее число строк")
+    copresence = commands.add_parser("copresence", help="Цели, бывавшие в одном месте в один день")
+    copresence.add_argument("--target", help="Только совпадения этой цели")
+    copresence.add_argument("--window", type=int, default=0, help="Допустимая разница дат, дней")
+    copresence.add_argument("--city", action="store_true", help="Сравнивать места только по городу")
+    copresence.add_argument("--no-footprint", action="store_true",
+                            help="Не учитывать цифровой след (совпадение источника и дня)")
+    copresence.add_argument("--limit", type=int, default=20, help="Строк в таблице (и на цель в JSON)")
+    copresence.add_argument("-o", "--output", help="Таблица по всем целям - в JSON-файл")
+    return parser
+
+
 def main():
     """Точка входа в приложение"""
+    args = build_parser().parse_args()
+    if args.profile or args.trace or args.profile_interval:
+        profiling.enable()
+    periodic = profiling.PeriodicSummary(args.profile_interval).start() if args.profile_interval else None
+
+    cli = None
     try:
-        cli = OSINTProfilerCLI()
-        cli.run()
+        cli = OSINTProfilerCLI(args.db, args.write_delay, tuple(args.formats.split(",")))
+        with profiling.capture(args.cprofile, args.tracemalloc, console):
+            if args.command:
+                cli.run_command(args)
+            else:
+                cli.run()
     except KeyboardInterrupt:
         console.print("\n[yellow]⚠️  Прервано пользователем[/yellow]\n")
         sys.exit(0)
     except Exception as e:
         console.print(f"\n[bold red]💥 Критическая ошибка:[/bold red] {e}\n")
         sys.exit(1)
+    finally:
+        if cli is not None:
+            try:
+                cli.dm.close()
+            except Exception as e:
+                console.print(f"\n[bold red]✗ Не удалось сохранить изменения:[/bold red] {e}\n")
+        if periodic:
+            periodic.stop()
+        if args.trace:
+            console.print(f"[dim]Трасса: {profiling.export_chrome_trace(args.trace)}[/dim]")
+        if profiling.is_enabled():
+            console.print(profiling.summary_table())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+OSINT Profiler - HTTP API Server
+Локальный асинхронный HTTP-сервер для совместной работы с базой данных
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from core.data_manager import DataManager
+from generator import ReportGenerator
+
+# Максимальный размер тела запроса (тело не используется, но читается)
+MAX_BODY_SIZE = 1 << 20
+
+# Генератор отчетов внутри процесса-воркера (создается один раз на процесс)
+_worker_generator: Optional[ReportGenerator] = None
+
+
+def _init_render_worker(templates_dir: str, output_dir: str, db_path: str):
+    """Инициализирует генератор отчетов в процессе-воркере"""
+    global _worker_generator
+    _worker_generator = ReportGenerator(templates_dir, output_dir, DataManager(db_path))
+
+
+def _render_in_worker(target: Dict) -> str:
+    """Рендерит отчет в процессе-воркере"""
+    return _worker_generator.render_target(target)
+
+
+class Request:
+    """Разобранный HTTP-запрос"""
+
+    def __init__(self, method: str, path: str, params: Dict[str, str], headers: Dict[str, str]):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+
+
+class Response:
+    """HTTP-ответ сервера"""
+
+    def __init__(self, status: HTTPStatus, body: bytes = b"",
+                 content_type: str = "application/json; charset=utf-8",
+                 etag: Optional[str] = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+
+
+class ProfilerServer:
+    """
+    HTTP API поверх одного «тёплого» DataManager и одного окружения Jinja2
+
+    Чтение БД выполняется в выделенном потоке (DataManager не
+    потокобезопасен), рендеринг отчетов - в пуле процессов.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080,
+                 db_path: str = "data/database.json", templates_dir: str = "templates",
+                 output_dir: str = "output", render_workers: int = 2):
+        self.host = host
+        self.port = port
+        self.data_manager = DataManager(db_path)
+        self.generator = ReportGenerator(templates_dir, output_dir, self.data_manager)
+
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osint-db")
+        self._render_executor: Executor
+        if render_workers > 0:
+            self._render_executor = ProcessPoolExecutor(
+                max_workers=render_workers,
+                initializer=_init_render_worker,
+                initargs=(templates_dir, output_dir, db_path)
+            )
+        else:
+            # Рендеринг в потоке с общим генератором (удобно для отладки)
+            self._render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osint-render")
+
+        self._routes = [
+            (("api", "targets"), self._handle_targets),
+            (("api", "targets", None), self._handle_target),
+            (("api", "targets", None, "neighbors"), self._handle_neighbors),
+            (("api", "search"), self._handle_search),
+            (("api", "query"), self._handle_query),
+            (("api", "statistics"), self._handle_statistics),
+            (("api", "changes"), self._handle_changes),
+            (("reports", None), self._handle_report),
+        ]
+
+    # ==================== Вспомогательные методы ====================
+
+    async def _run_db(self, func, *args):
+        """Выполняет блокирующий вызов DataManager в выделенном потоке"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+
+    @staticmethod
+    def _make_etag(*parts: str) -> str:
+        """Строит ETag из значений updated_at и других частей"""
+        digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+        return f'"{digest}"'
+
+    async def _versioned(self, request: Request, compute: Callable[[str], Response],
+                         *parts: str) -> Response:
+        """
+        Ответ, зависящий от всей базы, с ETag от версии базы
+
+        Версия меняется при каждой записи и читается до запроса, так что
+        ETag не новее данных ответа. If-None-Match сверяется до запроса:
+        если база не изменилась, 304 отдается без выполнения compute.
+
+        Args:
+            compute: Строит ответ по ETag (выполняется в потоке базы)
+            parts: Параметры запроса, от которых зависит ответ
+        """
+        def _run() -> Response:
+            etag = self._make_etag(repr(self.data_manager.version), *parts)
+            if request.headers.get("if-none-match") == etag:
+                return Response(HTTPStatus.NOT_MODIFIED, etag=etag)
+            return compute(etag)
+
+        return await self._run_db(_run)
+
+    @staticmethod
+    def _json(payload, etag: Optional[str] = None,
+              status: HTTPStatus = HTTPStatus.OK) -> Response:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return Response(status, body, etag=etag)
+
+    @classmethod
+    def _error(cls, status: HTTPStatus, message: str) -> Response:
+        return cls._json({"error": message}, status=status)
+
+    def _match_route(self, path: str) -> Tuple[Optional[object], List[str]]:
+        """Находит обработчик по пути, возвращает его и параметры пути"""
+        segments = tuple(unquote(s) for s in path.strip("/").split("/") if s)
+        for pattern, handler in self._routes:
+            if len(pattern) != len(segments):
+                continue
+            params = []
+            for expected, actual in zip(pattern, segments):
+                if expected is None:
+                    params.append(actual)
+                elif expected != actual:
+                    break
+            else:
+                return handler, params
+        return None, []
+
+    # ==================== Обработчики ====================
+
+    async def _handle_targets(self, request: Request) -> Response:
+        return await self._versioned(
+            request, lambda etag: self._json({"targets": self.data_manager.list_targets()}, etag),
+            "targets")
+
+    async def _handle_target(self, request: Request, target_id: str) -> Response:
+        target = await self._run_db(self.data_manager.get_target, target_id)
+        if not target:
+            return self._error(HTTPStatus.NOT_FOUND, f"Цель с ID {target_id} не найдена")
+        return self._json(target, self._make_etag(target_id, target.get('updated_at', '')))
+
+    async def _handle_neighbors(self, request: Request, target_id: str) -> Response:
+        def _neighbors(etag: str) -> Response:
+            # Ответ - по одной версии базы, даже если ее параллельно меняют
+            neighbors = self.data_manager.snapshot().get_neighbors(target_id)
+            if neighbors is None:
+                return self._error(HTTPStatus.NOT_FOUND, f"Цель с ID {target_id} не найдена")
+            return self._json({"target_id": target_id, "neighbors": neighbors}, etag)
+
+        return await self._versioned(request, _neighbors, "neighbors", target_id)
+
+    async def _handle_search(self, request: Request) -> Response:
+        query = request.params.get("q", "").strip()
+        if not query:
+            return self._error(HTTPStatus.BAD_REQUEST, "Параметр q обязателен")
+
+        def _search(etag: str) -> Response:
+            results = self.data_manager.snapshot().search_targets(query)
+            return self._json({"query": query, "results": results}, etag)
+
+        return await self._versioned(request, _search, "search", query)
+
+    async def _handle_query(self, request: Request) -> Response:
+        filters = request.params
+        if not filters:
+            return self._error(HTTPStatus.BAD_REQUEST, "Укажите хотя бы один фильтр")
+
+        def _query(etag: str) -> Response:
+            results = self.data_manager.snapshot().query(filters)
+            return self._json({"filters": filters, "results": results}, etag)
+
+        return await self._versioned(request, _query, "query", json.dumps(filters, sort_keys=True))
+
+    async def _handle_statistics(self, request: Request) -> Response:
+        return await self._versioned(
+            request, lambda etag: self._json(self.data_manager.snapshot().get_statistics(), etag),
+            "statistics")
+
+    async def _handle_changes(self, request: Request) -> Response:
+        try:
+            since = int(request.params.get("since", "0"))
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, "Параметр since должен быть числом")
+        peer = request.params.get("peer") or None
+
+        payload = await self._run_db(self.data_manager.export_changes, since, peer)
+        return self._json(payload, self._make_etag(payload['replica'], str(since),
+                                                   str(payload['until']), peer or ""))
+
+    async def _handle_report(self, request: Request, target_id: str) -> Response:
+        def _load() -> Tuple[str, Optional[Dict]]:
+            # Граф связей в отчете строится и по другим целям, поэтому ETag -
+            # от версии всей базы (читается до цели, как в _versioned)
+            etag = self._make_etag(repr(self.data_manager.version), target_id, "report")
+            if request.headers.get("if-none-match") == etag:
+                return etag, None
+            return etag, self.data_manager.get_target(target_id)
+
+        etag, target = await self._run_db(_load)
+        if request.headers.get("if-none-match") == etag:
+            # База не изменилась - не тратим время на рендеринг
+            return Response(HTTPStatus.NOT_MODIFIED, etag=etag)
+        if not target:
+            return self._error(HTTPStatus.NOT_FOUND, f"Цель с ID {target_id} не найдена")
+
+        loop = asyncio.get_running_loop()
+        if isinstance(self._render_executor, ProcessPoolExecutor):
+            html = await loop.run_in_executor(self._render_executor, _render_in_worker, target)
+        else:
+            html = await loop.run_in_executor(self._render_executor, self.generator.render_target, target)
+        return Response(HTTPStatus.OK, html.encode("utf-8"), "text/html; charset=utf-8", etag)
+
+    # ==================== HTTP ====================
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str]) -> Response:
+        if method not in ("GET", "HEAD"):
+            return self._error(HTTPStatus.METHOD_NOT_ALLOWED, "Поддерживаются только GET и HEAD")
+
+        url = urlsplit(target)
+        handler, path_params = self._match_route(url.path)
+        if handler is None:
+            return self._error(HTTPStatus.NOT_FOUND, f"Неизвестный путь: {url.path}")
+
+        request = Request(method, url.path, dict(parse_qsl(url.query)), headers)
+        try:
+            response = await handler(request, *path_params)
+        except Exception as e:
+            return self._error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+
+        if (response.status == HTTPStatus.OK and response.etag
+                and headers.get("if-none-match") == response.etag):
+            return Response(HTTPStatus.NOT_MODIFIED, etag=response.etag)
+        return response
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обслуживает одно соединение (с поддержкой keep-alive)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                # Тело запроса не используется, но должно быть прочитано
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Без длины тела нельзя найти начало следующего запроса
+                    response = self._error(HTTPStatus.BAD_REQUEST, "Некорректный заголовок Content-Length")
+                    keep_alive = False
+                elif length > MAX_BODY_SIZE:
+                    response = self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                           f"Тело запроса больше {MAX_BODY_SIZE} байт")
+                    keep_alive = False
+                else:
+                    try:
+                        await reader.readexactly(length)
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    response = await self._dispatch(method, target, headers)
+                    keep_alive = (version == "HTTP/1.1"
+                                  and headers.get("connection", "").lower() != "close")
+                writer.write(self._serialize(response, method == "HEAD", keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def _serialize(response: Response, head_only: bool, keep_alive: bool) -> bytes:
+        """Формирует байты HTTP-ответа"""
+        status_line = f"HTTP/1.1 {response.status.value} {response.status.phrase}\r\n"
+        headers = [
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            "Cache-Control: no-cache",
+        ]
+        if response.etag:
+            headers.append(f"ETag: {response.etag}")
+
+        payload = (status_line + "\r\n".join(headers) + "\r\n\r\n").encode("latin-1")
+        if not head_only and response.status != HTTPStatus.NOT_MODIFIED:
+            payload += response.body
+        return payload
+
+    async def serve(self):
+        """Запускает сервер и обслуживает запросы до остановки"""
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"🌐 OSINT Profiler API: http://{self.host}:{self.port}/api/targets")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """Останавливает пулы воркеров"""
+        self._render_executor.shutdown(wait=False)
+        self._db_executor.shutdown(wait=False)
+
+
+def main():
+    """Точка входа сервера"""
+    parser = argparse.ArgumentParser(description="OSINT Profiler HTTP API")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=8080, help="Порт")
+    parser.add_argument("--db", default="data/database.json",
+                        help="Путь к базе данных (JSON-файл, директория шардов или целей)")
+    parser.add_argument("--templates", default="templates", help="Директория шаблонов")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Число процессов для рендеринга отчетов (0 - рендерить в потоке)")
+    args = parser.parse_args()
+
+    server = ProfilerServer(args.host, args.port, args.db, args.templates,
+                            render_workers=args.workers)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n⚠️  Сервер остановлен")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+/*
+ * OSINT Profiler - Lazy Sections
+ * Постраничный рендеринг больших разделов отчета с виртуальной прокруткой.
+ * Данные раздела встраиваются генератором как компактный JSON
+ * ({columns: [...], rows: [[...], ...]}) в <script id="lazy-data-<раздел>">.
+ */
+(function () {
+    'use strict';
+
+    var ROW_HEIGHT = 64;
+    var VIEWPORT_ROWS = 10;
+    var OVERSCAN = 4;
+
+    function formatDate(value) {
+        if (!value) {
+            return 'N/A';
+        }
+        var parts = String(value).slice(0, 10).split('-');
+        return parts.length === 3 ? parts[2] + '.' + parts[1] + '.' + parts[0] : String(value);
+    }
+
+    function el(tag, className, text) {
+        var node = document.createElement(tag);
+        if (className) {
+            node.className = className;
+        }
+        if (text !== undefined && text !== null) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    // Рендереры строк: получают объект {колонка: значение}
+    var RENDERERS = {
+        timeline: function (item) {
+            var row = el('div', 'event-item lazy-row');
+            row.appendChild(el('div', 'event-date', formatDate(item.date)));
+            var content = el('div', 'event-content');
+            content.appendChild(el('div', 'event-title', item.event));
+            if (item.location) {
+                content.appendChild(el('div', 'event-location', '📍 ' + item.location));
+            }
+            row.appendChild(content);
+            return row;
+        },
+        connections: function (item) {
+            var row = el('div', 'event-item lazy-row');
+            row.appendChild(el('div', 'event-date', item.relation));
+            var content = el('div', 'event-content');
+            content.appendChild(el('div', 'event-title', item.name));
+            var meta = [item.source, item.strength ? '★ ' + item.strength : '', item.context]
+                .filter(Boolean).join(' · ');
+            content.appendChild(el('div', 'event-location', meta));
+            row.appendChild(content);
+            return row;
+        },
+        digital_footprint: function (item) {
+            var row = el('div', 'event-item lazy-row');
+            row.appendChild(el('div', 'event-date', formatDate(item.date)));
+            var content = el('div', 'event-content');
+            content.appendChild(el('div', 'event-title',
+                [item.source, item.type].filter(Boolean).join(' · ')));
+            content.appendChild(el('div', 'event-location', item.content || item.url || ''));
+            row.appendChild(content);
+            return row;
+        }
+    };
+
+    function LazySection(container, data) {
+        this.container = container;
+        this.columns = data.columns;
+        this.rows = data.rows;
+        this.render = RENDERERS[container.getAttribute('data-section')] || RENDERERS.timeline;
+        this.pageSize = parseInt(container.getAttribute('data-page-size'), 10) || 100;
+        this.pageCount = Math.max(1, Math.ceil(this.rows.length / this.pageSize));
+        this.page = 0;
+        this.build();
+        this.showPage(0);
+    }
+
+    LazySection.prototype.build = function () {
+        var self = this;
+
+        this.pager = el('div', 'lazy-pager');
+        this.prevButton = el('button', 'lazy-button', '←');
+        this.nextButton = el('button', 'lazy-button', '→');
+        this.pageLabel = el('span', 'lazy-page-label');
+        this.prevButton.addEventListener('click', function () { self.showPage(self.page - 1); });
+        this.nextButton.addEventListener('click', function () { self.showPage(self.page + 1); });
+        this.pager.appendChild(this.prevButton);
+        this.pager.appendChild(this.pageLabel);
+        this.pager.appendChild(this.nextButton);
+
+        // Виртуальная прокрутка: в DOM только видимые строки страницы
+        this.viewport = el('div', 'lazy-viewport');
+        this.viewport.style.height = (ROW_HEIGHT * VIEWPORT_ROWS) + 'px';
+        this.spacer = el('div', 'lazy-spacer');
+        this.viewport.appendChild(this.spacer);
+        this.viewport.addEventListener('scroll', function () { self.renderVisible(); });
+
+        this.container.appendChild(this.pager);
+        this.container.appendChild(this.viewport);
+    };
+
+    LazySection.prototype.toObject = function (row) {
+        var item = {};
+        for (var i = 0; i < this.columns.length; i++) {
+            item[this.columns[i]] = row[i];
+        }
+        return item;
+    };
+
+    LazySection.prototype.showPage = function (page) {
+        this.page = Math.min(Math.max(page, 0), this.pageCount - 1);
+        this.start = this.page * this.pageSize;
+        this.end = Math.min(this.start + this.pageSize, this.rows.length);
+
+        this.pageLabel.textContent = 'Стр. ' + (this.page + 1) + ' из ' + this.pageCount +
+            ' · записи ' + (this.start + 1) + '–' + this.end + ' из ' + this.rows.length;
+        this.prevButton.disabled = this.page === 0;
+        this.nextButton.disabled = this.page === this.pageCount - 1;
+
+        this.spacer.style.height = ((this.end - this.start) * ROW_HEIGHT) + 'px';
+        this.viewport.scrollTop = 0;
+        this.rendered = null;
+        this.renderVisible();
+    };
+
+    LazySection.prototype.renderVisible = function () {
+        var first = Math.max(0, Math.floor(this.viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        var last = Math.min(this.end - this.start, first + VIEWPORT_ROWS + OVERSCAN * 2);
+        var key = first + ':' + last;
+        if (this.rendered === key) {
+            return;
+        }
+        this.rendered = key;
+
+        var fragment = document.createDocumentFragment();
+        for (var i = first; i < last; i++) {
+            var row = this.render(this.toObject(this.rows[this.start + i]));
+            row.style.top = (i * ROW_HEIGHT) + 'px';
+            row.style.height = ROW_HEIGHT + 'px';
+            fragment.appendChild(row);
+        }
+        this.spacer.innerHTML = '';
+        this.spacer.appendChild(fragment);
+    };
+
+    function init() {
+        var containers = document.querySelectorAll('.lazy-section');
+        for (var i = 0; i < containers.length; i++) {
+            var name = containers[i].getAttribute('data-section');
+            var source = document.getElementById('lazy-data-' + name);
+            if (source) {
+                new LazySection(containers[i], JSON.parse(source.textContent));
+            }
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
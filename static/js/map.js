@@ -0,0 +1,106 @@
+/*
+ * OSINT Profiler - Map
+ * Карта адресов и событий (Leaflet). Кластеры рассчитаны генератором для
+ * каждого уровня масштаба и разложены по тайлам:
+ * {min_zoom, max_zoom, bounds, levels: {z: {"x:y": [[lat, lon, count, подпись, тип]]}}}.
+ * Клиент только рисует кластеры видимых тайлов текущего уровня.
+ */
+(function () {
+    'use strict';
+
+    var COLORS = { address: '#00ff9f', event: '#00d9ff', cluster: '#ff006e' };
+
+    function tileRange(map, zoom) {
+        var bounds = map.getBounds();
+        var scale = Math.pow(2, zoom);
+        function tile(lat, lon) {
+            var sin = Math.sin(lat * Math.PI / 180);
+            var x = (lon + 180) / 360;
+            var y = 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI);
+            return [Math.floor(Math.min(Math.max(x, 0), 0.999999) * scale),
+                    Math.floor(Math.min(Math.max(y, 0), 0.999999) * scale)];
+        }
+        var nw = tile(bounds.getNorth(), bounds.getWest());
+        var se = tile(bounds.getSouth(), bounds.getEast());
+        return { minX: nw[0], maxX: se[0], minY: nw[1], maxY: se[1] };
+    }
+
+    function ClusterMap(container, data) {
+        this.data = data;
+        this.map = L.map(container, { preferCanvas: true });
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '&copy; OpenStreetMap',
+            maxZoom: 18
+        }).addTo(this.map);
+        this.layer = L.layerGroup().addTo(this.map);
+        this.map.fitBounds(data.bounds, { padding: [30, 30], maxZoom: 14 });
+
+        var self = this;
+        this.map.on('moveend', function () { self.render(); });
+        this.render();
+    }
+
+    ClusterMap.prototype.render = function () {
+        var zoom = Math.min(Math.max(this.map.getZoom(), this.data.min_zoom), this.data.max_zoom);
+        var level = this.data.levels[zoom] || {};
+        var range = tileRange(this.map, zoom);
+        var map = this.map;
+        this.layer.clearLayers();
+
+        for (var x = range.minX; x <= range.maxX; x++) {
+            for (var y = range.minY; y <= range.maxY; y++) {
+                var items = level[x + ':' + y];
+                if (!items) {
+                    continue;
+                }
+                for (var i = 0; i < items.length; i++) {
+                    this.addCluster(items[i], map);
+                }
+            }
+        }
+    };
+
+    ClusterMap.prototype.addCluster = function (item, map) {
+        var count = item[2];
+        if (count === 1) {
+            L.circleMarker([item[0], item[1]], {
+                radius: 6,
+                color: COLORS[item[4]] || COLORS.address,
+                fillOpacity: 0.8
+            }).bindTooltip(item[3] || '').addTo(this.layer);
+            return;
+        }
+        var marker = L.marker([item[0], item[1]], {
+            icon: L.divIcon({
+                className: 'map-cluster',
+                html: '<span>' + count + '</span>',
+                iconSize: [36, 36]
+            })
+        });
+        marker.on('click', function () {
+            map.setView([item[0], item[1]], map.getZoom() + 2);
+        });
+        marker.addTo(this.layer);
+    };
+
+    function init() {
+        var containers = document.querySelectorAll('.geo-map');
+        for (var i = 0; i < containers.length; i++) {
+            var source = document.getElementById(containers[i].getAttribute('data-source'));
+            if (!source) {
+                continue;
+            }
+            if (typeof L === 'undefined') {
+                containers[i].textContent = 'Карта недоступна: не удалось загрузить Leaflet';
+                continue;
+            }
+            new ClusterMap(containers[i], JSON.parse(source.textContent));
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -0,0 +1,191 @@
+/*
+ * OSINT Profiler - Network Graph
+ * Отрисовка графа связей на canvas по укладке, рассчитанной генератором.
+ * Симуляция в браузере не запускается: координаты узлов уже в JSON
+ * ({nodes: [[подпись, тип, глубина, x, y]], edges: [[i, j, вес]]}).
+ */
+(function () {
+    'use strict';
+
+    var HEIGHT = 520;
+    var GRID = 32;
+    var COLORS = {
+        root: '#ff006e',
+        target: '#00ff9f',
+        person: '#00d9ff',
+        edge: 'rgba(128, 128, 128, 0.35)',
+        label: '#e0e0e0'
+    };
+
+    function NetworkGraph(container, data) {
+        this.container = container;
+        this.canvas = container.querySelector('canvas');
+        this.tooltip = container.querySelector('.network-tooltip');
+        this.ctx = this.canvas.getContext('2d');
+        this.nodes = data.nodes;
+        this.edges = data.edges;
+        this.scale = 1;
+        this.offsetX = 0;
+        this.offsetY = 0;
+        this.hover = -1;
+        this.buildGrid();
+        this.bindEvents();
+        this.resize();
+    }
+
+    // Сетка по координатам укладки для быстрого поиска узла под курсором
+    NetworkGraph.prototype.buildGrid = function () {
+        this.grid = {};
+        for (var i = 0; i < this.nodes.length; i++) {
+            var key = this.cellKey(this.nodes[i][3], this.nodes[i][4]);
+            (this.grid[key] = this.grid[key] || []).push(i);
+        }
+    };
+
+    NetworkGraph.prototype.cellKey = function (x, y) {
+        return Math.floor(x * GRID) + ':' + Math.floor(y * GRID);
+    };
+
+    NetworkGraph.prototype.resize = function () {
+        var ratio = window.devicePixelRatio || 1;
+        this.width = this.container.clientWidth || 800;
+        this.canvas.width = this.width * ratio;
+        this.canvas.height = HEIGHT * ratio;
+        this.canvas.style.width = this.width + 'px';
+        this.canvas.style.height = HEIGHT + 'px';
+        this.ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+        this.size = Math.min(this.width, HEIGHT) - 40;
+        this.draw();
+    };
+
+    NetworkGraph.prototype.toScreen = function (x, y) {
+        var left = (this.width - this.size * this.scale) / 2 + this.offsetX;
+        var top = (HEIGHT - this.size * this.scale) / 2 + this.offsetY;
+        return [left + x * this.size * this.scale, top + y * this.size * this.scale];
+    };
+
+    NetworkGraph.prototype.toLayout = function (sx, sy) {
+        var left = (this.width - this.size * this.scale) / 2 + this.offsetX;
+        var top = (HEIGHT - this.size * this.scale) / 2 + this.offsetY;
+        return [(sx - left) / (this.size * this.scale), (sy - top) / (this.size * this.scale)];
+    };
+
+    NetworkGraph.prototype.draw = function () {
+        var ctx = this.ctx;
+        var nodes = this.nodes;
+        ctx.clearRect(0, 0, this.width, HEIGHT);
+
+        ctx.strokeStyle = COLORS.edge;
+        ctx.beginPath();
+        for (var e = 0; e < this.edges.length; e++) {
+            var a = this.toScreen(nodes[this.edges[e][0]][3], nodes[this.edges[e][0]][4]);
+            var b = this.toScreen(nodes[this.edges[e][1]][3], nodes[this.edges[e][1]][4]);
+            ctx.moveTo(a[0], a[1]);
+            ctx.lineTo(b[0], b[1]);
+        }
+        ctx.stroke();
+
+        // Подписи рисуем только для небольших графов или ближних узлов
+        var showLabels = nodes.length <= 150 || this.scale >= 3;
+        ctx.font = '11px "Fira Code", monospace';
+        for (var i = 0; i < nodes.length; i++) {
+            var node = nodes[i];
+            var p = this.toScreen(node[3], node[4]);
+            var radius = node[2] === 0 ? 8 : node[2] === 1 ? 5 : 3;
+            ctx.fillStyle = COLORS[node[1]] || COLORS.person;
+            ctx.beginPath();
+            ctx.arc(p[0], p[1], i === this.hover ? radius + 3 : radius, 0, Math.PI * 2);
+            ctx.fill();
+            if (showLabels && (node[2] <= 1 || this.scale >= 3)) {
+                ctx.fillStyle = COLORS.label;
+                ctx.fillText(node[0], p[0] + radius + 3, p[1] + 4);
+            }
+        }
+    };
+
+    NetworkGraph.prototype.findNode = function (sx, sy) {
+        var point = this.toLayout(sx, sy);
+        var radius = 8 / (this.size * this.scale);
+        var cx = Math.floor(point[0] * GRID);
+        var cy = Math.floor(point[1] * GRID);
+        var best = -1;
+        var bestDist = radius * radius;
+        for (var dx = -1; dx <= 1; dx++) {
+            for (var dy = -1; dy <= 1; dy++) {
+                var cell = this.grid[(cx + dx) + ':' + (cy + dy)] || [];
+                for (var k = 0; k < cell.length; k++) {
+                    var node = this.nodes[cell[k]];
+                    var d = Math.pow(node[3] - point[0], 2) + Math.pow(node[4] - point[1], 2);
+                    if (d < bestDist) {
+                        bestDist = d;
+                        best = cell[k];
+                    }
+                }
+            }
+        }
+        return best;
+    };
+
+    NetworkGraph.prototype.bindEvents = function () {
+        var self = this;
+        var drag = null;
+
+        this.canvas.addEventListener('wheel', function (event) {
+            event.preventDefault();
+            var factor = event.deltaY < 0 ? 1.2 : 1 / 1.2;
+            var rect = self.canvas.getBoundingClientRect();
+            var before = self.toLayout(event.clientX - rect.left, event.clientY - rect.top);
+            self.scale = Math.min(Math.max(self.scale * factor, 0.5), 40);
+            var after = self.toScreen(before[0], before[1]);
+            // Масштабируем относительно курсора
+            self.offsetX += event.clientX - rect.left - after[0];
+            self.offsetY += event.clientY - rect.top - after[1];
+            self.draw();
+        }, { passive: false });
+
+        this.canvas.addEventListener('mousedown', function (event) {
+            drag = [event.clientX, event.clientY];
+        });
+        window.addEventListener('mouseup', function () { drag = null; });
+
+        this.canvas.addEventListener('mousemove', function (event) {
+            if (drag) {
+                self.offsetX += event.clientX - drag[0];
+                self.offsetY += event.clientY - drag[1];
+                drag = [event.clientX, event.clientY];
+                self.draw();
+                return;
+            }
+            var rect = self.canvas.getBoundingClientRect();
+            var index = self.findNode(event.clientX - rect.left, event.clientY - rect.top);
+            if (index !== self.hover) {
+                self.hover = index;
+                self.draw();
+            }
+            if (index >= 0) {
+                self.tooltip.textContent = self.nodes[index][0];
+                self.tooltip.style.left = (event.clientX - rect.left + 12) + 'px';
+                self.tooltip.style.top = (event.clientY - rect.top + 12) + 'px';
+                self.tooltip.style.display = 'block';
+            } else {
+                self.tooltip.style.display = 'none';
+            }
+        });
+
+        window.addEventListener('resize', function () { self.resize(); });
+    };
+
+    function init() {
+        var container = document.querySelector('.network-graph');
+        var source = document.getElementById('network-data');
+        if (container && source) {
+            new NetworkGraph(container, JSON.parse(source.textContent));
+        }
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -0,0 +1,89 @@
+"""
+Тесты материализованных группировок: счетчики целей и записей по измерениям
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.aggregates import AGGREGATE_DIMENSIONS, AggregateIndex, group_values  # noqa: E402
+from core.data_manager import DataManager  # noqa: E402
+
+TARGETS = [
+    {'id': "a", 'tags': ["moscow", " it "],
+     'employment': [{'company': "Сбер"}, {'company': "Сбер"}, {'company': "ВТБ"}],
+     'addresses': [{'address': "Москва, Тверская 1"}],
+     'social_media': [{'platform': "VK"}],
+     'connections': [{'relation': "Коллега"}, {'relation_type': "друг"}]},
+    {'id': "b", 'tags': ["moscow"], 'employment': [{'company': "Сбер"}],
+     'addresses': [{'city': "Москва"}], 'social_media': [{'platform': "vk"}, {'platform': "Telegram"}]},
+    {'id': "c", 'tags': ["", "spb"], 'employment': [{'company': "  "}]},
+]
+
+
+def test_group_values():
+    assert sorted(group_values(TARGETS[0])) == [
+        ("city", "Москва"), ("company", "ВТБ"), ("company", "Сбер"), ("company", "Сбер"),
+        ("platform", "vk"), ("relation", "друг"), ("relation", "коллега"), ("tag", "it"), ("tag", "moscow"),
+    ]
+    assert list(group_values(TARGETS[2])) == [("tag", "spb")]
+
+
+def test_groups_count_targets_and_records():
+    index = AggregateIndex()
+    index.build(TARGETS)
+    assert index.groups("company") == [("Сбер", 2, 3), ("ВТБ", 1, 1)]
+    assert index.groups("tag") == [("moscow", 2, 2), ("it", 1, 1), ("spb", 1, 1)]
+    assert index.groups("platform") == [("vk", 2, 2), ("telegram", 1, 1)]
+    assert index.groups("city") == [("Москва", 2, 2)]
+    assert index.groups("tag", limit=1) == [("moscow", 2, 2)]
+    with pytest.raises(ValueError):
+        index.groups("country")
+
+
+def test_updates_match_rebuilt_index():
+    rng = random.Random(4)
+    companies = ["Сбер", "ВТБ", "Яндекс", "Газпром"]
+
+    def make(i: int):
+        return {'id': f"t{i:02d}", 'tags': rng.sample(["a", "b", "c", "d"], rng.randint(0, 3)),
+                'employment': [{'company': rng.choice(companies)} for _ in range(rng.randint(0, 3))]}
+
+    targets = {f"t{i:02d}": make(i) for i in range(40)}
+    index = AggregateIndex()
+    index.build(targets.values())
+    for _ in range(60):
+        i = rng.randrange(50)
+        if rng.random() < 0.25:
+            targets.pop(f"t{i:02d}", None)
+            index.update(deleted=[f"t{i:02d}"])
+        else:
+            targets[f"t{i:02d}"] = make(i)
+            index.update([targets[f"t{i:02d}"]])
+
+    rebuilt = AggregateIndex()
+    rebuilt.build(targets.values())
+    for dimension in AGGREGATE_DIMENSIONS:
+        assert index.groups(dimension) == rebuilt.groups(dimension)
+    # Опустевшие группы удаляются
+    assert all(counts[0] > 0 for counts in index._counts.values())
+
+
+def test_data_manager_aggregate_persists(tmp_path):
+    db_path = str(tmp_path / "db.json")
+    dm = DataManager(db_path)
+    dm.import_targets([dict(target) for target in TARGETS])
+    assert dm.aggregate("company") == [("Сбер", 2, 3), ("ВТБ", 1, 1)]
+
+    dm.update_target("b", {'employment': [{'company': "ВТБ"}]})
+    dm.delete_target("c")
+    assert dm.aggregate("company") == [("ВТБ", 2, 2), ("Сбер", 1, 2)]
+    assert dm.aggregate("tag") == [("moscow", 2, 2), ("it", 1, 1)]
+    dm.close()
+
+    reopened = DataManager(db_path)
+    assert reopened.aggregate("company") == [("ВТБ", 2, 2), ("Сбер", 1, 2)]
@@ -0,0 +1,49 @@
+"""
+Регрессионные тесты синхронизации копий базы: пополевое слияние
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.changes import merge_targets  # noqa: E402
+from core.data_manager import DataManager  # noqa: E402
+from core.storage import JsonFileStorage  # noqa: E402
+
+
+def _sync(local: DataManager, remote: DataManager):
+    """Двусторонняя синхронизация, как в main.py sync --strategy field"""
+    payload = remote.export_changes(local.peer_seq(remote.changes.replica),
+                                    exclude_origin=local.changes.replica)
+    local.apply_changes(payload, "field")
+    payload = local.export_changes(remote.peer_seq(local.changes.replica),
+                                   exclude_origin=remote.changes.replica)
+    remote.apply_changes(payload, "field")
+
+
+def test_merge_targets_three_way():
+    base = {'id': "x", 'notes': "", 'tags': ["old", "keep"], 'updated_at': "2024-01-01"}
+    local = dict(base, notes="from A", updated_at="2024-01-02")
+    remote = dict(base, tags=["keep", "new"], updated_at="2024-01-03")
+
+    merged = merge_targets(local, remote, base)
+    assert merged['notes'] == "from A"
+    assert merged['tags'] == ["keep", "new"]
+    # Без базы правка notes теряется: побеждает более поздняя версия
+    assert merge_targets(local, remote)['notes'] == ""
+
+
+def test_field_sync_keeps_edits_of_both_copies(tmp_path):
+    first = DataManager(str(tmp_path / "a.json"))
+    first.create_target({'id': "x", 'notes': "", 'tags': ["old", "keep"]})
+    second = first.clone(str(tmp_path / "b.json"), JsonFileStorage(str(tmp_path / "b.json")))
+
+    first.update_target("x", {'notes': "from A"})
+    second.update_target("x", {'tags': ["keep", "new"]})
+    _sync(first, second)
+
+    for dm in (first, second):
+        target = dm.get_target("x")
+        assert target['notes'] == "from A"
+        assert target['tags'] == ["keep", "new"]
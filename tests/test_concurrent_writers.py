@@ -0,0 +1,150 @@
+"""
+Регрессионные тесты: несколько процессов (или потоков) одновременно пишут
+в одну базу, пока другие ее читают
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.data_manager import DataManager  # noqa: E402
+from core.storage import DirectoryStorage, ShardedStorage  # noqa: E402
+
+WRITERS = 4
+TARGETS_PER_WRITER = 25
+
+
+def _write(db_path: str, writer: int):
+    dm = DataManager(db_path)
+    for i in range(TARGETS_PER_WRITER):
+        dm.create_target({'id': f"w{writer}_{i:03d}", 'tags': [f"writer{writer}"],
+                          'personal': {'full_name': f"Писатель {writer} №{i}"}})
+    dm.close()
+
+
+def _read(db_path: str, stop, errors):
+    try:
+        while not stop.is_set():
+            dm = DataManager(db_path, changes=False)
+            snapshot = dm.snapshot()
+            ids = [target['id'] for target in snapshot.get_all_targets()]
+            assert len(ids) == len(set(ids))
+            dm.list_targets()
+    except Exception as e:
+        errors.put(f"{type(e).__name__}: {e}")
+
+
+def _run(db_path: str):
+    """Запускает писателей и читателя, возвращает ошибки читателя"""
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    errors = ctx.Queue()
+    reader = ctx.Process(target=_read, args=(db_path, stop, errors))
+    writers = [ctx.Process(target=_write, args=(db_path, writer)) for writer in range(WRITERS)]
+    reader.start()
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(120)
+        assert process.exitcode == 0, "процесс-писатель завершился с ошибкой"
+    stop.set()
+    reader.join(60)
+    assert reader.exitcode == 0
+    return [] if errors.empty() else [errors.get()]
+
+
+def _check_database(db_path: str):
+    dm = DataManager(db_path)
+    ids = sorted(target['id'] for target in dm.list_targets())
+    expected = sorted(f"w{writer}_{i:03d}" for writer in range(WRITERS) for i in range(TARGETS_PER_WRITER))
+    assert ids == expected
+    assert sorted(target['id'] for target in dm.get_all_targets()) == expected
+
+    # Номера журнала изменений не повторяются
+    with open(dm.changes.log_path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    assert [record['seq'] for record in records] == list(range(1, len(records) + 1))
+    assert sorted({record['id'] for record in records}) == expected
+
+
+def test_json_parallel_writers(tmp_path):
+    db_path = str(tmp_path / "db.json")
+    DataManager(db_path).close()
+    assert _run(db_path) == []
+    _check_database(db_path)
+
+    # Временные файлы писателей не остаются
+    assert not [name for name in os.listdir(tmp_path) if ".tmp." in name]
+
+
+def test_sharded_parallel_writers(tmp_path):
+    db_path = str(tmp_path / "shards")
+    ShardedStorage(db_path, shards=8)
+    assert _run(db_path) == []
+    _check_database(db_path)
+
+    # После записи остаются версии шардов только текущего и предыдущего манифестов
+    storage = ShardedStorage(db_path)
+    shard_files = [name for name in os.listdir(db_path) if name.startswith("shard_")]
+    assert len(shard_files) <= 2 * storage.shard_count
+
+
+def test_directory_parallel_writers(tmp_path):
+    db_path = str(tmp_path / "directory")
+    DirectoryStorage(db_path)
+    assert _run(db_path) == []
+    _check_database(db_path)
+
+    # Маркеры незавершенной записи не остаются
+    assert not [name for name in os.listdir(db_path) if name.startswith(".writing")]
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+def test_threaded_updates_keep_indexes(tmp_path, write_behind):
+    db_path = str(tmp_path / "db.json")
+    dm = DataManager(db_path, thread_safe=True, write_behind=write_behind, quiet_period=0.05)
+    for i in range(20):
+        dm.create_target({'id': f"t{i:02d}", 'tags': ["base"]})
+    dm.tag_query("base")
+
+    def update(n: int):
+        target_id = f"t{n % 20:02d}"
+        dm.add_timeline_event(target_id, {'date': f"2020-01-{n % 28 + 1:02d}", 'title': str(n)})
+        dm.update_target(target_id, {'tags': ["base", f"n{n % 3}"]})
+        dm.tag_query("n1")
+
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(update, range(400)))
+    dm.close()
+
+    reopened = DataManager(db_path)
+    assert sum(len(target['timeline']) for target in reopened.get_all_targets()) == 400
+    reopened.rebuild_index("tags")
+    assert dm.tag_counts() == reopened.tag_counts()
+    with open(dm.changes.log_path, 'r', encoding='utf-8') as f:
+        seqs = [json.loads(line)['seq'] for line in f if line.strip()]
+    assert seqs == list(range(1, len(seqs) + 1))
+
+
+def test_catch_up_does_not_modify_index_in_use(tmp_path):
+    db_path = str(tmp_path / "db.json")
+    dm = DataManager(db_path, thread_safe=True)
+    dm.create_target({'id': "a", 'tags': ["x"]})
+    assert dm.tag_counts() == [("x", 1)]
+    with dm._index_guard:
+        in_use = dm._indexes["tags"]
+
+    # Запись другого процесса: индекс догоняется по журналу
+    other = DataManager(db_path)
+    other.create_target({'id': "b", 'tags': ["x", "y"]})
+    other.close()
+
+    assert sorted(dm.tag_counts()) == [("x", 2), ("y", 1)]
+    assert in_use.counts() == [("x", 1)]
+    dm.close()
@@ -0,0 +1,111 @@
+"""
+Тесты поиска совпадений присутствия: внешняя сортировка и соединение слиянием
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.copresence import (FOOTPRINT_WEIGHT, find_copresence, normalize_location,  # noqa: E402
+                             sorted_events, target_events)
+from core.data_manager import DataManager  # noqa: E402
+
+
+def _visit(day: int, location: str, category: str = "meeting") -> dict:
+    return {'date': f"2024-05-{day:02d}", 'location': location, 'category': category}
+
+
+def test_normalize_location():
+    assert normalize_location("  Москва, ул. Тверская!! ") == "москва, ул тверская"
+    assert normalize_location("Москва, ул. Тверская", city_only=True) == "москва"
+    assert normalize_location("Онлайн") is None
+    assert normalize_location("...") is None
+
+
+def test_target_events_need_full_date_and_place():
+    events = list(target_events({
+        'id': "a",
+        'timeline': [_visit(1, "Кафе «Пушкин»"), {'date': "2024-05", 'location': "Кафе"},
+                     {'date': "2024-05-02", 'location': "online"}, {'date': "2024-05-03"}],
+        'digital_footprint': [{'source': " VK ", 'date': "2024-05-04"}, {'source': "vk", 'date': "bad"}],
+    }))
+    assert events == [("place:кафе пушкин", events[0][1], "a", "meeting"),
+                      ("source:vk", events[0][1] + 3, "a", "footprint")]
+    assert list(target_events({'id': "a", 'digital_footprint': [{'source': "vk", 'date': "2024-05-04"}]},
+                              footprint=False)) == []
+
+
+def test_sorted_events_spills_and_merges():
+    rng = random.Random(1)
+    events = [(f"place:{rng.randint(0, 9)}", rng.randint(1, 30), f"t{rng.randint(0, 20)}", "timeline")
+              for _ in range(2000)]
+    assert list(sorted_events(iter(events), chunk_size=150)) == sorted(events)
+    assert list(sorted_events(iter(events))) == sorted(events)
+
+
+def test_join_weights_window_and_footprint():
+    targets = [
+        {'id': "a", 'timeline': [_visit(1, "Кафе"), _visit(10, "Парк")],
+         'digital_footprint': [{'source': "forum", 'date': "2024-05-20"}]},
+        {'id': "b", 'timeline': [_visit(1, "кафе"), _visit(12, "Парк")],
+         'digital_footprint': [{'source': "Forum", 'date': "2024-05-20"}]},
+        {'id': "c", 'timeline': [_visit(5, "Кафе")]},
+    ]
+    events = [event for target in targets for event in target_events(target)]
+
+    same_day = find_copresence(sorted_events(events))
+    assert set(same_day) == {("a", "b")}
+    assert same_day[("a", "b")].matches == 2
+    assert same_day[("a", "b")].score == 1.0 + FOOTPRINT_WEIGHT
+
+    window = find_copresence(sorted_events(events), window_days=4)
+    assert set(window) == {("a", "b"), ("a", "c"), ("b", "c")}
+    assert window[("a", "b")].score == 1.0 + 1.0 / 3 + FOOTPRINT_WEIGHT
+    assert window[("a", "c")].score == 1.0 / 5
+    assert dict(window[("a", "b")].places) == {"кафе": 1, "парк": 1, "forum": 1}
+
+    only_c = find_copresence(sorted_events(events), window_days=4, target_id="c")
+    assert set(only_c) == {("a", "c"), ("b", "c")}
+
+
+def test_crowded_places_are_skipped():
+    events = [("place:стадион", 1, f"t{i:02d}", "timeline") for i in range(10)]
+    events.append(("place:кафе", 1, "t00", "timeline"))
+    events.append(("place:кафе", 1, "t01", "timeline"))
+    pairs = find_copresence(sorted_events(events), max_group=3)
+    # На стадионе сопоставлены только первые три события, в кафе - пара целиком
+    assert set(pairs) == {("t00", "t01"), ("t00", "t02"), ("t01", "t02")}
+    assert pairs[("t00", "t01")].matches == 2
+
+
+def test_data_manager_copresence_table(tmp_path):
+    dm = DataManager(str(tmp_path / "db.json"))
+    dm.import_targets([
+        {'id': "a", 'timeline': [_visit(1, "Москва, Кафе"), _visit(2, "Москва, Парк")]},
+        {'id': "b", 'timeline': [_visit(1, "Москва, кафе")]},
+        {'id': "c", 'timeline': [_visit(2, "Москва, Офис")]},
+    ])
+    table = dm.copresence()
+    assert [(row['target_id'], row['matches']) for row in table['a']] == [("b", 1)]
+    assert table['a'][0]['first'] == table['a'][0]['last'] == "2024-05-01"
+
+    by_city = dm.copresence(city_only=True, target_id="a")
+    assert set(by_city) == {"a"}
+    assert [(row['target_id'], row['score']) for row in by_city['a']] == [("b", 1.0), ("c", 1.0)]
+    assert by_city['a'][0]['places'] == ["москва"]
+
+
+def test_spilled_runs_keep_arbitrary_text(tmp_path):
+    dm = DataManager(str(tmp_path / "db.json"))
+    for target_id in ("a", "b"):
+        dm.create_target({'id': target_id, 'digital_footprint': [
+            {'source': "forum\tthread\n42", 'date': f"2024-03-{day:02d}"} for day in range(1, 6)
+        ]})
+
+    # chunk_size меньше числа событий - порции сбрасываются на диск
+    table = dm.copresence(chunk_size=3)
+    assert [row['target_id'] for row in table['a']] == ["b"]
+    assert table['a'][0]['matches'] == 5
+    assert table['a'][0]['places'] == ["forum\tthread\n42"]
@@ -0,0 +1,133 @@
+"""
+Тесты очереди заданий на отчеты: повторы с паузой, аренда, освобождение
+и выполнение очереди генератором
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import jobs  # noqa: E402
+from core.data_manager import DataManager  # noqa: E402
+from core.jobs import BACKOFF_BASE, BACKOFF_MAX, LEASE_SECONDS, JobQueue, backoff_delay, queue_path  # noqa: E402
+from generator import ReportGenerator  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время очереди"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(jobs, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with JobQueue(str(tmp_path / "jobs.sqlite")) as queue:
+        yield queue
+
+
+def test_backoff_delay():
+    assert [backoff_delay(attempt) for attempt in (1, 2, 3)] == [BACKOFF_BASE, 2 * BACKOFF_BASE, 4 * BACKOFF_BASE]
+    assert backoff_delay(50) == BACKOFF_MAX
+
+
+def test_queue_path(tmp_path):
+    assert queue_path(str(tmp_path / "db.json")) == str(tmp_path / "db.jobs.sqlite")
+    assert queue_path(str(tmp_path)) == str(tmp_path / "jobs.sqlite")
+
+
+def test_enqueue_skips_pending_targets(queue, clock):
+    assert queue.enqueue(["a", "b", "a"]) == 2
+    assert queue.enqueue(["a", "c"]) == 1
+    assert queue.enqueue(["a"], kind="brief") == 1
+    job = queue.claim("w")[0]
+    queue.complete(job['id'], "out.html", 0.1)
+    # Выполненное задание не мешает поставить цель снова
+    assert queue.enqueue([job['target_id']]) == 1
+
+
+def test_failed_attempts_back_off_then_fail(queue, clock):
+    queue.enqueue(["a"], params={'output_filename': "a.html"}, max_attempts=3)
+    for attempt in (1, 2):
+        [job] = queue.claim("w")
+        assert (job['attempt'], job['params']) == (attempt, {'output_filename': "a.html"})
+        assert queue.fail(job['id'], f"ошибка {attempt}") is True
+        # Повтор выдается только после паузы
+        assert queue.claim("w") == []
+        assert queue.next_available() == clock[0] + backoff_delay(attempt)
+        assert queue.stats()['retrying'] == 1
+        clock[0] += backoff_delay(attempt)
+
+    [job] = queue.claim("w")
+    assert job['attempt'] == 3
+    assert queue.fail(job['id'], "ошибка 3") is False
+    assert queue.claim("w") == []
+    [row] = queue.jobs("failed")
+    assert (row['attempts'], row['error']) == (3, "ошибка 3")
+
+    assert queue.retry_failed() == 1
+    assert queue.claim("w")[0]['attempt'] == 1
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    queue.enqueue(["a"])
+    [job] = queue.claim("crashed")
+    assert queue.claim("w") == []
+    assert queue.stats()['running'] == 1
+
+    clock[0] += LEASE_SECONDS + 1
+    [again] = queue.claim("w")
+    assert (again['id'], again['attempt']) == (job['id'], 2)
+    assert queue.jobs("running")[0]['worker'] == "w"
+
+
+def test_release_returns_jobs_without_spending_attempts(queue, clock):
+    queue.enqueue(["a", "b"])
+    claimed = queue.claim("w", limit=2)
+    queue.complete(claimed[0]['id'], "a.html", 0.5)
+    queue.release([job['id'] for job in claimed])
+    [job] = queue.claim("w")
+    assert (job['id'], job['attempt']) == (claimed[1]['id'], 1)
+
+
+def test_stats_and_purge(queue, clock):
+    queue.enqueue(["a", "b", "c"])
+    first, second = queue.claim("w", limit=2)
+    queue.complete(first['id'], "a.html", 2.0)
+    queue.fail(second['id'], "ошибка")
+    assert queue.stats()['ready'] == 1
+    clock[0] += 60
+
+    stats = queue.stats(window=300.0)
+    assert (stats['queued'], stats['ready'], stats['done'], stats['retrying']) == (2, 2, 1, 1)
+    assert stats['throughput'] == pytest.approx(60.0 / 300.0)
+    assert stats['avg_duration'] == 2.0
+    assert stats['oldest_queued'] == 60
+
+    assert queue.purge() == 1
+    assert queue.stats()['done'] == 0
+
+
+def test_run_jobs_retries_and_completes(tmp_path, monkeypatch):
+    dm = DataManager(str(tmp_path / "db.json"))
+    dm.create_target({'id': "a", 'personal': {'full_name': "Цель А"}})
+    generator = ReportGenerator(os.path.join(ROOT, "templates"), str(tmp_path / "output"), dm,
+                                static_dir=os.path.join(ROOT, "static"))
+    monkeypatch.setattr(jobs, "BACKOFF_BASE", 0.01)
+
+    with JobQueue(queue_path(dm.db_path)) as queue:
+        queue.enqueue(["a", "missing"], max_attempts=2)
+        attempts = []
+        totals = generator.run_jobs(queue, bundle=None,
+                                    progress=lambda job, ok, value: attempts.append((job['target_id'], ok)))
+        assert totals == {'done': 1, 'retried': 1, 'failed': 1}
+        assert sorted(attempts) == [("a", True), ("missing", False), ("missing", False)]
+        [done] = queue.jobs("done")
+        assert os.path.exists(done['output'])
+        assert queue.jobs("failed")[0]['target_id'] == "missing"
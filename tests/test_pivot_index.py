@@ -0,0 +1,87 @@
+"""
+Тесты обратного индекса идентификаторов (pivot): нормализация, поиск,
+обновление при записи и загрузка из файла
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.data_manager import DataManager  # noqa: E402
+from core.indexes import index_path, normalize_identifier  # noqa: E402
+
+
+def _targets():
+    return [
+        {'id': "a", 'contacts': {'phones': ["8 (921) 555-12-34"], 'emails': ["Alex@Mail.ru"],
+                                 'messengers': {'telegram': "@alex_spb"}},
+         'assets': {'vehicles': [{'plate_number': "А777АА 178"}]}},
+        {'id': "b", 'contacts': {'messengers': {'whatsapp': "+7 921 555 12 34"}},
+         'social_media': [{'platform': "vk", 'username': "Alex_SPB"}]},
+        {'id': "c", 'contacts': {'emails': ["alex@mail.ru"]},
+         'assets': {'vehicles': [{'plate_number': "A777AA178"}]}},
+    ]
+
+
+@pytest.fixture
+def dm(tmp_path):
+    dm = DataManager(str(tmp_path / "db.json"))
+    dm.import_targets(_targets())
+    return dm
+
+
+def test_normalize_identifier():
+    assert normalize_identifier("phone", "8 (921) 555-12-34") == "+79215551234"
+    assert normalize_identifier("phone", "123") is None
+    assert normalize_identifier("email", " Alex@Mail.RU ") == "alex@mail.ru"
+    assert normalize_identifier("handle", "@Alex_SPB") == "alex_spb"
+    assert normalize_identifier("plate", "а777аа 178") == "A777AA178"
+    with pytest.raises(ValueError):
+        normalize_identifier("passport", "1234")
+
+
+def test_pivot_matches_normalized_values(dm):
+    # Логин WhatsApp, похожий на телефон, считается телефоном
+    matches = {target['id']: target['_pivot_sources'] for target in dm.pivot("phone", "+79215551234")}
+    assert matches == {'a': ["contacts.phones"], 'b': ["contacts.messengers.whatsapp"]}
+
+    assert {target['id'] for target in dm.pivot("handle", "alex_spb")} == {"a", "b"}
+    assert {target['id'] for target in dm.pivot("email", "ALEX@mail.ru")} == {"a", "c"}
+    assert {target['id'] for target in dm.pivot("plate", "a777aa178")} == {"a", "c"}
+    assert dm.pivot("phone", "not a phone") == []
+
+
+def test_pivot_follows_updates_and_deletes(dm):
+    dm.pivot("email", "alex@mail.ru")
+    dm.update_target("c", {'contacts': {'emails': ["other@mail.ru"]}})
+    dm.delete_target("b")
+
+    assert [target['id'] for target in dm.pivot("email", "alex@mail.ru")] == ["a"]
+    assert [target['id'] for target in dm.pivot("email", "other@mail.ru")] == ["c"]
+    assert [target['id'] for target in dm.pivot("phone", "+79215551234")] == ["a"]
+
+
+def test_shared_identifiers(dm):
+    rows = dm.shared_identifiers()
+    assert [(row['kind'], row['value']) for row in rows] == [
+        ("email", "alex@mail.ru"), ("handle", "alex_spb"), ("phone", "+79215551234"), ("plate", "A777AA178"),
+    ]
+    assert rows[0]['targets'] == {'a': ["contacts.emails"], 'c': ["contacts.emails"]}
+    assert [row['value'] for row in dm.shared_identifiers("plate")] == ["A777AA178"]
+    assert dm.shared_identifiers(min_targets=3) == []
+
+
+def test_saved_index_catches_up_with_other_writers(dm):
+    dm.pivot("phone", "+79215551234")
+    dm.close()
+    assert os.path.exists(index_path(dm.db_path, "pivot"))
+
+    # Другой процесс дописал цель: индекс из файла догоняется по журналу
+    other = DataManager(dm.db_path)
+    other.create_target({'id': "d", 'contacts': {'phones': ["+7 921 555-12-34"]}})
+
+    reopened = DataManager(dm.db_path)
+    assert {target['id'] for target in reopened.pivot("phone", "89215551234")} == {"a", "b", "d"}
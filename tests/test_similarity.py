@@ -0,0 +1,149 @@
+"""
+Тесты поиска похожих целей: TF-IDF косинус с NumPy/SciPy и без них
+"""
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import similarity  # noqa: E402
+from core.data_manager import DataManager  # noqa: E402
+from core.similarity import SimilarityIndex, target_features  # noqa: E402
+
+TAGS = ["moscow", "spb", "it", "finance", "crypto", "auto", "sport"]
+COMPANIES = ["Яндекс", "Сбер", "ВТБ", "Газпром"]
+PLATFORMS = ["vk", "telegram", "instagram"]
+
+
+def _targets(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    targets = []
+    for i in range(count):
+        targets.append({
+            'id': f"t{i:03d}",
+            'tags': rng.sample(TAGS, rng.randint(0, 3)),
+            'employment': [{'company': rng.choice(COMPANIES), 'location': "Москва"}] if rng.random() < 0.6 else [],
+            'social_media': [{'platform': platform} for platform in rng.sample(PLATFORMS, rng.randint(0, 2))],
+        })
+    return targets
+
+
+def _reference(targets, target_id: str):
+    """Косинус TF-IDF по определению (сглаженный IDF, как в SimilarityIndex)"""
+    features = {target['id']: target_features(target) for target in targets}
+    df = {}
+    for values in features.values():
+        for feature in values:
+            df[feature] = df.get(feature, 0) + 1
+    weight_sq = {feature: (math.log((1 + len(targets)) / (1 + count)) + 1.0) ** 2 for feature, count in df.items()}
+
+    def norm(values):
+        return math.sqrt(sum(weight_sq[feature] for feature in values))
+
+    own = features[target_id]
+    scores = {}
+    for other_id, values in features.items():
+        shared = own & values
+        if other_id != target_id and shared:
+            scores[other_id] = sum(weight_sq[feature] for feature in shared) / (norm(own) * norm(values))
+    return scores
+
+
+@pytest.fixture(params=["numpy", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if similarity.np is None:
+            pytest.skip("NumPy не установлен")
+    else:
+        monkeypatch.setattr(similarity, "np", None)
+        monkeypatch.setattr(similarity, "sparse", None)
+    return request.param
+
+
+def test_target_features():
+    features = target_features({
+        'tags': ["IT ", ""], 'employment': [{'company': "Яндекс", 'location': "Москва"}],
+        'education': [{'institution': "МГУ"}], 'addresses': [{'address': "Санкт-Петербург, Невский 1"}],
+        'social_media': [{'platform': "VK"}], 'connections': [{'name': "Петров"}],
+    })
+    assert features == {"tag:it", "employer:яндекс", "city:москва", "institution:мгу",
+                        "city:санкт-петербург", "platform:vk", "connection:петров"}
+
+
+def test_similar_matches_reference(backend):
+    targets = _targets(60)
+    index = SimilarityIndex()
+    index.build(targets)
+    for target_id in ("t000", "t017", "t042"):
+        expected = _reference(targets, target_id)
+        result = index.similar(target_id, limit=len(targets))
+        assert {other: score for other, score, _ in result} == pytest.approx(expected)
+        scores = [score for _, score, _ in result]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_similar_reports_shared_features(backend):
+    index = SimilarityIndex()
+    index.build([
+        {'id': "a", 'tags': ["crypto", "moscow"], 'social_media': [{'platform': "vk"}]},
+        {'id': "b", 'tags': ["crypto"], 'social_media': [{'platform': "vk"}]},
+        {'id': "c", 'social_media': [{'platform': "vk"}]},
+        {'id': "d", 'tags': ["sport"]},
+    ])
+    result = index.similar("a")
+    assert [other for other, _, _ in result] == ["b", "c"]
+    assert result[0][2] == ["platform:vk", "tag:crypto"]
+    assert index.similar("d") == []
+    assert index.similar("missing") is None
+
+
+def test_updates_match_rebuilt_index(backend):
+    targets = _targets(80, seed=3)
+    index = SimilarityIndex()
+    index.build(targets)
+    index.similar("t000")  # матрица собрана - дальнейшие изменения досчитываются поверх нее
+
+    rng = random.Random(11)
+    for target in rng.sample(targets, 20):
+        target['tags'] = rng.sample(TAGS, 2)
+        index.update([target])
+    index.update(deleted=["t005", "t006"])
+    targets = [target for target in targets if target['id'] not in ("t005", "t006")]
+
+    rebuilt = SimilarityIndex()
+    rebuilt.build(targets)
+    for target_id in ("t000", "t010", "t033"):
+        assert ({other: score for other, score, _ in index.similar(target_id, 100)}
+                == pytest.approx({other: score for other, score, _ in rebuilt.similar(target_id, 100)}))
+
+
+def test_all_pairs_matches_similar(backend):
+    index = SimilarityIndex()
+    index.build(_targets(40, seed=5))
+    pairs = index.all_pairs(limit=3)
+    assert set(pairs) == {f"t{i:03d}" for i in range(40)}
+    for target_id in ("t001", "t020"):
+        expected = [(other, score) for other, score, _ in index.similar(target_id, 3)]
+        assert [other for other, _ in pairs[target_id]] == [other for other, _ in expected]
+        assert [score for _, score in pairs[target_id]] == pytest.approx([score for _, score in expected])
+
+
+def test_data_manager_similar_targets(tmp_path, backend):
+    dm = DataManager(str(tmp_path / "db.json"))
+    dm.import_targets([
+        {'id': "a", 'tags': ["crypto"], 'employment': [{'company': "Сбер"}]},
+        {'id': "b", 'tags': ["crypto"], 'employment': [{'company': "Сбер"}]},
+        {'id': "c", 'tags': ["crypto"]},
+    ])
+    assert [target['id'] for target in dm.similar_targets("a")] == ["b", "c"]
+    assert dm.similar_targets("a")[0]['_shared_features'] == ["employer:сбер", "tag:crypto"]
+
+    dm.update_target("c", {'employment': [{'company': "Сбер"}], 'tags': ["crypto", "moscow"]})
+    assert dm.similar_targets("a")[0]['_similarity'] == pytest.approx(1.0)
+    assert dm.similar_targets("missing") is None
+    assert [other for other, _ in dm.similarity_pairs(1)["c"]] == ["a"]
@@ -0,0 +1,82 @@
+"""
+Тесты битового индекса тегов: булевы выражения, счетчики и сопутствующие теги
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.data_manager import DataManager  # noqa: E402
+from core.indexes import TagIndex  # noqa: E402
+
+TARGETS = [
+    {'id': "a", 'tags': ["Moscow", "IT"]},
+    {'id': "b", 'tags': ["moscow", "finance", "archived"]},
+    {'id': "c", 'tags': ["spb", "it", "красная зона"]},
+    {'id': "d", 'tags': ["moscow", "finance"]},
+    {'id': "e", 'tags': []},
+]
+
+
+@pytest.fixture
+def index():
+    index = TagIndex()
+    index.build(TARGETS)
+    return index
+
+
+def _query(index: TagIndex, expression: str) -> list:
+    return sorted(index.ids(index.evaluate(expression)))
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("moscow", ["a", "b", "d"]),
+    ("MOSCOW AND it", ["a"]),
+    ("moscow & finance & !archived", ["d"]),
+    ("moscow AND (it OR finance) AND NOT archived", ["a", "d"]),
+    ("spb | archived", ["b", "c"]),
+    ("moscow finance", ["b", "d"]),
+    ("NOT moscow", ["c", "e"]),
+    ("NOT NOT spb", ["c"]),
+    ('"красная зона" OR archived', ["b", "c"]),
+    ("unknown", []),
+    ("it OR moscow AND finance", ["a", "b", "c", "d"]),
+])
+def test_evaluate(index, expression, expected):
+    assert _query(index, expression) == expected
+
+
+@pytest.mark.parametrize("expression", ["", "moscow AND", "(moscow", "moscow)", "AND it", "moscow OR )"])
+def test_evaluate_rejects_malformed_expressions(index, expression):
+    with pytest.raises(ValueError):
+        index.evaluate(expression)
+
+
+def test_counts_and_cooccurring(index):
+    assert index.counts()[:3] == [("Moscow", 3), ("IT", 2), ("finance", 2)]
+    assert index.cooccurring(index.bitmap("moscow"), exclude=["moscow"]) == [
+        ("finance", 2), ("IT", 1), ("archived", 1),
+    ]
+
+
+def test_removed_ordinals_are_reused(index):
+    index.remove("b")
+    assert _query(index, "archived") == []
+    assert _query(index, "NOT moscow") == ["c", "e"]
+    index.add({'id': "f", 'tags': ["archived"]})
+    assert _query(index, "archived") == ["f"]
+    assert len(index._ids) == len(TARGETS)
+
+
+def test_data_manager_tag_queries(tmp_path):
+    dm = DataManager(str(tmp_path / "db.json"))
+    dm.import_targets([dict(target) for target in TARGETS])
+
+    assert [target['id'] for target in dm.tag_query("moscow AND NOT archived")] == ["a", "d"]
+    assert dm.tag_count("it") == 2
+    dm.update_target("d", {'tags': ["moscow", "archived"]})
+    assert dm.tag_count("moscow AND NOT archived") == 1
+    assert dm.related_tags("archived") == [("Moscow", 2), ("finance", 1)]